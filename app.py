@@ -1,13 +1,26 @@
-from flask import Flask, render_template
+import hmac
+import time
+from flask import Flask, Response, jsonify, render_template, request
 from flask_restx import Api
 from config import Config
 from satusehat import satset_ns, dicom_ns
+from common.workspace import start_sweeper
+from satusehat.service_outbox import start_drainer
+from satusehat.service_watcher import start_watcher
+from satusehat.service_router import start_health_checker
+from satusehat.service_webhook import start_webhook_sender
+from satusehat import service_health, service_warmup
+from common import metrics
+from common import cpu_pool
+from common.logger import setup_logging
+from common import profiler
+from common import singleton
 
 def create_app():
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config.from_object(Config)
 
-    # Init folder temp
+    # Init folder temp & data
     Config.init_app()
 
     api = Api(
@@ -22,14 +35,134 @@ def create_app():
     api.add_namespace(satset_ns)
     api.add_namespace(dicom_ns)
 
+    # Di bawah gunicorn service background distart per worker (post_fork),
+    # bukan di master: thread tidak ikut ter-fork.
+    # Worker CPU pool (spawn) meng-import ulang app.py saat `python app.py`:
+    # di sana tidak boleh ada service (logging, health check, warm-up, pool bersarang).
+    if not Config.DEFER_BACKGROUND_SERVICES and not cpu_pool.in_pool_worker():
+        start_process_services()
+        start_host_services()
+
     return app
 
+# ---------------------------------------------------------
+# Service background
+# ---------------------------------------------------------
+# Waktu start proses yang melayani request (per worker, bukan master gunicorn)
+STARTED_AT = time.time()
+
+def start_process_services():
+    """Service yang dibutuhkan setiap proses yang melayani request."""
+    global STARTED_AT
+    STARTED_AT = time.time()
+    setup_logging()
+
+    # Health check C-ECHO untuk pool router (state pool per proses)
+    start_health_checker()
+
+    # Profiler sampling rate rendah (ring buffer)
+    if Config.PROFILER_CONTINUOUS:
+        profiler.start_continuous_profiler()
+
+    # Warm-up (token, koneksi upstream, C-ECHO router, CPU pool) di background;
+    # /health/ready 503 sampai selesai
+    service_warmup.start_warmup()
+
+    # Probe dependency berkala; /health/* hanya membaca hasil cache
+    service_health.start_prober()
+
+def start_host_services():
+    """Service yang cukup satu per host; di antara worker gunicorn hanya pemegang lock yang menjalankan.
+
+    Return True jika service dijalankan oleh proses ini.
+    """
+    if not singleton.acquire("background"):
+        return False
+
+    # Bersihkan workspace yatim (startup & berkala)
+    start_sweeper()
+
+    # Background drainer untuk outbox FHIR
+    if Config.OUTBOX_MODE != "off":
+        start_drainer()
+
+    # Pengiriman webhook penyelesaian job async (retry + backoff)
+    start_webhook_sender()
+
+    # Background watcher PACS → router
+    if Config.WATCHER_ENABLED:
+        start_watcher()
+
+    return True
+
 app = create_app()
 
 @app.route("/")
 def index():
     return render_template("page.html")
 
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# ---------------------------------------------------------
+# Liveness / readiness (load balancer, orchestrator)
+# ---------------------------------------------------------
+# Hanya membaca hasil probe yang di-cache (tanpa panggilan upstream)
+@app.route("/health/live")
+def health_live():
+    alive, status = service_health.liveness()
+    status["uptime_seconds"] = round(time.time() - STARTED_AT, 1)
+    return jsonify(status="ok" if alive else "error", **status), (200 if alive else 503)
+
+@app.route("/health/ready")
+def health_ready():
+    ready, status = service_health.readiness()
+    return jsonify(ready=ready, **status), (200 if ready else 503)
+
+# ---------------------------------------------------------
+# Admin: sampling profiler (header X-Admin-Token = ADMIN_TOKEN)
+# ---------------------------------------------------------
+def admin_authorized():
+    token = Config.ADMIN_TOKEN
+    return bool(token) and hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token)
+
+def profile_response(counts, ticks, interval, name):
+    if request.args.get("format", "collapsed") == "speedscope":
+        return jsonify(profiler.to_speedscope(counts, interval, name=name))
+    resp = Response(profiler.to_collapsed(counts), mimetype="text/plain")
+    resp.headers["X-Profile-Samples"] = str(ticks)
+    return resp
+
+@app.route("/admin/profile")
+def admin_profile():
+    """?seconds=10&interval=0.01&format=collapsed|speedscope"""
+    if not admin_authorized():
+        return jsonify(error="Forbidden"), 403
+
+    seconds = min(max(request.args.get("seconds", 10, type=float), 0.1), Config.PROFILER_MAX_SECONDS)
+    interval = max(request.args.get("interval", 0.01, type=float), 0.001)
+
+    result = profiler.profile(seconds, interval)
+    if result is None:
+        return jsonify(error="Profiler sedang berjalan"), 409
+
+    counts, ticks = result
+    return profile_response(counts, ticks, interval, f"on-demand {seconds}s")
+
+@app.route("/admin/profile/continuous")
+def admin_profile_continuous():
+    """?seconds=600 (default seluruh ring buffer)&format=collapsed|speedscope"""
+    if not admin_authorized():
+        return jsonify(error="Forbidden"), 403
+    if not profiler.continuous_running():
+        return jsonify(error="PROFILER_CONTINUOUS tidak aktif"), 404
+
+    seconds = request.args.get("seconds", type=float)
+    counts, ticks = profiler.ring_profile(seconds)
+    return profile_response(counts, ticks, Config.PROFILER_CONTINUOUS_INTERVAL, "continuous")
+
 if __name__ == "__main__":
     # threaded=True adalah default di Flask modern, tapi baik untuk ditegaskan
-    app.run(host='0.0.0.0', port=5001, threaded=True)
+    # Development server; produksi: gunicorn -c gunicorn.conf.py app:app
+    app.run(host='0.0.0.0', port=Config.PORT, threaded=True)
@@ -0,0 +1,349 @@
+"""
+Backfill / rekonsiliasi PACS → SatuSehat per rentang tanggal.
+
+1. List study dari dcm4chee per hari (QIDO, urut StudyInstanceUID) untuk --from..--to
+2. Cek ACSN ke SatuSehat ImagingStudy secara batch
+3. Study yang belum ada → kirim lewat process_dicom (router)
+
+Progress disimpan di file checkpoint (cursor tanggal + StudyInstanceUID) dan journal
+<checkpoint>.log; jalankan ulang perintah yang sama untuk melanjutkan run yang terputus.
+Study yang gagal di run sebelumnya dicoba ulang lebih dulu.
+
+Contoh:
+    python backfill.py --from 2025-08-01 --to 2025-08-31 --concurrency 4
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from config import Config
+from satusehat.service_dicom import list_studies, process_dicom
+from satusehat.service_imaging import search_imaging_by_acsns
+
+
+# ---------------------------------------------------------
+# Checkpoint
+#
+# Snapshot JSON (<checkpoint>) + journal NDJSON (<checkpoint>.log).
+# Setiap perubahan hanya di-append ke journal (flush tiap FLUSH_EVERY
+# perubahan dan saat cursor maju); snapshot ditulis ulang saat journal sudah
+# sebesar state (compaction) dan saat selesai, jadi biaya per study konstan.
+# ---------------------------------------------------------
+FLUSH_EVERY = 50
+
+
+class Checkpoint:
+    def __init__(self, path, date_from, date_to):
+        self.path = path
+        self.journal_path = path + ".log"
+        self.lock = threading.Lock()
+        self.state = {
+            "from": date_from,
+            "to": date_to,
+            # Study terakhir yang selesai diproses: (StudyDate, StudyInstanceUID)
+            "cursor": None,
+            "done": {},
+            # study_uid → {"accession", "error"}; dicoba ulang di awal run berikutnya
+            "failed": {},
+            # study_uid → alasan (mis. tanpa ACSN); tidak dicoba ulang
+            "skipped": {},
+        }
+
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get("from") == date_from and saved.get("to") == date_to:
+                self.state.update(saved)
+                # Checkpoint format lama (offset): mulai ulang dari awal, "done" tetap dilewati
+                self.state.pop("offset", None)
+                self._migrate_failed()
+            else:
+                raise SystemExit(f"[!] Checkpoint {path} dibuat untuk rentang lain, gunakan --checkpoint berbeda")
+
+        self.journal_entries = self._replay_journal()
+        self.unflushed = 0
+        self.journal = open(self.journal_path, "a")
+
+    def _migrate_failed(self):
+        for uid, info in list(self.state["failed"].items()):
+            if isinstance(info, str):
+                if info == "no accession number":
+                    del self.state["failed"][uid]
+                    self.state["skipped"][uid] = info
+                else:
+                    self.state["failed"][uid] = {"accession": None, "error": info}
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return 0
+
+        count = 0
+        with open(self.journal_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Baris terakhir terpotong (proses di-kill saat menulis)
+                    break
+                self._apply(entry)
+                count += 1
+        return count
+
+    def _apply(self, entry):
+        op = entry[0]
+        if op == "mark":
+            _, uid, outcome, accession, error = entry
+            if error:
+                self.state["failed"][uid] = {"accession": accession, "error": error}
+            else:
+                self.state["done"][uid] = outcome
+                self.state["failed"].pop(uid, None)
+        elif op == "skip":
+            _, uid, reason = entry
+            self.state["skipped"][uid] = reason
+            self.state["failed"].pop(uid, None)
+        elif op == "advance":
+            self.state["cursor"] = [entry[1], entry[2]]
+
+    @property
+    def cursor(self):
+        return tuple(self.state["cursor"]) if self.state["cursor"] else None
+
+    def is_done(self, study_uid):
+        return study_uid in self.state["done"] or study_uid in self.state["skipped"]
+
+    def failed_studies(self):
+        with self.lock:
+            return [
+                {"study_uid": uid, "accession": info.get("accession")}
+                for uid, info in self.state["failed"].items()
+            ]
+
+    def mark(self, study, outcome, error=None):
+        self._record(["mark", study["study_uid"], outcome, study.get("accession"), error])
+
+    def skip(self, study, reason):
+        self._record(["skip", study["study_uid"], reason])
+
+    def advance(self, study_date, study_uid):
+        self._record(["advance", study_date, study_uid], flush=True)
+
+    def _record(self, entry, flush=False):
+        with self.lock:
+            self._apply(entry)
+            self.journal.write(json.dumps(entry) + "\n")
+            self.journal_entries += 1
+            self.unflushed += 1
+
+            state_size = len(self.state["done"]) + len(self.state["failed"]) + len(self.state["skipped"])
+            if self.journal_entries > max(1000, state_size):
+                self._compact()
+            elif flush or self.unflushed >= FLUSH_EVERY:
+                self.journal.flush()
+                self.unflushed = 0
+
+    def _compact(self):
+        # Snapshot ditulis atomik dulu, baru journal dikosongkan (aman jika di-kill di antaranya)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+        self.journal.close()
+        self.journal = open(self.journal_path, "w")
+        self.journal_entries = 0
+        self.unflushed = 0
+
+    def close(self):
+        with self.lock:
+            self._compact()
+            self.journal.close()
+
+
+# ---------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------
+def _dicom_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").strftime("%Y%m%d")
+
+
+def _days(date_from, date_to):
+    day = datetime.strptime(date_from, "%Y%m%d")
+    end = datetime.strptime(date_to, "%Y%m%d")
+    while day <= end:
+        yield day.strftime("%Y%m%d")
+        day += timedelta(days=1)
+
+
+def _list_day(day, page_size):
+    """Semua study satu hari, urut StudyInstanceUID (stabil terhadap study baru di hari lain)."""
+    studies = {}
+    offset = 0
+    while True:
+        page = list_studies(day, day, offset=offset, limit=page_size, orderby="StudyInstanceUID")
+        for s in page:
+            if s["study_uid"]:
+                # Dedup: halaman bisa bergeser jika ada study baru saat paging
+                studies[s["study_uid"]] = dict(s, study_date=s.get("study_date") or day)
+        if len(page) < page_size:
+            break
+        offset += len(page)
+    return [studies[uid] for uid in sorted(studies)]
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _log(message):
+    print(f"[{datetime.now():%H:%M:%S}] {message}", flush=True)
+
+
+def _find_missing(studies, batch_size):
+    """Return study yang ACSN-nya belum ada di SatuSehat (study tanpa ACSN dianggap belum ada)."""
+    missing = [s for s in studies if not s["accession"]]
+    studies = [s for s in studies if s["accession"]]
+    for chunk in _chunks(studies, batch_size):
+        found, err = search_imaging_by_acsns([s["accession"] for s in chunk])
+        if err:
+            raise RuntimeError(f"ImagingStudy search failed: {err}")
+        missing.extend(s for s in chunk if s["accession"] not in found)
+    return missing
+
+
+def _send(study):
+    result, status = process_dicom({"study": study["study_uid"], "priority": "bulk"})
+    if status != 200:
+        raise RuntimeError(result.get("message") or json.dumps(result))
+    return result
+
+
+# ---------------------------------------------------------
+# Main
+# ---------------------------------------------------------
+def _process(executor, cp, studies, stats, args):
+    """Cek ACSN ke SatuSehat lalu kirim yang belum ada. Update checkpoint & stats."""
+    try:
+        missing = _find_missing(studies, args.batch_size)
+    except RuntimeError as e:
+        # Search SatuSehat gagal: catat semua study halaman ini sebagai gagal (dicoba ulang run berikutnya)
+        print(f"[!] Cek ACSN gagal untuk {len(studies)} study: {e}", flush=True)
+        for s in studies:
+            cp.mark(s, None, error=str(e))
+        stats["failed"] += len(studies)
+        return
+
+    missing_uids = {s["study_uid"] for s in missing}
+    for s in studies:
+        if s["study_uid"] not in missing_uids:
+            cp.mark(s, "present")
+    stats["present"] += len(studies) - len(missing)
+
+    if args.dry_run:
+        for s in missing:
+            _log(f"  missing  {s['accession']}  {s['study_uid']}")
+        return
+
+    futures = {executor.submit(_send, s): s for s in missing}
+    for f in as_completed(futures):
+        s = futures[f]
+        try:
+            result = f.result()
+            cp.mark(s, "sent")
+            stats["sent"] += 1
+            _log(f"  sent     {s['accession']}  {s['study_uid']}  ({result.get('sent_instance')} instance)")
+        except Exception as e:
+            cp.mark(s, None, error=str(e))
+            stats["failed"] += 1
+            _log(f"  FAILED   {s['accession']}  {s['study_uid']}  {e}")
+
+
+def run(args):
+    date_from = _dicom_date(args.date_from)
+    date_to = _dicom_date(args.date_to)
+    checkpoint_path = args.checkpoint or os.path.join(Config.DATA_DIR, f"backfill_{date_from}_{date_to}.json")
+
+    Config.init_app()
+    cp = Checkpoint(checkpoint_path, date_from, date_to)
+    try:
+        return _run(args, cp, checkpoint_path, date_from, date_to)
+    finally:
+        cp.close()
+
+
+def _run(args, cp, checkpoint_path, date_from, date_to):
+    stats = {"scanned": 0, "present": 0, "sent": 0, "failed": 0, "retried": 0, "no_accession": 0}
+    started = time.time()
+    cursor = cp.cursor
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        # Study yang gagal di run sebelumnya dicoba ulang dulu (cursor sudah melewatinya)
+        retry = cp.failed_studies()
+        if retry and not args.dry_run:
+            _log(f"Coba ulang {len(retry)} study yang gagal sebelumnya")
+            stats["retried"] = len(retry)
+            _process(executor, cp, retry, stats, args)
+
+        if cursor:
+            _log(f"Resume setelah {cursor[0]} / {cursor[1]} ({len(cp.state['done'])} study sudah selesai)")
+
+        for day in _days(date_from, date_to):
+            if cursor and day < cursor[0]:
+                continue
+
+            studies = _list_day(day, args.page_size)
+            if cursor and day == cursor[0]:
+                studies = [s for s in studies if s["study_uid"] > cursor[1]]
+
+            for page in _chunks(studies, args.page_size):
+                stats["scanned"] += len(page)
+                todo = [s for s in page if not cp.is_done(s["study_uid"])]
+
+                no_acsn = [s for s in todo if not s["accession"]]
+                for s in no_acsn:
+                    cp.skip(s, "no accession number")
+                stats["no_accession"] += len(no_acsn)
+
+                _process(executor, cp, [s for s in todo if s["accession"]], stats, args)
+                if not args.dry_run:
+                    cp.advance(day, page[-1]["study_uid"])
+
+                elapsed = time.time() - started
+                _log(
+                    f"cursor={day}/{page[-1]['study_uid']} scanned={stats['scanned']} present={stats['present']} "
+                    f"sent={stats['sent']} failed={stats['failed']} no_acsn={stats['no_accession']} "
+                    f"({stats['scanned'] / elapsed:.1f} study/s)"
+                )
+
+    remaining = len(cp.state["failed"])
+    _log(f"Selesai. {remaining} study masih gagal. Checkpoint: {checkpoint_path}")
+    # Gagal jika masih ada study yang belum terkirim, termasuk dari run sebelumnya
+    return 1 if remaining else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill study PACS yang belum ada di SatuSehat")
+    parser.add_argument("--from", dest="date_from", required=True, help="Tanggal awal (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", required=True, help="Tanggal akhir (YYYY-MM-DD)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Jumlah study yang dikirim bersamaan")
+    parser.add_argument("--page-size", type=int, default=100, help="Ukuran halaman QIDO")
+    parser.add_argument("--batch-size", type=int, default=20, help="Jumlah ACSN per search ImagingStudy")
+    parser.add_argument("--checkpoint", help="File checkpoint (default: DATA_DIR/backfill_<from>_<to>.json)")
+    parser.add_argument("--dry-run", action="store_true", help="Hanya tampilkan study yang belum terkirim")
+    args = parser.parse_args(argv)
+
+    try:
+        return run(args)
+    except KeyboardInterrupt:
+        _log("Dihentikan; jalankan ulang perintah yang sama untuk melanjutkan")
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from fakes import SERVICES, start_fakes
+
+from .procstat import pool_workers
+from .runner import LocalGateway, build_meta, run_scenario, save
+from .scenarios import SCENARIOS
+
+# ---------------------------------------------------------
+# python -m bench run      → jalankan skenario, simpan hasil JSON
+# python -m bench compare  → bandingkan dua file hasil
+# python -m bench procs    → cek jumlah worker CPU pool `python app.py` tetap
+# ---------------------------------------------------------
+
+
+def parse_env(items):
+    env = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep or not key:
+            raise argparse.ArgumentTypeError(f"--env {item!r}: format KEY=VALUE")
+        env[key] = value
+    return env
+
+
+def print_table(result):
+    print(f"\n{'scenario':<10} {'req':>6} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} "
+          f"{'rss MB':>8} {'cpu %':>7} {'fds':>5}")
+    for name, r in result["scenarios"].items():
+        lat = r["latency_ms"]
+        res = r["resources"] or {}
+        print(f"{name:<10} {r['requests']:>6} {r['errors']:>5} {r['throughput_rps']:>8} "
+              f"{_fmt(lat['p50']):>9} {_fmt(lat['p95']):>9} {_fmt(lat['p99']):>9} "
+              f"{_fmt(res.get('rss_peak_mb')):>8} {_fmt(res.get('cpu_percent')):>7} {_fmt(res.get('fds_peak')):>5}")
+
+
+def _fmt(value):
+    return "-" if value is None else str(value)
+
+
+# ---------------------------------------------------------
+# run
+# ---------------------------------------------------------
+def cmd_run(args):
+    scenarios = args.scenarios or list(SCENARIOS)
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Skenario tidak dikenal: {', '.join(unknown)} (pilihan: {', '.join(SCENARIOS)})")
+
+    fakes = gateway = None
+    gateway_env = parse_env(args.env)
+    try:
+        if args.url:
+            base_url, pid = args.url.rstrip("/"), args.pid
+        else:
+            faults = {name: {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                             "error_rate": args.error_rate, "rate_429": args.rate_429} for name in SERVICES}
+            fakes = start_fakes(ports={name: 0 for name in SERVICES}, faults=faults, studies=args.studies,
+                                instances=args.instances, instance_bytes=args.instance_bytes, quiet=True,
+                                replay=args.replay, replay_scale=args.replay_scale)
+            gateway_env = dict(fakes.env(), **gateway_env)
+            gateway = LocalGateway(gateway_env, server=args.server).start()
+            base_url, pid = gateway.url, gateway.process.pid
+            print(f"[*] Gateway {base_url} (pid {pid}, workdir {gateway.workdir})")
+
+        options = {k: v for k, v in vars(args).items() if k != "func"}
+        result = {"meta": build_meta(options, gateway_env), "scenarios": {}}
+        for name in scenarios:
+            print(f"[*] {name}: concurrency {args.concurrency}, "
+                  f"{args.requests or '∞'} request{f', {args.duration}s' if args.duration else ''}")
+            result["scenarios"][name] = run_scenario(
+                base_url, name, args.concurrency, args.requests, args.studies,
+                duration=args.duration, warmup=args.warmup, pid=pid, timeout=args.timeout,
+            )
+    finally:
+        if gateway:
+            gateway.stop()
+        if fakes:
+            fakes.stop()
+
+    out = args.out or os.path.join("data", "bench", f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    save(result, out)
+    print_table(result)
+    print(f"\n[*] Hasil disimpan: {out}")
+
+
+# ---------------------------------------------------------
+# compare
+# ---------------------------------------------------------
+def _delta(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return round(100 * (new - old) / old, 1)
+
+
+def compare(base, head, threshold=None):
+    """Return (rows, regressions). Regresi: throughput turun / p95 naik lebih dari threshold %."""
+    rows, regressions = [], []
+    for name in base["scenarios"]:
+        if name not in head["scenarios"]:
+            continue
+        b, h = base["scenarios"][name], head["scenarios"][name]
+        metrics = {
+            "throughput_rps": (b["throughput_rps"], h["throughput_rps"]),
+            "p50_ms": (b["latency_ms"]["p50"], h["latency_ms"]["p50"]),
+            "p95_ms": (b["latency_ms"]["p95"], h["latency_ms"]["p95"]),
+            "p99_ms": (b["latency_ms"]["p99"], h["latency_ms"]["p99"]),
+            "error_rate": (b["error_rate"], h["error_rate"]),
+            "rss_peak_mb": ((b["resources"] or {}).get("rss_peak_mb"), (h["resources"] or {}).get("rss_peak_mb")),
+            "cpu_seconds": ((b["resources"] or {}).get("cpu_seconds"), (h["resources"] or {}).get("cpu_seconds")),
+        }
+        for metric, (old, new) in metrics.items():
+            delta = _delta(old, new)
+            rows.append((name, metric, old, new, delta))
+
+        if threshold is not None:
+            tput = _delta(*metrics["throughput_rps"])
+            p95 = _delta(*metrics["p95_ms"])
+            if tput is not None and tput < -threshold:
+                regressions.append(f"{name}: throughput {tput}%")
+            if p95 is not None and p95 > threshold:
+                regressions.append(f"{name}: p95 +{p95}%")
+    return rows, regressions
+
+
+def cmd_compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base: {args.base} ({base['meta'].get('git_revision')})")
+    print(f"head: {args.head} ({head['meta'].get('git_revision')})\n")
+    print(f"{'scenario':<10} {'metric':<15} {'base':>10} {'head':>10} {'delta %':>9}")
+
+    rows, regressions = compare(base, head, args.fail_threshold)
+    for name, metric, old, new, delta in rows:
+        sign = "+" if delta and delta > 0 else ""
+        print(f"{name:<10} {metric:<15} {_fmt(old):>10} {_fmt(new):>10} "
+              f"{(sign + str(delta)) if delta is not None else '-':>9}")
+
+    if regressions:
+        print("\n[!] Regresi melebihi threshold:")
+        for line in regressions:
+            print(f"    {line}")
+        sys.exit(1)
+
+
+# ---------------------------------------------------------
+# procs (regression check: worker spawn tidak boleh menjalankan service / pool bersarang)
+# ---------------------------------------------------------
+def cmd_procs(args):
+    if not os.path.isdir("/proc"):
+        sys.exit("[!] procs membutuhkan /proc (Linux)")
+
+    fakes = start_fakes(ports={name: 0 for name in SERVICES}, studies=1, instances=1, quiet=True)
+    env = dict(fakes.env(), CPU_POOL_ENABLED="true", CPU_POOL_WORKERS=str(args.workers), WARMUP_ENABLED="true")
+    gateway = LocalGateway(env, server=args.server)
+    counts = []
+    try:
+        gateway.start()
+        print(f"[*] Gateway {gateway.url} (pid {gateway.process.pid}, {' '.join(gateway.command)})")
+        deadline = time.monotonic() + args.seconds
+        while time.monotonic() < deadline:
+            time.sleep(1)
+            counts.append(len(pool_workers(gateway.process.pid)))
+    finally:
+        gateway.stop()
+        fakes.stop()
+
+    print(f"[*] Worker CPU pool per detik: {counts}")
+    if not counts or max(counts) != args.workers or counts[-1] != args.workers:
+        print(f"[!] Jumlah worker CPU pool harus tepat {args.workers}")
+        sys.exit(1)
+    print(f"[*] OK: tepat {args.workers} worker CPU pool")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmark end-to-end gateway")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Jalankan benchmark")
+    run.add_argument("scenarios", nargs="*", help=f"Skenario (default semua: {' '.join(SCENARIOS)})")
+    run.add_argument("--concurrency", type=int, default=4, help="Jumlah client bersamaan")
+    run.add_argument("--requests", type=int, default=100, help="Request per skenario (0 = pakai --duration)")
+    run.add_argument("--duration", type=float, help="Batas waktu per skenario (detik)")
+    run.add_argument("--warmup", type=int, default=5, help="Request pemanasan (tidak dihitung)")
+    run.add_argument("--timeout", type=float, default=300, help="Timeout per request (detik)")
+    run.add_argument("--studies", type=int, default=50, help="Jumlah study sintetis")
+    run.add_argument("--instances", type=int, default=10, help="Instance per study")
+    run.add_argument("--instance-bytes", type=int, default=512 * 1024, help="Ukuran pixel data per instance")
+    run.add_argument("--latency-ms", type=float, default=0, help="Latency fake upstream (ms)")
+    run.add_argument("--jitter-ms", type=float, default=0, help="Jitter fake upstream (ms)")
+    run.add_argument("--error-rate", type=float, default=0, help="Fraksi error fake upstream")
+    run.add_argument("--rate-429", type=float, default=0, help="Fraksi 429 fake upstream")
+    run.add_argument("--replay", metavar="FILE", help="Latency fake dari rekaman HTTP_RECORD_FILE produksi")
+    run.add_argument("--replay-scale", type=float, default=1.0, help="Pengali latency rekaman")
+    run.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                     help="Env tambahan untuk gateway, mis. --env CPU_POOL_WORKERS=4 (boleh berulang)")
+    run.add_argument("--server", choices=("flask", "gunicorn"), default="flask",
+                     help="Server gateway subprocess (gunicorn memakai gunicorn.conf.py)")
+    run.add_argument("--url", help="Pakai gateway yang sudah berjalan (tanpa fake / subprocess)")
+    run.add_argument("--pid", type=int, help="PID gateway untuk sampling RSS/CPU/FD (dengan --url)")
+    run.add_argument("--out", help="File hasil JSON (default data/bench/bench_<waktu>.json)")
+    run.set_defaults(func=cmd_run)
+
+    cmp = sub.add_parser("compare", help="Bandingkan dua hasil benchmark")
+    cmp.add_argument("base", help="Hasil JSON acuan")
+    cmp.add_argument("head", help="Hasil JSON baru")
+    cmp.add_argument("--fail-threshold", type=float,
+                     help="Exit 1 jika throughput turun / p95 naik lebih dari N persen")
+    cmp.set_defaults(func=cmd_compare)
+
+    procs = sub.add_parser("procs", help="Cek jumlah worker CPU pool gateway tetap CPU_POOL_WORKERS")
+    procs.add_argument("--workers", type=int, default=2, help="CPU_POOL_WORKERS untuk gateway")
+    procs.add_argument("--seconds", type=float, default=10, help="Lama pengamatan (detik)")
+    procs.add_argument("--server", choices=("script", "flask", "gunicorn"), default="script",
+                       help="script = `python app.py` (perintah dev)")
+    procs.set_defaults(func=cmd_procs)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        try:
+            parse_env(args.env)
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+        if not args.requests and not args.duration:
+            parser.error("--requests 0 membutuhkan --duration")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+# ---------------------------------------------------------
+# Sampling RSS / CPU / file descriptor proses gateway via /proc
+# (proses + semua turunannya, mis. worker CPU pool). Linux saja;
+# di platform lain sampler tidak menghasilkan data.
+# ---------------------------------------------------------
+
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _children(pid):
+    """Semua PID turunan (rekursif) berdasarkan ppid di /proc/*/stat."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            parents.setdefault(int(fields[1]), []).append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    result, stack = [], [pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            result.append(child)
+            stack.append(child)
+    return result
+
+
+def pool_workers(pid):
+    """PID turunan yang merupakan worker multiprocessing (spawn), tanpa resource tracker."""
+    workers = []
+    for child in _children(pid):
+        try:
+            with open(f"/proc/{child}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except OSError:
+            continue
+        if b"spawn_main" in cmdline:
+            workers.append(child)
+    return workers
+
+
+def _read(pid):
+    """Return (rss_bytes, cpu_seconds, fds) satu proses, atau None jika sudah hilang."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / CLK_TCK
+        with open(f"/proc/{pid}/statm") as f:
+            rss = int(f.read().split()[1]) * PAGE_SIZE
+        fds = len(os.listdir(f"/proc/{pid}/fd"))
+        return rss, cpu, fds
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def snapshot(pid):
+    """Total (rss_bytes, cpu_seconds, fds, processes) untuk pid + turunannya."""
+    rss = cpu = fds = procs = 0
+    for p in [pid] + _children(pid):
+        stat = _read(p)
+        if stat is None:
+            continue
+        rss += stat[0]
+        cpu += stat[1]
+        fds += stat[2]
+        procs += 1
+    return rss, cpu, fds, procs
+
+
+class ProcSampler:
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.available = bool(pid) and os.path.isdir(f"/proc/{pid}")
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.samples.append((time.monotonic(), *snapshot(self.pid)))
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self.available:
+            self._thread = threading.Thread(target=self._loop, name="bench-procstat", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling dan return ringkasan (None jika /proc tidak tersedia)."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if not self.available:
+            return None
+
+        # Sample penutup supaya run yang lebih pendek dari interval tetap terukur
+        self.samples.append((time.monotonic(), *snapshot(self.pid)))
+
+        first, last = self.samples[0], self.samples[-1]
+        elapsed = last[0] - first[0]
+        cpu = last[2] - first[2]
+        mb = 1024 * 1024
+        return {
+            "rss_start_mb": round(first[1] / mb, 1),
+            "rss_end_mb": round(last[1] / mb, 1),
+            "rss_peak_mb": round(max(s[1] for s in self.samples) / mb, 1),
+            "cpu_seconds": round(cpu, 2),
+            "cpu_percent": round(100 * cpu / elapsed, 1) if elapsed else 0.0,
+            "fds_peak": max(s[3] for s in self.samples),
+            "fds_end": last[3],
+            "processes_peak": max(s[4] for s in self.samples),
+        }
@@ -0,0 +1,205 @@
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .procstat import ProcSampler
+from .scenarios import build_request
+
+# ---------------------------------------------------------
+# Load generator + gateway lokal (subprocess) terhadap fake upstream
+# ---------------------------------------------------------
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile dari list yang sudah terurut."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _free_port(host):
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# ---------------------------------------------------------
+# Gateway subprocess
+# ---------------------------------------------------------
+class LocalGateway:
+    """Jalankan gateway (Flask dev server / `python app.py` / gunicorn) di subprocess dengan Config diarahkan ke fake
+    + folder kerja sementara."""
+
+    def __init__(self, env, host="127.0.0.1", server="flask"):
+        self.host = host
+        self.port = _free_port(host)
+        self.workdir = tempfile.mkdtemp(prefix="bench_gateway_")
+        self.env = dict(os.environ)
+        self.env.update({
+            "SS_CLIENT_ID": "bench",
+            "SS_CLIENT_SECRET": "bench",
+            "SS_ORG_ID": "bench-org",
+            "DATA_DIR": os.path.join(self.workdir, "data"),
+            "TEMP_DIR": os.path.join(self.workdir, "tmp"),
+            "LOG_FILE": os.path.join(self.workdir, "gateway.log"),
+        })
+        self.env.update(env)
+        if server == "gunicorn":
+            self.command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                            "-b", f"{host}:{self.port}", "app:app"]
+        elif server == "script":
+            # Perintah dev yang didokumentasikan; worker spawn meng-import ulang app.py
+            self.env["PORT"] = str(self.port)
+            self.command = [sys.executable, "app.py"]
+        else:
+            self.command = [
+                sys.executable, "-c",
+                f"from app import app; app.run(host={host!r}, port={self.port}, threaded=True)",
+            ]
+        self.process = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, timeout=60):
+        out = open(os.path.join(self.workdir, "gateway.out"), "wb")
+        self.process = subprocess.Popen(self.command, cwd=ROOT, env=self.env, stdout=out, stderr=subprocess.STDOUT)
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Gateway berhenti saat start (lihat {out.name})")
+            try:
+                requests.get(self.url + "/api/satset/halo", timeout=1)
+                return self
+            except requests.RequestException:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"Gateway tidak siap dalam {timeout}s (lihat {out.name})")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+# ---------------------------------------------------------
+# Load generator
+# ---------------------------------------------------------
+def run_scenario(base_url, name, concurrency, total, studies, duration=None, warmup=0, pid=None,
+                 timeout=300, force=True):
+    """Jalankan satu skenario. Berhenti setelah `total` request atau `duration` detik (mana duluan)."""
+    local = threading.local()
+    lock = threading.Lock()
+    counter = {"next": 0}
+    samples = []
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def one(i):
+        method, path, body = build_request(name, i, studies, force=force)
+        started = time.perf_counter()
+        try:
+            resp = session().request(method, base_url + path, json=body, timeout=timeout)
+            status = resp.status_code
+        except requests.RequestException:
+            status = 0
+        return time.perf_counter() - started, status
+
+    for i in range(warmup):
+        one(i)
+
+    deadline = time.monotonic() + duration if duration else None
+
+    def worker():
+        while True:
+            with lock:
+                i = counter["next"]
+                if (total and i >= total) or (deadline and time.monotonic() >= deadline):
+                    return
+                counter["next"] += 1
+            elapsed, status = one(warmup + i)
+            with lock:
+                samples.append((elapsed, status))
+
+    sampler = ProcSampler(pid).start()
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"bench-{name}") as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.monotonic() - started
+    resources = sampler.stop()
+
+    latencies = sorted(s[0] * 1000 for s in samples)
+    statuses = Counter(str(s[1]) for s in samples)
+    errors = sum(1 for s in samples if not 200 <= s[1] < 400)
+
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "status_codes": dict(statuses),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(samples) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "p50": _round(percentile(latencies, 50)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "max": _round(latencies[-1] if latencies else None),
+        },
+        "resources": resources,
+    }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def build_meta(args, env):
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": args,
+        "gateway_env": env,
+    }
+
+
+def save(result, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    return path
@@ -0,0 +1,88 @@
+# ---------------------------------------------------------
+# Skenario benchmark: (method, path, json) per iterasi
+#
+# Iterasi ke-i memakai study sintetis ke-(i mod studies)+1 dari fake PACS
+# (ACC000001.., P00000001..) supaya beban tersebar ke banyak study.
+# ---------------------------------------------------------
+
+SCENARIOS = ("batch1", "batch2", "batch3", "batch4", "imageid", "dicom")
+
+
+def _study(i, studies):
+    n = i % studies + 1
+    return {"accession": f"ACC{n:06d}", "patient_id": f"P{n:08d}", "register": f"RGBENCH{n:07d}"}
+
+
+def _encounter_fields(s):
+    return {
+        "identifier_value": s["register"],
+        "subject_id": s["patient_id"],
+        "subject_display": "BENCH PATIENT",
+        "individual_id": "10016869420",
+        "individual_display": "dr. BENCH",
+        "period_start": "2025-08-01T05:57:41+00:00",
+        "location_id": "ecff1c64-3f62-4469-b577-ea38f263b276",
+        "location_display": "Ruang Radiologi",
+    }
+
+
+def _servicereq_fields(s):
+    return {
+        "noacsn": s["accession"],
+        "requester_reference": "Practitioner/10016869420",
+        "requester_display": "dr. BENCH",
+        "performer_id": "10000504193",
+        "performer_reference": "Practitioner/10000504193",
+        "performer_display": "dr. BENCH, Sp.Rad",
+    }
+
+
+def _report_fields(s):
+    return {
+        "codind_code": "24648-8",
+        "coding_display": "XR Chest PA upright",
+        "performer_value": "Hasil bacaan benchmark",
+        "conclusion_text": "Tak tampak kelainan (benchmark)",
+    }
+
+
+def build_request(name, i, studies, force=True):
+    """Return (method, path, json_body) untuk skenario `name` iterasi ke-i."""
+    s = _study(i, studies)
+
+    if name == "batch1":
+        return "POST", "/api/satset/batch1", {**_encounter_fields(s), **_servicereq_fields(s)}
+
+    if name == "batch2":
+        body = {
+            "identifier_value": s["register"],
+            "subject_id": s["patient_id"],
+            "subject_display": "BENCH PATIENT",
+            "encounter_id": "6dc2dc13-0b5a-4105-996e-6403e43be60a",
+            "period_start": "2025-08-31T15:25:00+00:00",
+            "performer_id": "10000504193",
+            "performer_display": "dr. BENCH, Sp.Rad",
+            "service_request_id": "a33163ec-ba77-4775-8d20-83035b76e668",
+            "imaging_study_id": "75b7e9d0-c079-419c-84f8-8dba7b9cd585",
+        }
+        return "POST", "/api/satset/batch2", {**body, **_report_fields(s)}
+
+    if name == "batch3":
+        return "POST", "/api/satset/batch3", {**_encounter_fields(s), **_servicereq_fields(s), **_report_fields(s)}
+
+    if name == "batch4":
+        body = {**_encounter_fields(s), **_servicereq_fields(s), **_report_fields(s)}
+        body.update(accesionnum=s["accession"], patientid=s["patient_id"], force=force)
+        return "POST", "/api/satset/batch4", body
+
+    if name == "imageid":
+        return "GET", f"/api/satset/imageid/{s['accession']}", None
+
+    if name == "dicom":
+        return "POST", "/api/dicom/process", {
+            "accesionnum": s["accession"],
+            "patientid": s["patient_id"],
+            "force": force,
+        }
+
+    raise ValueError(f"Skenario tidak dikenal: {name}")
@@ -1,11 +1,39 @@
-import requests
+import threading
+import time
+
 from config import Config
+from common import http
+from common.metrics import instrumented
 
-def get_access_token():
+# ---------------------------------------------------------
+# Token OAuth SatuSehat (client credentials), di-cache per proses
+#
+# Token dipakai ulang sampai TOKEN_REFRESH_MARGIN detik sebelum expires_in;
+# refresh dilakukan satu thread saja di luar lock, thread lain menunggu dan
+# memakai hasil yang sama (token atau error). Error di-cache
+# TOKEN_ERROR_CACHE_SECONDS detik supaya saat auth down request tidak antre
+# melakukan fetch (timeout 15 detik) satu per satu.
+# FHIR 401 → invalidate_token() supaya request berikutnya mengambil token baru.
+# ---------------------------------------------------------
+
+# expires_in tidak ada di response → anggap berlaku selama ini (detik)
+DEFAULT_TOKEN_TTL = 300
+
+_lock = threading.Lock()
+_token = None
+_expires_at = 0.0
+# Fetch yang sedang berjalan: {"done": Event, "result": (token, err)}
+_inflight = None
+# Fetch terakhir yang gagal: {"error": err, "until": waktu}
+_failure = None
+
+
+@instrumented("get_access_token", is_error=lambda r: r[1] is not None, span=True, log=True)
+def _fetch_token():
     token_url = Config.SS_AUTH_URL.rstrip("/") + "/accesstoken?grant_type=client_credentials"
 
     try:
-        resp = requests.post(
+        resp = http.post(
             token_url,
             data={
                 "client_id": Config.SS_CLIENT_ID,
@@ -15,8 +43,79 @@ def get_access_token():
         )
         resp.raise_for_status()
     except Exception as e:
-        return None, {"error": "Failed to fetch token", "detail": str(e)}
+        return None, {"error": "Failed to fetch token", "detail": str(e)}, 0
 
     data = resp.json()
     token = data.get("access_token") or data.get("accessToken")
-    return token, None
+    try:
+        ttl = int(data.get("expires_in") or DEFAULT_TOKEN_TTL)
+    except (TypeError, ValueError):
+        ttl = DEFAULT_TOKEN_TTL
+    return token, None, ttl
+
+
+def get_access_token():
+    global _inflight
+
+    with _lock:
+        if _token and time.time() < _expires_at:
+            return _token, None
+        if _failure and time.time() < _failure["until"]:
+            return None, _failure["error"]
+
+        flight = _inflight
+        leader = flight is None
+        if leader:
+            flight = _inflight = {"done": threading.Event(), "result": None}
+
+    if not leader:
+        flight["done"].wait()
+        return flight["result"]
+
+    result = (None, {"error": "Failed to fetch token", "detail": "unknown"})
+    try:
+        result = _refresh()
+    finally:
+        with _lock:
+            _inflight = None
+        flight["result"] = result
+        flight["done"].set()
+    return result
+
+
+def _refresh():
+    """Fetch token (di luar lock) lalu simpan hasilnya. Return (token, err)."""
+    global _token, _expires_at, _failure
+
+    try:
+        token, err, ttl = _fetch_token()
+    except Exception as e:
+        token, err, ttl = None, {"error": "Failed to fetch token", "detail": str(e)}, 0
+
+    with _lock:
+        if err:
+            _failure = {"error": err, "until": time.time() + Config.TOKEN_ERROR_CACHE_SECONDS}
+            return None, err
+
+        _failure = None
+        if token:
+            _token = token
+            _expires_at = time.time() + max(ttl - Config.TOKEN_REFRESH_MARGIN, 0)
+        return token, None
+
+
+def invalidate_token(token=None):
+    """Buang token cache (hanya jika masih token yang sama, supaya refresh paralel tidak terbuang)."""
+    global _token, _expires_at
+    with _lock:
+        if token is None or token == _token:
+            _token = None
+            _expires_at = 0.0
+
+
+def token_status():
+    with _lock:
+        return {
+            "cached": bool(_token),
+            "expires_in_seconds": round(max(_expires_at - time.time(), 0), 1) if _token else None,
+        }
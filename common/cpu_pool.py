@@ -0,0 +1,187 @@
+import importlib
+import multiprocessing
+import os
+import resource
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import Config
+from common import tracing
+
+# ---------------------------------------------------------
+# Process pool untuk stage DICOM yang CPU-bound
+# (tag rewrite, transcoding, hashing).
+#
+# Data tidak di-pickle: yang dikirim ke worker hanya path file di workspace,
+# worker membaca / menulis file langsung (page cache dipakai bersama).
+# Per stage dicatat: jumlah call, error, antrian, waktu tunggu, CPU & wall time.
+# ---------------------------------------------------------
+
+_lock = threading.Lock()
+_pool = None
+_stats = {}
+_queued = 0
+
+
+def _cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # Termasuk proses anak (dcmodify, dcmcjpls, ...) yang dijalankan stage
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _run_measured(fn, args, kwargs):
+    """Dijalankan di worker: return (hasil, waktu mulai, cpu detik, wall detik)."""
+    started = time.time()
+    cpu_before = _cpu_seconds()
+    result = fn(*args, **kwargs)
+    return result, started, _cpu_seconds() - cpu_before, time.time() - started
+
+
+def in_pool_worker():
+    """
+    True jika dipanggil di worker pool. Worker spawn meng-import ulang script
+    utama (mis. `python app.py` sebagai __mp_main__), jadi kode level modul yang
+    menjalankan service harus dicek dengan ini.
+    Saat import ulang itu parent_process() belum diset; yang sudah diset baru
+    nama proses (mis. SpawnProcess-1).
+    """
+    return multiprocessing.parent_process() is not None or multiprocessing.current_process().name != "MainProcess"
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # spawn: aman dipakai dari proses multi-thread (Flask)
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.CPU_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool(broken):
+    """Ganti pool yang rusak (worker mati: OOM kill, segfault) dengan pool baru saat dipakai berikutnya."""
+    global _pool
+    with _lock:
+        if _pool is not broken:
+            # Sudah diganti oleh thread lain
+            return
+        _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+    print("[!] CPU pool rusak (worker mati), pool dibuat ulang")
+
+
+def _submit(fn, args, kwargs):
+    """
+    Submit ke pool; jika pool rusak, buat ulang dan coba sekali lagi.
+    Jika percobaan ulang juga mematikan worker, hanya call ini yang gagal.
+    """
+    for attempt in range(2):
+        pool = _get_pool()
+        try:
+            return pool.submit(_run_measured, fn, args, kwargs).result()
+        except BrokenProcessPool:
+            _reset_pool(pool)
+            if attempt:
+                raise
+
+
+def _record(stage, queue_wait, cpu, wall, error=False):
+    with _lock:
+        s = _stats.setdefault(stage, {
+            "calls": 0,
+            "errors": 0,
+            "queue_wait_seconds": 0.0,
+            "cpu_seconds": 0.0,
+            "wall_seconds": 0.0,
+            "max_wall_seconds": 0.0,
+        })
+        s["calls"] += 1
+        s["errors"] += int(error)
+        s["queue_wait_seconds"] += queue_wait
+        s["cpu_seconds"] += cpu
+        s["wall_seconds"] += wall
+        s["max_wall_seconds"] = max(s["max_wall_seconds"], wall)
+
+
+def run_stage(stage, fn, *args, **kwargs):
+    """
+    Jalankan fn(*args) di process pool (atau inline jika CPU_POOL_ENABLED=false)
+    dan tunggu hasilnya. fn harus fungsi top-level yang bisa di-import worker.
+    """
+    with tracing.span(f"cpu:{stage}") as sp:
+        result, queue_wait, cpu = _run_stage(stage, fn, args, kwargs)
+        if sp:
+            sp.set("queue_wait_ms", round(queue_wait * 1000, 2))
+            sp.set("cpu_ms", round(cpu * 1000, 2))
+        return result
+
+
+def _run_stage(stage, fn, args, kwargs):
+    global _queued
+
+    if not Config.CPU_POOL_ENABLED:
+        submitted = time.time()
+        try:
+            result, started, cpu, wall = _run_measured(fn, args, kwargs)
+        except Exception:
+            _record(stage, 0.0, 0.0, time.time() - submitted, error=True)
+            raise
+        _record(stage, 0.0, cpu, wall)
+        return result, 0.0, cpu
+
+    with _lock:
+        _queued += 1
+
+    submitted = time.time()
+    try:
+        result, started, cpu, wall = _submit(fn, args, kwargs)
+    except Exception:
+        _record(stage, 0.0, 0.0, time.time() - submitted, error=True)
+        raise
+    finally:
+        with _lock:
+            _queued -= 1
+
+    queue_wait = max(0.0, started - submitted)
+    _record(stage, queue_wait, cpu, wall)
+    return result, queue_wait, cpu
+
+
+def _warm(modules):
+    """Dijalankan di worker: import modul stage supaya job pertama tidak membayar import."""
+    for name in modules:
+        importlib.import_module(name)
+    return os.getpid()
+
+
+def warm_up(modules=(), timeout=None):
+    """Spawn semua worker pool sekarang (bukan saat job pertama). Return jumlah worker yang siap."""
+    if not Config.CPU_POOL_ENABLED or in_pool_worker():
+        return 0
+    pool = _get_pool()
+    futures = [pool.submit(_warm, tuple(modules)) for _ in range(Config.CPU_POOL_WORKERS)]
+    return len({f.result(timeout=timeout) for f in futures})
+
+
+def get_pool_stats():
+    with _lock:
+        stages = {name: dict(s) for name, s in _stats.items()}
+        queued = _queued
+
+    for s in stages.values():
+        calls = s["calls"] or 1
+        s["avg_queue_wait_seconds"] = round(s["queue_wait_seconds"] / calls, 4)
+        s["avg_cpu_seconds"] = round(s["cpu_seconds"] / calls, 4)
+
+    return {
+        "enabled": Config.CPU_POOL_ENABLED,
+        "workers": Config.CPU_POOL_WORKERS,
+        "host_cpus": os.cpu_count(),
+        "queue_depth": queued,
+        "stages": stages,
+    }
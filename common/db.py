@@ -0,0 +1,18 @@
+import os
+import sqlite3
+
+
+def connect(path):
+    """
+    Buka koneksi SQLite untuk store lokal (outbox, index, dll).
+    WAL + busy_timeout supaya aman dipakai bersamaan oleh beberapa thread/worker.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
@@ -0,0 +1,234 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from config import Config
+from common.db import connect
+from common.cpu_pool import run_stage
+from common import metrics
+
+# ---------------------------------------------------------
+# Cache lokal instance DICOM hasil WADO
+#
+# entries : (SOPInstanceUID, meta_hash) → content_sha
+# blobs   : content_sha → file blobs/<sha[:2]>/<sha>.dcm (content-addressed)
+#
+# Tulis file via tmp + os.replace (atomik), index di SQLite sehingga aman
+# dipakai beberapa worker sekaligus. Eviction LRU berdasarkan byte budget.
+# ---------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    sop_uid     TEXT NOT NULL,
+    meta_hash   TEXT NOT NULL,
+    content_sha TEXT NOT NULL,
+    PRIMARY KEY (sop_uid, meta_hash)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    content_sha TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_blobs_lru ON blobs (last_access);
+"""
+
+_lock = threading.Lock()
+_initialized = False
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "bytes_saved": 0,
+    "bytes_stored": 0,
+    "evictions": 0,
+}
+
+
+def _conn():
+    global _initialized
+    conn = connect(os.path.join(Config.DICOM_CACHE_DIR, "index.db"))
+    if not _initialized:
+        with _lock:
+            if not _initialized:
+                conn.executescript(_SCHEMA)
+                _initialized = True
+    return conn
+
+
+def _count(key, value=1):
+    with _lock:
+        _stats[key] += value
+
+    # Diekspor juga ke /metrics
+    if key == "hits":
+        metrics.DICOM_CACHE_LOOKUPS.inc(value, result="hit")
+    elif key == "misses":
+        metrics.DICOM_CACHE_LOOKUPS.inc(value, result="miss")
+    elif key == "bytes_saved":
+        metrics.DICOM_CACHE_BYTES.inc(value, kind="saved")
+    elif key == "bytes_stored":
+        metrics.DICOM_CACHE_BYTES.inc(value, kind="stored")
+    elif key == "evictions" and value:
+        metrics.DICOM_CACHE_EVICTIONS.inc(value)
+
+
+def _blob_path(content_sha):
+    return os.path.join(Config.DICOM_CACHE_DIR, "blobs", content_sha[:2], f"{content_sha}.dcm")
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------
+# Lookup / store
+# ---------------------------------------------------------
+def _lookup(sop_uid, meta_hash):
+    conn = _conn()
+    try:
+        row = conn.execute(
+            "SELECT b.content_sha, b.size FROM entries e JOIN blobs b ON b.content_sha = e.content_sha "
+            "WHERE e.sop_uid = ? AND e.meta_hash = ?",
+            (sop_uid, meta_hash),
+        ).fetchone()
+        if not row:
+            return None
+
+        conn.execute("UPDATE blobs SET last_access = ? WHERE content_sha = ?", (time.time(), row["content_sha"]))
+        return row["content_sha"], row["size"]
+    finally:
+        conn.close()
+
+
+def _store(sop_uid, meta_hash, source_path):
+    content_sha = run_stage("hash", file_sha256, source_path)
+    blob = _blob_path(content_sha)
+    size = os.path.getsize(source_path)
+
+    if not os.path.exists(blob):
+        folder = os.path.dirname(blob)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as dst, open(source_path, "rb") as src:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(tmp, blob)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        _count("bytes_stored", size)
+
+    conn = _conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO blobs (content_sha, size, last_access) VALUES (?, ?, ?) "
+            "ON CONFLICT(content_sha) DO UPDATE SET last_access = excluded.last_access",
+            (content_sha, size, time.time()),
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (sop_uid, meta_hash, content_sha) VALUES (?, ?, ?)",
+            (sop_uid, meta_hash, content_sha),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    evict()
+
+
+def evict():
+    """Hapus blob paling lama tidak diakses sampai total ≤ DICOM_CACHE_MAX_BYTES."""
+    conn = _conn()
+    removed = []
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+        if total > Config.DICOM_CACHE_MAX_BYTES:
+            for row in conn.execute("SELECT content_sha, size FROM blobs ORDER BY last_access").fetchall():
+                if total <= Config.DICOM_CACHE_MAX_BYTES:
+                    break
+                conn.execute("DELETE FROM entries WHERE content_sha = ?", (row["content_sha"],))
+                conn.execute("DELETE FROM blobs WHERE content_sha = ?", (row["content_sha"],))
+                removed.append(row["content_sha"])
+                total -= row["size"]
+
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    metrics.DICOM_CACHE_USED_BYTES.set(total)
+    # File dihapus setelah commit; pembaca yang sedang membuka file tetap aman (unlink)
+    for content_sha in removed:
+        try:
+            os.remove(_blob_path(content_sha))
+        except FileNotFoundError:
+            pass
+    _count("evictions", len(removed))
+
+
+def fetch(study_uid, inst, target_path, downloader):
+    """
+    Salin instance dari cache ke target_path jika ada (hit),
+    jika tidak panggil downloader(study_uid, inst, target_path) lalu simpan ke cache.
+    """
+    if not Config.DICOM_CACHE_ENABLED:
+        downloader(study_uid, inst, target_path)
+        return False
+
+    found = _lookup(inst["sop"], inst["meta_hash"])
+    if found:
+        content_sha, size = found
+        try:
+            shutil.copyfile(_blob_path(content_sha), target_path)
+            _count("hits")
+            _count("bytes_saved", size)
+            return True
+        except FileNotFoundError:
+            # Blob ter-evict oleh worker lain di antara lookup & copy
+            pass
+
+    _count("misses")
+    downloader(study_uid, inst, target_path)
+
+    try:
+        _store(inst["sop"], inst["meta_hash"], target_path)
+    except Exception as e:
+        # Cache bersifat best-effort; jangan gagalkan pengiriman
+        print(f"[!] DICOM cache store failed: {e}")
+
+    return False
+
+
+def get_cache_stats():
+    with _lock:
+        stats = dict(_stats)
+
+    stats["enabled"] = Config.DICOM_CACHE_ENABLED
+    stats["max_bytes"] = Config.DICOM_CACHE_MAX_BYTES
+
+    if Config.DICOM_CACHE_ENABLED:
+        conn = _conn()
+        try:
+            row = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            stats["blobs"], stats["bytes_used"] = row[0], row[1]
+        finally:
+            conn.close()
+
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+    return stats
@@ -0,0 +1,258 @@
+import mmap
+import os
+import shutil
+import struct
+
+# ---------------------------------------------------------
+# Parser ringan header DICOM Part-10 (tanpa library eksternal)
+# ---------------------------------------------------------
+
+# VR explicit dengan length 4 byte (2 byte reserved setelah VR)
+LONG_VRS = {b"OB", b"OD", b"OF", b"OL", b"OV", b"OW", b"SQ", b"SV", b"UC", b"UN", b"UR", b"UT", b"UV"}
+
+UNCOMPRESSED_SYNTAXES = {
+    "1.2.840.10008.1.2",    # Implicit VR Little Endian
+    "1.2.840.10008.1.2.1",  # Explicit VR Little Endian
+    "1.2.840.10008.1.2.2",  # Explicit VR Big Endian
+}
+
+
+class DicomHeaderError(Exception):
+    pass
+
+
+def read_file_meta(f):
+    """
+    Baca File Meta Information (group 0002, selalu explicit VR LE).
+    Return (dict tag → bytes value, offset awal dataset).
+    """
+    f.seek(0)
+    preamble = f.read(132)
+    if len(preamble) < 132 or preamble[128:132] != b"DICM":
+        raise DicomHeaderError("Not a DICOM Part-10 file")
+
+    meta = {}
+    offset = 132
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            break
+
+        group, element = struct.unpack("<HH", head[:4])
+        if group != 0x0002:
+            break
+
+        vr = head[4:6]
+        if vr in LONG_VRS:
+            length = struct.unpack("<I", f.read(4))[0]
+            header_len = 12
+        else:
+            length = struct.unpack("<H", head[6:8])[0]
+            header_len = 8
+
+        meta[(group, element)] = f.read(length)
+        offset += header_len + length
+
+    return meta, offset
+
+
+def read_transfer_syntax(path):
+    with open(path, "rb") as f:
+        meta, _ = read_file_meta(f)
+    value = meta.get((0x0002, 0x0010))
+    if value is None:
+        raise DicomHeaderError("Transfer Syntax UID not found")
+    return value.rstrip(b"\x00 ").decode("ascii")
+
+
+# ---------------------------------------------------------
+# Patch tag header (PatientID, AccessionNumber) tanpa membaca pixel data
+# ---------------------------------------------------------
+UNDEFINED_LENGTH = 0xFFFFFFFF
+
+EXPLICIT_LE_SYNTAXES_PREFIX = ("1.2.840.10008.1.2.4.", "1.2.840.10008.1.2.5")
+IMPLICIT_LE = "1.2.840.10008.1.2"
+EXPLICIT_LE = "1.2.840.10008.1.2.1"
+
+# VR default jika elemen belum ada di file
+DEFAULT_VR = {
+    (0x0008, 0x0050): b"SH",  # AccessionNumber
+    (0x0010, 0x0020): b"LO",  # PatientID
+}
+
+
+def _dataset_encoding(syntax):
+    """Return True (explicit VR LE) / False (implicit VR LE); None jika tidak didukung."""
+    if syntax == IMPLICIT_LE:
+        return False
+    if syntax == EXPLICIT_LE or syntax.startswith(EXPLICIT_LE_SYNTAXES_PREFIX):
+        return True
+    # Deflate / big endian: header tidak bisa di-patch langsung
+    return None
+
+
+def _element_header(buf, pos, explicit):
+    """Return (tag, vr, header_len, value_len) elemen di posisi pos."""
+    group, element = struct.unpack_from("<HH", buf, pos)
+
+    if group == 0xFFFE:
+        # Item & delimiter selalu berbentuk implicit
+        return (group, element), None, 8, struct.unpack_from("<I", buf, pos + 4)[0]
+
+    if not explicit:
+        return (group, element), None, 8, struct.unpack_from("<I", buf, pos + 4)[0]
+
+    vr = bytes(buf[pos + 4:pos + 6])
+    if vr in LONG_VRS:
+        return (group, element), vr, 12, struct.unpack_from("<I", buf, pos + 8)[0]
+    return (group, element), vr, 8, struct.unpack_from("<H", buf, pos + 6)[0]
+
+
+def _skip_sequence(buf, pos, explicit):
+    """pos = awal value sequence undefined-length. Return posisi setelah (FFFE,E0DD)."""
+    while True:
+        tag, _, _, length = _element_header(buf, pos, explicit)
+        if tag == (0xFFFE, 0xE0DD):
+            return pos + 8
+        if tag != (0xFFFE, 0xE000):
+            raise DicomHeaderError(f"Unexpected tag {tag} inside sequence")
+
+        if length == UNDEFINED_LENGTH:
+            pos += 8
+            while True:
+                tag, _, _, _ = _element_header(buf, pos, explicit)
+                if tag == (0xFFFE, 0xE00D):
+                    pos += 8
+                    break
+                pos = _skip_element(buf, pos, explicit)
+        else:
+            pos += 8 + length
+
+
+def _skip_element(buf, pos, explicit):
+    _, _, header_len, length = _element_header(buf, pos, explicit)
+    if length == UNDEFINED_LENGTH:
+        return _skip_sequence(buf, pos + header_len, explicit)
+    return pos + header_len + length
+
+
+def _encode_element(tag, vr, raw, explicit):
+    head = struct.pack("<HH", *tag)
+    if not explicit:
+        return head + struct.pack("<I", len(raw)) + raw
+    if vr in LONG_VRS:
+        return head + vr + b"\x00\x00" + struct.pack("<I", len(raw)) + raw
+    return head + vr + struct.pack("<H", len(raw)) + raw
+
+
+def _locate(buf, start, tags, explicit):
+    """
+    Jalan di elemen top-level sampai melewati tag terbesar yang dicari.
+    Return (found: tag → (pos, vr, header_len, length), insert_at: tag → pos).
+    """
+    found = {}
+    insert_at = {}
+    last = max(tags)
+    groups = {t[0] for t in tags}
+    pos = start
+
+    while pos < len(buf):
+        tag, vr, header_len, length = _element_header(buf, pos, explicit)
+
+        for t in tags:
+            if t not in found and t not in insert_at and tag > t:
+                insert_at[t] = pos
+        if tag > last:
+            break
+
+        if tag[1] == 0x0000 and tag[0] in groups:
+            # Group length harus ikut diupdate → serahkan ke dcmodify
+            raise DicomHeaderError("Group length element present")
+        if tag in tags:
+            if length == UNDEFINED_LENGTH:
+                raise DicomHeaderError(f"Undefined length for {tag}")
+            found[tag] = (pos, vr, header_len, length)
+
+        pos = _skip_element(buf, pos, explicit)
+
+    for t in tags:
+        if t not in found and t not in insert_at:
+            insert_at[t] = pos
+
+    return found, insert_at
+
+
+def patch_elements(path, values):
+    """
+    Ubah elemen string top-level (mis. {(0x0010, 0x0020): "P123"}) langsung di file.
+
+    - Nilai baru muat di panjang lama → ditulis in-place lewat mmap (padding spasi).
+    - Tidak muat / elemen belum ada → hanya prefix header yang disusun ulang,
+      sisa file (pixel data) disalin byte-per-byte ke file baru lalu di-rename.
+
+    Return False jika file tidak bisa di-patch dengan aman (caller fallback ke dcmodify).
+    """
+    try:
+        encoded = {tag: value.encode("ascii") for tag, value in values.items()}
+    except UnicodeEncodeError:
+        return False
+    encoded = {tag: raw + b" " if len(raw) % 2 else raw for tag, raw in encoded.items()}
+
+    with open(path, "r+b") as f:
+        try:
+            meta, start = read_file_meta(f)
+        except (DicomHeaderError, struct.error):
+            return False
+
+        syntax = (meta.get((0x0002, 0x0010)) or b"").rstrip(b"\x00 ").decode("ascii", "replace")
+        explicit = _dataset_encoding(syntax)
+        if explicit is None:
+            return False
+
+        size = os.fstat(f.fileno()).st_size
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_WRITE) as mm:
+            try:
+                found, insert_at = _locate(mm, start, sorted(encoded), explicit)
+            except (DicomHeaderError, struct.error):
+                return False
+
+            # edit: (awal, akhir, bytes pengganti) relatif ke file asli
+            in_place = []
+            splices = []
+            for tag, raw in encoded.items():
+                if tag in found:
+                    pos, vr, header_len, length = found[tag]
+                    value_pos = pos + header_len
+                    if len(raw) <= length:
+                        in_place.append((value_pos, value_pos + length, raw.ljust(length, b" ")))
+                    else:
+                        element = _encode_element(tag, vr or DEFAULT_VR.get(tag, b"LO"), raw, explicit)
+                        splices.append((pos, value_pos + length, element))
+                else:
+                    element = _encode_element(tag, DEFAULT_VR.get(tag, b"LO"), raw, explicit)
+                    splices.append((insert_at[tag], insert_at[tag], element))
+
+            if not splices:
+                for begin, end, data in in_place:
+                    mm[begin:end] = data
+                mm.flush()
+                return True
+
+            # Susun ulang prefix header saja
+            edits = sorted(in_place + splices, key=lambda e: e[0], reverse=True)
+            prefix_end = max(end for _, end, _ in edits)
+            prefix = bytearray(mm[:prefix_end])
+            for begin, end, data in edits:
+                prefix[begin:end] = data
+
+    tmp = path + ".patch"
+    try:
+        with open(path, "rb") as src, open(tmp, "wb") as dst:
+            dst.write(prefix)
+            src.seek(prefix_end)
+            shutil.copyfileobj(src, dst, 4 * 1024 * 1024)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return True
@@ -1,5 +1,13 @@
-import requests
+from common import http
+from common.auth import invalidate_token
+from common.metrics import instrumented
 
+
+def _resource_type(url, token, resource):
+    return (resource or {}).get("resourceType") or url.rstrip("/").rsplit("/", 1)[-1]
+
+
+@instrumented("post_fhir", is_error=lambda r: r[1] >= 400, resource=_resource_type, span=True, log=True)
 def post_fhir(url, token, resource):
     headers = {
         "Authorization": f"Bearer {token}",
@@ -7,10 +15,14 @@ def post_fhir(url, token, resource):
     }
 
     try:
-        resp = requests.post(url, json=resource, headers=headers, timeout=20)
+        resp = http.post(url, json=resource, headers=headers, timeout=20)
     except Exception as e:
         return {"error": "Failed to POST resource", "detail": str(e)}, 502
 
+    # Token ditolak (dicabut / kedaluwarsa lebih cepat) → request berikutnya ambil token baru
+    if resp.status_code == 401:
+        invalidate_token(token)
+
     ctype = resp.headers.get("Content-Type", "")
     if "json" in ctype:
         try:
@@ -0,0 +1,199 @@
+import atexit
+import glob
+import gzip
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+# ---------------------------------------------------------
+# HTTP client bersama untuk upstream (SatuSehat OAuth/FHIR, dcm4chee)
+#
+# - Satu requests.Session → koneksi keep-alive dipakai ulang antar request
+# - Recorder (HTTP_RECORD_FILE): satu baris JSON per request ke file gzip,
+#   berisi method, path (ID / UID / ACSN diganti ":id"), nama parameter query,
+#   status, waktu sampai header response dan ukuran. Body, nilai query dan
+#   header (token) tidak pernah direkam → aman dari PHI.
+#   File ini dipakai `python -m fakes --replay` untuk memutar ulang latency.
+#   Setiap proses (worker gunicorn) menulis file sendiri dengan PID di nama
+#   (upstream.<pid>.ndjson.gz); read_recording menggabungkan semuanya.
+# ---------------------------------------------------------
+
+# Segmen path yang berisi angka panjang, UID bertitik atau UUID → dianggap identitas
+_ID_SEGMENT = re.compile(r"\d{3,}|^\d+(\.\d+)+$|^[0-9a-fA-F-]{32,36}$")
+
+_session = None
+_session_lock = threading.Lock()
+
+_recorder = None
+_recorder_pid = None
+_recorder_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=Config.HTTP_POOL_SIZE)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
+
+
+# ---------------------------------------------------------
+# Redaksi & klasifikasi
+# ---------------------------------------------------------
+def redact_path(path):
+    return "/".join(":id" if _ID_SEGMENT.search(seg) else seg for seg in path.split("/"))
+
+
+def upstream_of(url):
+    """Nama upstream dari URL (dicocokkan dengan Config), 'other' jika tidak dikenal."""
+    for name, base in (
+        ("satusehat_auth", Config.SS_AUTH_URL),
+        ("satusehat_fhir", Config.SS_BASE_URL),
+        ("dcm4chee", Config.DCM4CHEE_URL),
+    ):
+        if base and url.startswith(base.rstrip("/")):
+            return name
+    return "other"
+
+
+def _query_keys(url, params):
+    keys = {k for k, _ in parse_qsl(urlsplit(url).query, keep_blank_values=True)}
+    if isinstance(params, dict):
+        keys.update(params)
+    return sorted(keys)
+
+
+# ---------------------------------------------------------
+# Recorder
+# ---------------------------------------------------------
+def _split_record_path(path):
+    """"data/upstream.ndjson.gz" → ("data/upstream", ".ndjson.gz")."""
+    folder, name = os.path.split(path)
+    stem, dot, ext = name.partition(".")
+    return os.path.join(folder, stem), dot + ext
+
+
+def record_path(path=None, pid=None):
+    """File rekaman proses ini: <nama>.<pid>.<ext> (gzip tidak aman di-append banyak proses)."""
+    root, ext = _split_record_path(path or Config.HTTP_RECORD_FILE)
+    return f"{root}.{pid or os.getpid()}{ext}"
+
+
+def _record(method, url, params, status, elapsed, resp=None):
+    global _recorder, _recorder_pid, _last_flush
+
+    entry = {
+        "t": round(time.time(), 3),
+        "up": upstream_of(url),
+        "m": method,
+        "p": redact_path(urlsplit(url).path),
+        "q": _query_keys(url, params),
+        "s": status,
+        "ms": round(elapsed * 1000, 2),
+    }
+    if resp is not None:
+        length = resp.headers.get("Content-Length")
+        entry["b"] = int(length) if length and length.isdigit() else None
+        entry["ct"] = resp.headers.get("Content-Type", "").split(";")[0]
+    line = json.dumps(entry, separators=(",", ":")) + "\n"
+
+    with _recorder_lock:
+        if _recorder is None or _recorder_pid != os.getpid():
+            # Proses hasil fork tidak memakai file milik parent
+            path = record_path()
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # Append sebagai gzip member baru; gzip.open membaca semua member berurutan
+            _recorder = gzip.open(path, "at", encoding="utf-8")
+            _recorder_pid = os.getpid()
+            atexit.register(stop_recorder)
+        _recorder.write(line)
+        # Flush berkala (bukan per baris) supaya kompresi tetap efektif;
+        # jika proses di-kill, yang hilang paling banyak ~1 detik terakhir
+        now = time.monotonic()
+        if now - _last_flush >= 1.0:
+            _recorder.flush()
+            _last_flush = now
+
+
+def stop_recorder():
+    global _recorder
+    with _recorder_lock:
+        if _recorder is not None:
+            _recorder.close()
+            _recorder = None
+
+
+def recording_files(path):
+    """File rekaman untuk `path`: file itu sendiri dan/atau semua file per PID (<nama>.<pid>.<ext>)."""
+    root, ext = _split_record_path(path)
+    files = [f for f in glob.glob(f"{glob.escape(root)}.*{glob.escape(ext)}")
+             if f[len(root) + 1:len(f) - len(ext)].isdigit()]
+    if os.path.exists(path):
+        files.append(path)
+    return sorted(files)
+
+
+def read_recording(path):
+    """Iterator entry dari rekaman (gzip NDJSON), semua file per PID digabung urut waktu."""
+    files = recording_files(path)
+    if not files:
+        raise FileNotFoundError(path)
+    return heapq.merge(*(_read_file(f) for f in files), key=lambda e: e.get("t", 0))
+
+
+def _read_file(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        except EOFError:
+            # Member terakhir terpotong (proses mati sebelum file ditutup)
+            return
+
+
+# ---------------------------------------------------------
+# API
+# ---------------------------------------------------------
+def request(method, url, **kwargs):
+    if not Config.HTTP_RECORD_FILE:
+        return session().request(method, url, **kwargs)
+
+    started = time.perf_counter()
+    try:
+        resp = session().request(method, url, **kwargs)
+    except requests.RequestException:
+        _record(method, url, kwargs.get("params"), 0, time.perf_counter() - started)
+        raise
+
+    # elapsed = sampai header diterima (juga untuk stream=True)
+    _record(method, url, kwargs.get("params"), resp.status_code, resp.elapsed.total_seconds(), resp)
+    return resp
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
@@ -0,0 +1,116 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from config import Config
+from common.db import connect
+
+# ---------------------------------------------------------
+# State job bersama antar worker (SQLite, JOBS_DB)
+#
+# Progress job async, koordinasi job per study dan slot job DICOM disimpan
+# di sini (bukan di memori proses), sehingga request boleh mendarat di
+# worker gunicorn mana pun dan batas berlaku untuk seluruh host.
+# Setiap baris mencatat pid pemiliknya; baris milik proses yang sudah mati
+# (worker crash / di-kill) dibersihkan oleh pembaca berikutnya.
+# State ini sementara: synchronous=NORMAL (WAL) cukup, tidak perlu fsync per event.
+# ---------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS progress_job (
+    job_id           TEXT PRIMARY KEY,
+    kind             TEXT NOT NULL,
+    pid              INTEGER NOT NULL,
+    created          REAL NOT NULL,
+    finished         REAL,
+    state            TEXT NOT NULL,
+    transfer_started REAL,
+    last_event       INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS progress_event (
+    job_id   TEXT NOT NULL,
+    event_id INTEGER NOT NULL,
+    event    TEXT NOT NULL,
+    data     TEXT NOT NULL,
+    PRIMARY KEY (job_id, event_id)
+);
+CREATE TABLE IF NOT EXISTS study_job (
+    job_id    TEXT PRIMARY KEY,
+    job_key   TEXT NOT NULL,
+    study_uid TEXT NOT NULL,
+    pid       INTEGER NOT NULL,
+    state     TEXT NOT NULL,
+    created   REAL NOT NULL,
+    attached  INTEGER NOT NULL DEFAULT 0,
+    result    TEXT,
+    status    INTEGER,
+    finished  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_study_job_key ON study_job (job_key, finished);
+CREATE INDEX IF NOT EXISTS idx_study_job_study ON study_job (study_uid, state);
+CREATE TABLE IF NOT EXISTS job_slot (
+    seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+    priority TEXT NOT NULL,
+    rank     INTEGER NOT NULL,
+    pid      INTEGER NOT NULL,
+    state    TEXT NOT NULL,
+    created  REAL NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+_initialized = False
+
+
+def _conn():
+    global _initialized
+    conn = connect(Config.JOBS_DB)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if not _initialized:
+        with _lock:
+            if not _initialized:
+                conn.executescript(_SCHEMA)
+                _initialized = True
+    return conn
+
+
+@contextmanager
+def read():
+    conn = _conn()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def write():
+    """Transaksi BEGIN IMMEDIATE (satu penulis sekaligus di seluruh host)."""
+    conn = _conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def dead_pids(conn, table, where="1"):
+    """PID pemilik baris `table` (memenuhi `where`) yang prosesnya sudah tidak ada."""
+    rows = conn.execute(f"SELECT DISTINCT pid FROM {table} WHERE {where}").fetchall()
+    return [row["pid"] for row in rows if not pid_alive(row["pid"])]
@@ -0,0 +1,155 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+
+from config import Config
+
+# ---------------------------------------------------------
+# Structured logging (JSON per baris) ke LOG_FILE
+#
+# Request thread hanya memasukkan record ke queue (QueueHandler, tidak
+# pernah blok: jika queue penuh record di-drop dan dihitung). Penulisan
+# ke disk + rotasi dilakukan QueueListener di background thread.
+# Rotasi (LOG_ROTATION): "size" hanya untuk satu proses; dengan beberapa
+# worker gunicorn pakai "per-process" (file per PID) atau "external" (logrotate).
+# Event per instance DICOM di-sample (LOG_INSTANCE_SAMPLE_RATE); error selalu ditulis.
+# ---------------------------------------------------------
+
+logger = logging.getLogger("gateway")
+logger.propagate = False
+
+# Call site yang dipanggil sekali per instance DICOM → di-sample
+PER_INSTANCE_CALLS = {"download_wado", "modify_dicom", "send_to_router"}
+
+_listener = None
+_lock = threading.Lock()
+_dropped = 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def enqueue(self, record):
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _lock:
+                _dropped += 1
+
+    def prepare(self, record):
+        # Formatting dilakukan di listener; cukup pastikan record bisa dipindah antar thread
+        return record
+
+
+def process_path(path):
+    """Path file untuk proses ini (per PID jika LOG_ROTATION=per-process). Dipakai juga TRACE_FILE."""
+    if Config.LOG_ROTATION == "per-process":
+        root, ext = os.path.splitext(path)
+        return f"{root}.{os.getpid()}{ext or '.log'}"
+    return path
+
+
+def log_path():
+    return process_path(Config.LOG_FILE)
+
+
+def file_handler(path, max_bytes, backup_count):
+    """Handler file sesuai LOG_ROTATION; folder dibuat jika belum ada."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if Config.LOG_ROTATION == "external":
+        # Buka ulang file saat di-rename logrotate; write O_APPEND per baris aman antar proses
+        return WatchedFileHandler(path, encoding="utf-8")
+    return RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+
+
+def setup_logging():
+    """Pasang QueueHandler + listener (rotating file). Aman dipanggil berulang."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        if not Config.LOG_FILE:
+            logger.addHandler(logging.NullHandler())
+            return
+
+        handler = file_handler(log_path(), Config.LOG_MAX_BYTES, Config.LOG_BACKUP_COUNT)
+        handler.setFormatter(JsonFormatter())
+
+        log_queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+        logger.addHandler(_DroppingQueueHandler(log_queue))
+        logger.setLevel(Config.LOG_LEVEL)
+
+        _listener = QueueListener(log_queue, handler, respect_handler_level=False)
+        _listener.start()
+        # Flush sisa queue saat proses berhenti
+        atexit.register(stop_logging)
+
+    print(f"[*] Structured logging → {log_path()} (rotasi: {Config.LOG_ROTATION})")
+
+
+def stop_logging():
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener:
+        listener.stop()
+
+
+def _trace_id():
+    # Import lokal: tracing ikut memakai logger ini
+    from common.tracing import current_trace_id
+    return current_trace_id()
+
+
+def log_event(event, level=logging.INFO, **fields):
+    if not logger.isEnabledFor(level):
+        return
+    if "trace_id" not in fields:
+        trace_id = _trace_id()
+        if trace_id:
+            fields["trace_id"] = trace_id
+    logger.log(level, event, extra={"fields": fields})
+
+
+def log_sampled(event, error=None, **fields):
+    """Event per instance DICOM: ditulis dengan peluang LOG_INSTANCE_SAMPLE_RATE, error selalu."""
+    if error is None:
+        if random.random() >= Config.LOG_INSTANCE_SAMPLE_RATE:
+            return
+        log_event(event, **fields)
+    else:
+        log_event(event, logging.WARNING, error=str(error), **fields)
+
+
+def log_call(call, duration, error=None, **fields):
+    """Log satu panggilan upstream; call site per instance di-sample kecuali gagal."""
+    fields = dict(fields, call=call, duration_ms=round(duration * 1000, 2))
+    if call in PER_INSTANCE_CALLS:
+        log_sampled("upstream_call", error, **fields)
+    elif error is None:
+        log_event("upstream_call", **fields)
+    else:
+        log_event("upstream_call", logging.WARNING, error=str(error), **fields)
+
+
+def get_logging_stats():
+    with _lock:
+        return {"file": log_path() if Config.LOG_FILE else None, "rotation": Config.LOG_ROTATION, "running": _listener is not None, "dropped": _dropped}
@@ -0,0 +1,228 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from common import tracing
+from common.logger import log_call
+
+# ---------------------------------------------------------
+# Metrics format Prometheus text (tanpa dependency tambahan)
+#
+# Counter / Gauge / Histogram dengan label; tiap metric punya lock
+# sendiri sehingga overhead di hot path hanya satu lock + bisect.
+# ---------------------------------------------------------
+
+# Detik; dari query cepat sampai storescu / WADO file besar
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def _samples(self):
+        with self._lock:
+            return [(k, v) for k, v in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self._samples()):
+            lines.append(f"{self.name}{_label_str(self.labelnames, key)} {_fmt(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [count per bucket (non-kumulatif) + overflow, sum, count]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][idx] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            return [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, (counts, total, count) in sorted(self._samples()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_fmt(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {count}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------
+# Metrics upstream (token, FHIR, QIDO, WADO, dcmodify, storescu)
+# ---------------------------------------------------------
+UPSTREAM_LATENCY = Histogram(
+    "gateway_upstream_duration_seconds", "Latency panggilan upstream per call site", ("call", "resource"),
+)
+UPSTREAM_ERRORS = Counter(
+    "gateway_upstream_errors_total", "Panggilan upstream yang gagal per call site", ("call", "resource"),
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "gateway_upstream_in_flight", "Panggilan upstream yang sedang berjalan", ("call",),
+)
+DICOM_BYTES = Counter(
+    "gateway_dicom_bytes_total", "Bytes DICOM (download dari PACS / kirim ke router)", ("direction",),
+)
+DICOM_INSTANCES = Counter(
+    "gateway_dicom_instances_total", "Instance DICOM per hasil (sent / skipped / failed)", ("result",),
+)
+
+# ---------------------------------------------------------
+# Cache DICOM lokal (common.dicom_cache)
+# ---------------------------------------------------------
+DICOM_CACHE_LOOKUPS = Counter(
+    "gateway_dicom_cache_lookups_total", "Lookup cache DICOM per hasil (hit / miss)", ("result",),
+)
+DICOM_CACHE_BYTES = Counter(
+    "gateway_dicom_cache_bytes_total", "Bytes cache DICOM (saved = tidak diunduh ulang, stored = ditulis)", ("kind",),
+)
+DICOM_CACHE_EVICTIONS = Counter(
+    "gateway_dicom_cache_evictions_total", "Blob cache DICOM yang di-evict (LRU)",
+)
+DICOM_CACHE_USED_BYTES = Gauge(
+    "gateway_dicom_cache_used_bytes", "Total ukuran blob di cache DICOM setelah eviction terakhir",
+)
+
+
+class _Call:
+    __slots__ = ("call", "resource", "error")
+
+    def __init__(self, call, resource):
+        self.call = call
+        self.resource = resource
+        self.error = False
+
+    def failed(self, message="error result"):
+        self.error = message
+
+
+@contextmanager
+def track(call, resource="", span=False, log=False):
+    """
+    Ukur satu panggilan upstream: latency, in-flight, error.
+    Exception otomatis dihitung error; error berupa nilai return ditandai via .failed().
+    Opt-in: span=True → child span di trace aktif; log=True → satu baris log JSON per panggilan.
+    """
+    handle = _Call(call, resource or "")
+    UPSTREAM_IN_FLIGHT.inc(call=call)
+    sp, token = tracing.start_span(call, resource=resource or None) if span else (None, None)
+    started = time.perf_counter()
+    try:
+        yield handle
+    except BaseException as e:
+        handle.error = e
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        UPSTREAM_IN_FLIGHT.dec(call=call)
+        UPSTREAM_LATENCY.observe(elapsed, call=call, resource=handle.resource)
+        if handle.error:
+            UPSTREAM_ERRORS.inc(call=call, resource=handle.resource)
+        if span:
+            tracing.end_span(sp, token, error=handle.error)
+        if log:
+            log_call(call, elapsed, error=handle.error or None, **({"resource": handle.resource} if handle.resource else {}))
+
+
+def instrumented(call, is_error=None, resource=None, span=False, log=False):
+    """
+    Decorator di atas track().
+    is_error(result) → True jika nilai return berarti gagal (mis. status ≥ 400).
+    resource(*args, **kwargs) → label resource (mis. resourceType FHIR).
+    span / log diteruskan ke track().
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            label = resource(*args, **kwargs) if resource else ""
+            with track(call, label, span=span, log=log) as handle:
+                result = fn(*args, **kwargs)
+                if is_error and is_error(result):
+                    handle.failed()
+                return result
+        return wrapper
+    return decorator
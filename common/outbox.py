@@ -0,0 +1,251 @@
+import json
+import threading
+import time
+import uuid
+
+from config import Config
+from common.db import connect
+
+# ---------------------------------------------------------
+# Durable outbox (SQLite)
+#
+# Satu "group" = satu submission (mis. batch1) berisi beberapa
+# step berurutan (Encounter → ServiceRequest → ...).
+# Step dikirim sesuai urutan seq; group berhenti di step yang gagal.
+# ---------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox_group (
+    seq          INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id     TEXT UNIQUE NOT NULL,
+    kind         TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    outputs      TEXT NOT NULL DEFAULT '{}',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error   TEXT,
+    created_at   REAL NOT NULL,
+    updated_at   REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox_step (
+    group_id      TEXT NOT NULL,
+    step_no       INTEGER NOT NULL,
+    resource_type TEXT NOT NULL,
+    resource      TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    resource_id   TEXT,
+    response      TEXT,
+    PRIMARY KEY (group_id, step_no)
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_group_due ON outbox_group (status, next_attempt, seq);
+"""
+
+_lock = threading.Lock()
+_initialized = False
+
+
+def _conn():
+    global _initialized
+    conn = connect(Config.OUTBOX_DB)
+    if not _initialized:
+        with _lock:
+            if not _initialized:
+                conn.executescript(_SCHEMA)
+                _initialized = True
+    return conn
+
+
+def create_group(kind, steps):
+    """
+    steps: list of (resource_type, resource_dict).
+    Return group_id.
+    """
+    group_id = str(uuid.uuid4())
+    now = time.time()
+
+    conn = _conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO outbox_group (group_id, kind, status, created_at, updated_at) "
+            "VALUES (?, ?, 'pending', ?, ?)",
+            (group_id, kind, now, now),
+        )
+        for step_no, (resource_type, resource) in enumerate(steps):
+            conn.execute(
+                "INSERT INTO outbox_step (group_id, step_no, resource_type, resource, status) "
+                "VALUES (?, ?, ?, ?, 'pending')",
+                (group_id, step_no, resource_type, json.dumps(resource)),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    return group_id
+
+
+def next_due_group():
+    """Ambil group pending tertua yang sudah jatuh tempo (FIFO)."""
+    conn = _conn()
+    try:
+        row = conn.execute(
+            "SELECT * FROM outbox_group WHERE status = 'pending' AND next_attempt <= ? "
+            "ORDER BY seq LIMIT 1",
+            (time.time(),),
+        ).fetchone()
+        return _group_dict(conn, row) if row else None
+    finally:
+        conn.close()
+
+
+def get_group(group_id):
+    conn = _conn()
+    try:
+        row = conn.execute("SELECT * FROM outbox_group WHERE group_id = ?", (group_id,)).fetchone()
+        return _group_dict(conn, row) if row else None
+    finally:
+        conn.close()
+
+
+def list_groups(status=None, limit=100):
+    conn = _conn()
+    try:
+        if status:
+            rows = conn.execute(
+                "SELECT * FROM outbox_group WHERE status = ? ORDER BY seq LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM outbox_group ORDER BY seq DESC LIMIT ?", (limit,)).fetchall()
+        return [_group_dict(conn, r, with_steps=False) for r in rows]
+    finally:
+        conn.close()
+
+
+def counts():
+    conn = _conn()
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM outbox_group GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+    finally:
+        conn.close()
+
+
+def mark_step_sent(group_id, step_no, resource_id, response, outputs):
+    """Step sukses; simpan id resource + outputs group. Group selesai jika semua step terkirim."""
+    now = time.time()
+    conn = _conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "UPDATE outbox_step SET status = 'sent', resource_id = ?, response = ? "
+            "WHERE group_id = ? AND step_no = ?",
+            (resource_id, json.dumps(response), group_id, step_no),
+        )
+        remaining = conn.execute(
+            "SELECT COUNT(*) FROM outbox_step WHERE group_id = ? AND status != 'sent'", (group_id,)
+        ).fetchone()[0]
+        conn.execute(
+            "UPDATE outbox_group SET outputs = ?, status = ?, attempts = 0, last_error = NULL, updated_at = ? "
+            "WHERE group_id = ?",
+            (json.dumps(outputs), "done" if remaining == 0 else "pending", now, group_id),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def mark_retry(group_id, error, delay):
+    now = time.time()
+    conn = _conn()
+    try:
+        conn.execute(
+            "UPDATE outbox_group SET attempts = attempts + 1, next_attempt = ?, last_error = ?, updated_at = ? "
+            "WHERE group_id = ?",
+            (now + delay, json.dumps(error), now, group_id),
+        )
+    finally:
+        conn.close()
+
+
+def mark_dead(group_id, step_no, error):
+    """Pindahkan group ke dead-letter; step yang gagal ditandai 'dead'."""
+    now = time.time()
+    conn = _conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "UPDATE outbox_step SET status = 'dead', response = ? WHERE group_id = ? AND step_no = ?",
+            (json.dumps(error), group_id, step_no),
+        )
+        conn.execute(
+            "UPDATE outbox_group SET status = 'dead', last_error = ?, updated_at = ? WHERE group_id = ?",
+            (json.dumps(error), now, group_id),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def replay(group_id):
+    """Kembalikan group dead-letter ke antrian. Step yang sudah terkirim tidak diulang."""
+    now = time.time()
+    conn = _conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.execute(
+            "UPDATE outbox_group SET status = 'pending', attempts = 0, next_attempt = 0, updated_at = ? "
+            "WHERE group_id = ? AND status = 'dead'",
+            (now, group_id),
+        )
+        conn.execute(
+            "UPDATE outbox_step SET status = 'pending', response = NULL WHERE group_id = ? AND status = 'dead'",
+            (group_id,),
+        )
+        conn.execute("COMMIT")
+        return cur.rowcount > 0
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _group_dict(conn, row, with_steps=True):
+    group = {
+        "group_id": row["group_id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "outputs": json.loads(row["outputs"] or "{}"),
+        "attempts": row["attempts"],
+        "next_attempt": row["next_attempt"],
+        "last_error": json.loads(row["last_error"]) if row["last_error"] else None,
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+    if with_steps:
+        steps = conn.execute(
+            "SELECT * FROM outbox_step WHERE group_id = ? ORDER BY step_no", (row["group_id"],)
+        ).fetchall()
+        group["steps"] = [
+            {
+                "step_no": s["step_no"],
+                "resource_type": s["resource_type"],
+                "resource": json.loads(s["resource"]),
+                "status": s["status"],
+                "resource_id": s["resource_id"],
+                "response": json.loads(s["response"]) if s["response"] else None,
+            }
+            for s in steps
+        ]
+
+    return group
@@ -0,0 +1,210 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from config import Config
+
+# ---------------------------------------------------------
+# Sampling profiler (tanpa dependency, tanpa restart)
+#
+# Stack semua thread diambil berkala via sys._current_frames().
+# Frame diringkas per fungsi (nama, file, baris def) supaya agregasi stabil.
+#
+# - On-demand : profile(seconds, interval) → Counter(stack → jumlah sample)
+# - Kontinu   : sampling rate rendah ke ring buffer (PROFILER_RING_SECONDS terakhir)
+#
+# Output: collapsed stacks (flamegraph.pl / speedscope) atau JSON speedscope.
+# ---------------------------------------------------------
+
+MAX_DEPTH = 128
+
+_run_lock = threading.Lock()
+_ring_lock = threading.Lock()
+_ring = deque()
+_continuous = None
+# Intern tuple frame/stack supaya ring buffer tidak menduplikasi string.
+# Hanya dipakai mode kontinu dan dibangun ulang dari isi ring saat eviction
+# (begitu tabel > 2x jumlah entry yang masih hidup), jadi tidak tumbuh tanpa batas.
+_interned = {}
+_interned_live = 0
+
+
+def _intern(table, value):
+    return table.setdefault(value, value)
+
+
+def _frame_key(table, frame):
+    code = frame.f_code
+    return _intern(table, (code.co_name, code.co_filename, code.co_firstlineno))
+
+
+def sample_once(skip_ident=None, table=None):
+    """Return list of stack (tuple root → leaf, diawali nama thread)."""
+    names = {t.ident: t.name for t in threading.enumerate()}
+    table = {} if table is None else table
+    stacks = []
+
+    for ident, frame in sys._current_frames().items():
+        if ident == skip_ident:
+            continue
+
+        frames = []
+        while frame is not None and len(frames) < MAX_DEPTH:
+            frames.append(_frame_key(table, frame))
+            frame = frame.f_back
+        frames.reverse()
+
+        thread = _intern(table, ("thread:" + names.get(ident, str(ident)), "", 0))
+        stacks.append(_intern(table, (thread, *frames)))
+
+    return stacks
+
+
+def profile(seconds, interval):
+    """Sampling on-demand. Return (Counter stack → sample, jumlah tick) atau None jika sedang berjalan."""
+    if not _run_lock.acquire(blocking=False):
+        return None
+
+    try:
+        me = threading.get_ident()
+        counts = Counter()
+        ticks = 0
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            counts.update(sample_once(skip_ident=me))
+            ticks += 1
+            time.sleep(interval)
+
+        return counts, ticks
+    finally:
+        _run_lock.release()
+
+
+# ---------------------------------------------------------
+# Mode kontinu (ring buffer)
+# ---------------------------------------------------------
+def _rebuild_interned():
+    """Sisakan hanya frame/stack yang masih direferensikan ring (dipanggil dengan _ring_lock)."""
+    global _interned_live
+    live = {}
+    for _, stacks in _ring:
+        for stack in stacks:
+            live[stack] = stack
+            for key in stack:
+                live[key] = key
+
+    _interned.clear()
+    _interned.update(live)
+    _interned_live = len(live)
+
+
+def _continuous_loop():
+    me = threading.get_ident()
+    interval = Config.PROFILER_CONTINUOUS_INTERVAL
+
+    while True:
+        now = time.time()
+        stacks = sample_once(skip_ident=me, table=_interned)
+
+        with _ring_lock:
+            _ring.append((now, stacks))
+            cutoff = now - Config.PROFILER_RING_SECONDS
+            evicted = False
+            while _ring and _ring[0][0] < cutoff:
+                _ring.popleft()
+                evicted = True
+
+            if evicted and len(_interned) > 2 * max(_interned_live, 1024):
+                _rebuild_interned()
+
+        time.sleep(interval)
+
+
+def start_continuous_profiler():
+    global _continuous
+    if _continuous and _continuous.is_alive():
+        return
+
+    _continuous = threading.Thread(target=_continuous_loop, name="profiler-continuous", daemon=True)
+    _continuous.start()
+    print(f"[*] Continuous profiler started (interval {Config.PROFILER_CONTINUOUS_INTERVAL}s, "
+          f"window {Config.PROFILER_RING_SECONDS}s)")
+
+
+def ring_profile(seconds=None):
+    """Agregasi sample kontinu `seconds` terakhir (default seluruh ring). Return (Counter, tick)."""
+    cutoff = time.time() - seconds if seconds else 0
+    counts = Counter()
+    ticks = 0
+
+    with _ring_lock:
+        samples = [stacks for ts, stacks in _ring if ts >= cutoff]
+
+    for stacks in samples:
+        counts.update(stacks)
+        ticks += 1
+    return counts, ticks
+
+
+def continuous_running():
+    return bool(_continuous and _continuous.is_alive())
+
+
+# ---------------------------------------------------------
+# Format output
+# ---------------------------------------------------------
+def _frame_label(key):
+    name, filename, line = key
+    if not filename:
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def to_collapsed(counts):
+    lines = []
+    for stack, n in counts.most_common():
+        labels = (_frame_label(k).replace(";", ":") for k in stack)
+        lines.append(f"{';'.join(labels)} {n}")
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(counts, interval, name="gateway"):
+    frames = []
+    index = {}
+    samples = []
+    weights = []
+
+    for stack, n in counts.most_common():
+        row = []
+        for key in stack:
+            if key not in index:
+                index[key] = len(frames)
+                fn, filename, line = key
+                frame = {"name": _frame_label(key) if not filename else fn}
+                if filename:
+                    frame["file"] = filename
+                    frame["line"] = line
+                frames.append(frame)
+            row.append(index[key])
+        samples.append(row)
+        weights.append(round(n * interval, 6))
+
+    total = round(sum(weights), 6)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": total,
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "satusehat-gateway",
+    }
@@ -0,0 +1,41 @@
+import os
+
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: tidak ada flock → selalu dianggap pemegang lock
+    fcntl = None
+
+# ---------------------------------------------------------
+# Lock satu pemegang per host (flock di DATA_DIR/<name>.lock)
+#
+# Dipakai agar service background yang cukup satu per host (outbox drainer,
+# webhook sender, watcher, temp sweeper) hanya berjalan di satu worker gunicorn.
+# Lock dilepas otomatis oleh kernel saat proses pemegang mati; worker
+# pengganti yang di-fork gunicorn akan mengambil alih.
+# ---------------------------------------------------------
+
+_held = {}
+
+
+def acquire(name):
+    """Coba ambil lock tanpa menunggu. Return True jika proses ini pemegangnya."""
+    if name in _held:
+        return True
+    if fcntl is None:
+        _held[name] = None
+        return True
+
+    path = os.path.join(Config.DATA_DIR, f"{name}.lock")
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode())
+    _held[name] = fd
+    return True
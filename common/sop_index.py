@@ -0,0 +1,76 @@
+import hashlib
+import json
+import threading
+import time
+
+from config import Config
+from common.db import connect
+
+# ---------------------------------------------------------
+# Sent-SOP index
+# (StudyUID, SOPInstanceUID) → hash modifikasi + hasil kirim ke router.
+# Dipakai process_dicom untuk melewati instance yang sudah sukses terkirim.
+# ---------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sop_sent (
+    study_uid  TEXT NOT NULL,
+    sop_uid    TEXT NOT NULL,
+    mod_hash   TEXT NOT NULL,
+    outcome    TEXT NOT NULL,
+    error      TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (study_uid, sop_uid)
+);
+"""
+
+_lock = threading.Lock()
+_initialized = False
+
+
+def _conn():
+    global _initialized
+    conn = connect(Config.SOP_INDEX_DB)
+    if not _initialized:
+        with _lock:
+            if not _initialized:
+                conn.executescript(_SCHEMA)
+                _initialized = True
+    return conn
+
+
+def modification_hash(metadata, patient_id=None, acc_num=None, target=None):
+    """
+    Hash dari metadata instance di PACS + perubahan tag yang diminta + tujuan kirim.
+    Berubah jika instance di PACS berubah atau tag override / router berbeda.
+    """
+    payload = json.dumps(
+        {"meta": metadata, "patient_id": patient_id, "acc_num": acc_num, "target": target},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def load_study(study_uid):
+    """Return {sop_uid: (mod_hash, outcome)} untuk satu study."""
+    conn = _conn()
+    try:
+        rows = conn.execute(
+            "SELECT sop_uid, mod_hash, outcome FROM sop_sent WHERE study_uid = ?", (study_uid,)
+        ).fetchall()
+        return {r["sop_uid"]: (r["mod_hash"], r["outcome"]) for r in rows}
+    finally:
+        conn.close()
+
+
+def record(study_uid, sop_uid, mod_hash, outcome, error=None):
+    conn = _conn()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO sop_sent (study_uid, sop_uid, mod_hash, outcome, error, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (study_uid, sop_uid, mod_hash, outcome, error, time.time()),
+        )
+    finally:
+        conn.close()
@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: tanpa flock → bucket per proses
+    fcntl = None
+
+# ---------------------------------------------------------
+# Bandwidth per priority class
+#
+# Satu token bucket (bytes/detik) per (class, arah) — arah: "download" (WADO)
+# atau "send" (router). Rate 0 = tidak dibatasi. Di dalam BULK_FULL_SPEED_WINDOWS
+# class "bulk" tidak dibatasi.
+#
+# - download: shaping sebenarnya, token diambil per chunk saat stream WADO.
+# - send    : admission pacing. storescu adalah proses terpisah yang mengirim
+#             satu file dengan kecepatan penuh; ukuran file dibayar sebelum
+#             kirim sehingga rata-rata lintas file <= rate, bukan di dalam file.
+#
+# State bucket disimpan di DATA_DIR/throttle.state (flock) sehingga batas
+# berlaku untuk semua worker gunicorn di host, bukan per proses.
+# ---------------------------------------------------------
+
+PRIORITIES = ("stat", "routine", "bulk")
+
+_lock = threading.Lock()
+# fd state file per proses (dibuka ulang setelah fork: flock melekat ke open file description)
+_state_fd = {"pid": None, "fd": None}
+# Fallback tanpa flock: key → [tokens, updated, rate]
+_local = {}
+
+
+def _rate_for(priority):
+    return {
+        "stat": Config.DICOM_RATE_STAT,
+        "routine": Config.DICOM_RATE_ROUTINE,
+        "bulk": Config.DICOM_RATE_BULK,
+    }.get(priority, Config.DICOM_RATE_ROUTINE)
+
+
+def _parse_windows(spec):
+    windows = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        start, end = item.split("-")
+        windows.append((
+            datetime.strptime(start.strip(), "%H:%M").time(),
+            datetime.strptime(end.strip(), "%H:%M").time(),
+        ))
+    return windows
+
+
+def in_full_speed_window(now=None):
+    current = (now or datetime.now()).time()
+    for start, end in _parse_windows(Config.BULK_FULL_SPEED_WINDOWS):
+        if start <= end:
+            if start <= current < end:
+                return True
+        elif current >= start or current < end:
+            # Window melewati tengah malam, mis. 22:00-06:00
+            return True
+    return False
+
+
+# ---------------------------------------------------------
+# Token bucket (state bersama antar proses)
+# ---------------------------------------------------------
+def _take(buckets, key, rate, amount, now):
+    """Ambil `amount` token dari bucket (boleh berhutang untuk chunk besar). Return detik tunggu."""
+    tokens, updated, bucket_rate = buckets.get(key) or (rate, now, rate)
+    if bucket_rate != rate:
+        tokens, updated = rate, now
+
+    # Burst = 1 detik rate
+    tokens = min(rate, tokens + max(now - updated, 0) * rate) - amount
+    buckets[key] = [tokens, now, rate]
+    return -tokens / rate if tokens < 0 else 0
+
+
+def _open_state():
+    pid = os.getpid()
+    if _state_fd["pid"] != pid:
+        path = os.path.join(Config.DATA_DIR, "throttle.state")
+        os.makedirs(Config.DATA_DIR, exist_ok=True)
+        _state_fd.update(pid=pid, fd=os.open(path, os.O_RDWR | os.O_CREAT, 0o644))
+    return _state_fd["fd"]
+
+
+def _take_shared(key, rate, amount):
+    with _lock:
+        if fcntl is None:
+            return _take(_local, key, rate, amount, time.time())
+
+        fd = _open_state()
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            raw = os.pread(fd, 1 << 16, 0)
+            try:
+                buckets = json.loads(raw) if raw else {}
+            except ValueError:
+                buckets = {}
+
+            wait = _take(buckets, key, rate, amount, time.time())
+
+            data = json.dumps(buckets).encode()
+            os.pwrite(fd, data, 0)
+            os.ftruncate(fd, len(data))
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        return wait
+
+
+def consume(priority, direction, amount):
+    rate = _rate_for(priority)
+    if rate <= 0 or amount <= 0:
+        return
+    if priority == "bulk" and in_full_speed_window():
+        return
+
+    wait = _take_shared(f"{priority}:{direction}", float(rate), amount)
+    if wait > 0:
+        time.sleep(wait)
+
+
+def pace(priority, direction, nbytes):
+    """Admission pacing untuk transfer yang tidak bisa di-chunk (satu file per storescu)."""
+    consume(priority, direction, nbytes)
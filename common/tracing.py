@@ -0,0 +1,287 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueListener
+
+from config import Config
+from common.logger import file_handler, log_event, process_path
+
+# ---------------------------------------------------------
+# Span tracing ringan (contextvars)
+#
+# trace(name)  → root span per request / job (trace ID baru)
+# step(name)   → span langkah batch (child root; langkah berikutnya menutup yang lama)
+# span(name)   → child span biasa (per instance, per panggilan upstream via metrics.track(span=True))
+#
+# Di luar trace semua fungsi no-op. Jika TRACE_FILE diset (opt-in), trace
+# selesai ditulis sebagai satu baris JSON berformat OTLP (resourceSpans).
+# Request thread hanya memasukkan trace ke queue (drop jika penuh);
+# serialisasi + tulis + rotasi dilakukan QueueListener di background thread
+# (pola yang sama dengan common.logger).
+# ---------------------------------------------------------
+
+_current = contextvars.ContextVar("gateway_span", default=None)
+_export_lock = threading.Lock()
+_export_queue = None
+_listener = None
+_listener_pid = None
+_dropped = 0
+
+SERVICE_NAME = "satusehat-gateway"
+
+
+def _new_id(nbytes):
+    return os.urandom(nbytes).hex()
+
+
+class Trace:
+    def __init__(self):
+        self.trace_id = _new_id(16)
+        self.spans = []
+        self.dropped = 0
+        self.root = None
+        self.open_step = None
+        self.lock = threading.Lock()
+
+    def add(self, span):
+        with self.lock:
+            if len(self.spans) >= Config.TRACE_MAX_SPANS:
+                self.dropped += 1
+                return False
+            self.spans.append(span)
+            return True
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace, parent, name, attributes):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def fail(self, message):
+        self.error = str(message)
+
+    def finish(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+
+def current_trace_id():
+    span = _current.get()
+    return span.trace.trace_id if span else None
+
+
+def start_span(name, **attributes):
+    """Buka child span dari span aktif. Return (span, token) atau (None, None) di luar trace."""
+    parent = _current.get()
+    if parent is None:
+        return None, None
+
+    span = Span(parent.trace, parent, name, attributes)
+    if not parent.trace.add(span):
+        return None, None
+    return span, _current.set(span)
+
+
+def end_span(span, token, error=None):
+    if span is None:
+        return
+    if error:
+        span.fail(error)
+    span.finish()
+    _current.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    sp, token = start_span(name, **attributes)
+    try:
+        yield sp
+    except Exception as e:
+        if sp:
+            sp.fail(e)
+        raise
+    finally:
+        end_span(sp, token)
+
+
+def step(name, **attributes):
+    """Tandai langkah batch baru: tutup step sebelumnya, buka step baru di bawah root."""
+    current = _current.get()
+    if current is None:
+        return
+
+    trace = current.trace
+    if trace.open_step:
+        _finish_step(trace.open_step)
+
+    sp = Span(trace, trace.root, name, attributes)
+    trace.open_step = sp if trace.add(sp) else None
+    _current.set(trace.open_step or trace.root)
+
+
+def _finish_step(sp):
+    sp.finish()
+    log_event("batch_step", request=sp.trace.root.name, step=sp.name,
+              duration_ms=round((sp.end_ns - sp.start_ns) / 1e6, 2))
+
+
+@contextmanager
+def trace(name, **attributes):
+    """Root span: mulai trace baru, export saat selesai."""
+    tr = Trace()
+    root = tr.root = Span(tr, None, name, attributes)
+    tr.add(root)
+    token = _current.set(root)
+    try:
+        yield root
+    except Exception as e:
+        root.fail(e)
+        raise
+    finally:
+        if tr.open_step:
+            _finish_step(tr.open_step)
+        root.finish()
+        _current.reset(token)
+        export(tr)
+        log_event("request_done", request=name, trace_id=tr.trace_id,
+                  duration_ms=round((root.end_ns - root.start_ns) / 1e6, 2), error=root.error, **root.attributes)
+
+
+# ---------------------------------------------------------
+# Export & waterfall
+# ---------------------------------------------------------
+def _attr_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(tr):
+    spans = []
+    for sp in list(tr.spans):
+        item = {
+            "traceId": tr.trace_id,
+            "spanId": sp.span_id,
+            "name": sp.name,
+            "kind": 1,
+            "startTimeUnixNano": str(sp.start_ns),
+            "endTimeUnixNano": str(sp.end_ns or sp.start_ns),
+            "attributes": [{"key": k, "value": _attr_value(v)} for k, v in sp.attributes.items()],
+            "status": {"code": 2, "message": sp.error} if sp.error else {"code": 1},
+        }
+        if sp.parent_id:
+            item["parentSpanId"] = sp.parent_id
+        spans.append(item)
+
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "gateway.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class OtlpFormatter(logging.Formatter):
+    """record.msg = Trace → satu baris JSON OTLP (di-cache: rotasi ikut memanggil format)."""
+
+    def format(self, record):
+        if not hasattr(record, "otlp"):
+            record.otlp = json.dumps(to_otlp(record.msg))
+        return record.otlp
+
+
+def _start_exporter():
+    """Pasang queue + listener (file handler, rotasi satu file lama). Dipanggil lazy per proses."""
+    global _export_queue, _listener, _listener_pid
+    with _export_lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            return _export_queue
+
+        # Per PID jika LOG_ROTATION=per-process (beberapa worker gunicorn)
+        handler = file_handler(process_path(Config.TRACE_FILE), Config.TRACE_FILE_MAX_BYTES, 1)
+        handler.setFormatter(OtlpFormatter())
+
+        _export_queue = queue.Queue(maxsize=Config.TRACE_QUEUE_SIZE)
+        _listener = QueueListener(_export_queue, handler)
+        _listener.start()
+        _listener_pid = os.getpid()
+        atexit.register(stop_exporter)
+        return _export_queue
+
+
+def stop_exporter():
+    global _listener
+    with _export_lock:
+        listener, _listener = _listener, None
+    if listener:
+        listener.stop()
+
+
+def export(tr):
+    """Antrikan trace untuk ditulis background thread; tidak pernah blok request thread."""
+    global _dropped
+    if not Config.TRACE_FILE:
+        return
+
+    # Thread listener tidak ikut fork: proses anak membuat listener sendiri
+    q = _export_queue if _listener is not None and _listener_pid == os.getpid() else _start_exporter()
+    try:
+        q.put_nowait(logging.makeLogRecord({"msg": tr}))
+    except queue.Full:
+        with _export_lock:
+            _dropped += 1
+
+
+def get_tracing_stats():
+    with _export_lock:
+        return {
+            "file": process_path(Config.TRACE_FILE) if Config.TRACE_FILE else None,
+            "running": _listener is not None,
+            "queued": _export_queue.qsize() if _export_queue else 0,
+            "dropped": _dropped,
+        }
+
+
+def waterfall(root):
+    """Ringkasan timing trace (offset & durasi ms relatif root) untuk response ?trace=1."""
+    tr = root.trace
+    depth = {root.span_id: 0}
+    rows = []
+
+    for sp in sorted(tr.spans, key=lambda s: s.start_ns):
+        depth[sp.span_id] = depth.get(sp.parent_id, -1) + 1
+        end = sp.end_ns or root.end_ns or time.time_ns()
+        row = {
+            "name": sp.name,
+            "depth": depth[sp.span_id],
+            "start_ms": round((sp.start_ns - root.start_ns) / 1e6, 2),
+            "duration_ms": round((end - sp.start_ns) / 1e6, 2),
+        }
+        if sp.attributes:
+            row["attributes"] = sp.attributes
+        if sp.error:
+            row["error"] = sp.error
+        rows.append(row)
+
+    return {"trace_id": tr.trace_id, "dropped_spans": tr.dropped, "spans": rows}
@@ -0,0 +1,175 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from config import Config
+
+# ---------------------------------------------------------
+# Workspace temp per job
+#
+# TEMP_DIR/jobs/<job_id>/  + file .owner (pid, token proses, waktu mulai)
+# - admission: tunggu jika free space TEMP_DIR < TEMP_MIN_FREE_BYTES
+# - sweeper  : hapus workspace yatim (proses pemilik mati / terlalu lama)
+# ---------------------------------------------------------
+
+# Token unik per proses: membedakan pid yang dipakai ulang setelah restart container.
+# Dibuat lazy per pid: dengan preload gunicorn modul di-import di master lalu di-fork,
+# token saat import akan sama untuk semua worker.
+_process = {"pid": None, "token": None}
+
+_admission = threading.Condition()
+_waiting = 0
+_sweeper = None
+
+
+class WorkspaceUnavailable(Exception):
+    """Disk temp tidak cukup dalam batas waktu admission."""
+
+
+def process_token():
+    pid = os.getpid()
+    if _process["pid"] != pid:
+        _process.update(pid=pid, token=uuid.uuid4().hex)
+    return _process["token"]
+
+
+def _jobs_root():
+    return os.path.join(Config.TEMP_DIR, "jobs")
+
+
+def free_bytes():
+    return shutil.disk_usage(Config.TEMP_DIR).free
+
+
+def _admit():
+    global _waiting
+    deadline = time.monotonic() + Config.TEMP_ADMISSION_TIMEOUT
+
+    with _admission:
+        _waiting += 1
+        try:
+            while free_bytes() < Config.TEMP_MIN_FREE_BYTES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WorkspaceUnavailable(
+                        f"Temp disk free space below {Config.TEMP_MIN_FREE_BYTES} bytes, job rejected"
+                    )
+                # Dibangunkan saat job lain selesai; cek ulang berkala juga
+                # karena disk bisa dibebaskan oleh proses lain.
+                _admission.wait(min(remaining, 5))
+        finally:
+            _waiting -= 1
+
+
+@contextmanager
+def job_workspace(job_id=None):
+    """Buat folder kerja terisolasi untuk satu job, hapus saat selesai."""
+    _admit()
+
+    job_id = job_id or uuid.uuid4().hex
+    path = os.path.join(_jobs_root(), job_id)
+    os.makedirs(path, exist_ok=True)
+
+    with open(os.path.join(path, ".owner"), "w") as f:
+        json.dump({"pid": os.getpid(), "token": process_token(), "started": time.time()}, f)
+
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+        with _admission:
+            _admission.notify_all()
+
+
+# ---------------------------------------------------------
+# Sweeper
+# ---------------------------------------------------------
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_orphan(path, now):
+    try:
+        with open(os.path.join(path, ".owner")) as f:
+            owner = json.load(f)
+    except (OSError, ValueError):
+        # Tanpa .owner (crash saat dibuat): pakai umur folder
+        return now - os.path.getmtime(path) > Config.TEMP_ORPHAN_MAX_AGE
+
+    if now - owner.get("started", 0) > Config.TEMP_ORPHAN_MAX_AGE:
+        return True
+    if owner.get("pid") == os.getpid():
+        return owner.get("token") != process_token()
+    return not _pid_alive(owner.get("pid", 0))
+
+
+def sweep_orphans():
+    """Hapus workspace yatim dan file .dcm lama di root TEMP_DIR. Return jumlah yang dihapus."""
+    now = time.time()
+    removed = 0
+
+    root = _jobs_root()
+    if os.path.isdir(root):
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            try:
+                if os.path.isdir(path) and _is_orphan(path, now):
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+
+    # File lepas dari versi lama ({study_uid}_{idx}.dcm langsung di TEMP_DIR)
+    for name in os.listdir(Config.TEMP_DIR):
+        path = os.path.join(Config.TEMP_DIR, name)
+        if not (name.endswith(".dcm") or name.endswith(".dcm.bak")):
+            continue
+        try:
+            if now - os.path.getmtime(path) > Config.TEMP_ORPHAN_MAX_AGE:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+
+    if removed:
+        print(f"[*] Temp sweeper removed {removed} orphaned item(s)")
+    return removed
+
+
+def _sweep_loop():
+    while True:
+        time.sleep(Config.TEMP_SWEEP_INTERVAL)
+        try:
+            sweep_orphans()
+        except Exception as e:
+            print(f"[!] Temp sweeper error: {e}")
+
+
+def start_sweeper():
+    global _sweeper
+    if _sweeper and _sweeper.is_alive():
+        return
+
+    sweep_orphans()
+    _sweeper = threading.Thread(target=_sweep_loop, name="temp-sweeper", daemon=True)
+    _sweeper.start()
+
+
+def get_workspace_stats():
+    root = _jobs_root()
+    return {
+        "free_bytes": free_bytes(),
+        "min_free_bytes": Config.TEMP_MIN_FREE_BYTES,
+        "active_jobs": len(os.listdir(root)) if os.path.isdir(root) else 0,
+        "waiting_jobs": _waiting,
+    }
@@ -12,6 +12,10 @@ class Config:
     ROUTER_IP = os.getenv("ROUTER_IP", "192.10.10.51")
     ROUTER_PORT = os.getenv("ROUTER_PORT", "11112")
     ROUTER_AET = os.getenv("ROUTER_AET", "DCMROUTER")
+    # Pool router: "AET@host:port*weight,..." (kosong → pakai ROUTER_AET/IP/PORT)
+    ROUTER_POOL = os.getenv("ROUTER_POOL", "")
+    ROUTER_HEALTH_INTERVAL = float(os.getenv("ROUTER_HEALTH_INTERVAL", "30"))
+    ROUTER_FAIL_THRESHOLD = int(os.getenv("ROUTER_FAIL_THRESHOLD", "3"))
     
     # --- SATUSEHAT CONFIG ---
     # Menggunakan environment variable agar credential tidak hardcoded di production
@@ -20,17 +24,186 @@ class Config:
     SS_ORG_ID = os.getenv("SS_ORG_ID")
     SS_CLIENT_ID = os.getenv("SS_CLIENT_ID")
     SS_CLIENT_SECRET = os.getenv("SS_CLIENT_SECRET")
+    # Token di-cache sampai N detik sebelum expires_in
+    TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "60"))
+    # Fetch token gagal → error yang sama dipakai N detik (auth down tidak dibanjiri retry)
+    TOKEN_ERROR_CACHE_SECONDS = float(os.getenv("TOKEN_ERROR_CACHE_SECONDS", "5"))
 
     # --- SYSTEM CONFIG ---
-    LOG_FILE = os.getenv("LOG_FILE", "app_dicom.log")
     TEMP_DIR = os.getenv("TEMP_DIR", "/tmp/dicom_gateway_tmp")
+    DATA_DIR = os.getenv("DATA_DIR", "data")
+    LOG_FILE = os.getenv("LOG_FILE", os.path.join(DATA_DIR, "logs", "app_dicom.log"))
+    # size        : rotasi oleh gateway (RotatingFileHandler), hanya aman untuk satu proses
+    # per-process : file per PID (app_dicom.<pid>.log), masing-masing dirotasi sendiri
+    # external    : WatchedFileHandler, rotasi oleh logrotate (aman untuk banyak proses)
+    LOG_ROTATION = os.getenv("LOG_ROTATION", "size")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Peluang event per instance DICOM ditulis (0–1); error selalu ditulis
+    LOG_INSTANCE_SAMPLE_RATE = float(os.getenv("LOG_INSTANCE_SAMPLE_RATE", "0.01"))
+
+    # --- TEMP WORKSPACE ---
+    # Job baru menunggu (lalu ditolak 503) jika free space TEMP_DIR di bawah batas ini
+    TEMP_MIN_FREE_BYTES = int(os.getenv("TEMP_MIN_FREE_BYTES", str(2 * 1024 ** 3)))
+    TEMP_ADMISSION_TIMEOUT = float(os.getenv("TEMP_ADMISSION_TIMEOUT", "300"))
+    TEMP_ORPHAN_MAX_AGE = float(os.getenv("TEMP_ORPHAN_MAX_AGE", str(6 * 3600)))
+    TEMP_SWEEP_INTERVAL = float(os.getenv("TEMP_SWEEP_INTERVAL", "600"))
+
+    # --- DICOM JOB COORDINATION ---
+    # attach : request duplikat untuk study yang sedang diproses menunggu & menerima hasil job tsb
+    # reject : request duplikat langsung ditolak 409 dengan job_id yang sedang berjalan
+    DICOM_DUPLICATE_MODE = os.getenv("DICOM_DUPLICATE_MODE", "attach")
+
+    # --- PRIORITAS & BANDWIDTH (stat / routine / bulk) ---
+    DICOM_MAX_CONCURRENT_JOBS = int(os.getenv("DICOM_MAX_CONCURRENT_JOBS", "4"))
+    # Bytes/detik per class untuk WADO download dan router send (0 = tanpa batas)
+    DICOM_RATE_STAT = float(os.getenv("DICOM_RATE_STAT", "0"))
+    DICOM_RATE_ROUTINE = float(os.getenv("DICOM_RATE_ROUTINE", "0"))
+    DICOM_RATE_BULK = float(os.getenv("DICOM_RATE_BULK", str(2 * 1024 ** 2)))
+    # Jam di mana bulk boleh full speed, mis. "22:00-06:00,12:00-13:00"
+    BULK_FULL_SPEED_WINDOWS = os.getenv("BULK_FULL_SPEED_WINDOWS", "22:00-06:00")
+
+    # --- TRANSCODING LOSSLESS ---
+    # jpegls | rle | deflate (kosong = kirim sesuai transfer syntax di PACS)
+    DICOM_TRANSCODE = os.getenv("DICOM_TRANSCODE", "")
+
+    # --- TAG REWRITE ---
+    # Patch PatientID / AccessionNumber langsung di header file (mmap);
+    # fallback ke dcmodify untuk file yang tidak bisa di-patch langsung
+    DICOM_MMAP_PATCH = os.getenv("DICOM_MMAP_PATCH", "true").lower() == "true"
+
+    # --- CPU POOL (tag rewrite, transcoding, hashing) ---
+    CPU_POOL_ENABLED = os.getenv("CPU_POOL_ENABLED", "true").lower() == "true"
+    CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(os.cpu_count() or 2)))
+
+    # --- PROGRESS (SSE) ---
+    # Job async disimpan sekian detik setelah selesai (untuk reconnect)
+    PROGRESS_TTL = int(os.getenv("PROGRESS_TTL", "600"))
+    PROGRESS_KEEPALIVE = int(os.getenv("PROGRESS_KEEPALIVE", "15"))
+    # Event yang disimpan per job (N terakhir + event "done"); reconnect ke event yang
+    # sudah dibuang menerima snapshot state terkini
+    PROGRESS_MAX_EVENTS = int(os.getenv("PROGRESS_MAX_EVENTS", "500"))
+    # State job bersama antar worker gunicorn (progress, koordinasi per study, slot job)
+    JOBS_DB = os.getenv("JOBS_DB", os.path.join(DATA_DIR, "jobs.db"))
+    # Interval polling state job milik worker lain (SSE, attach, antrian slot)
+    JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "0.5"))
+
+    # --- ADMIN & PROFILER ---
+    # Endpoint /admin/* butuh header X-Admin-Token; kosong = endpoint admin nonaktif
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+    PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "120"))
+    PROFILER_CONTINUOUS = os.getenv("PROFILER_CONTINUOUS", "false").lower() == "true"
+    PROFILER_CONTINUOUS_INTERVAL = float(os.getenv("PROFILER_CONTINUOUS_INTERVAL", "1"))
+    PROFILER_RING_SECONDS = int(os.getenv("PROFILER_RING_SECONDS", "3600"))
+
+    # --- TRACING ---
+    # File export trace (satu baris JSON OTLP per trace), opt-in: mis. data/traces.jsonl
+    TRACE_FILE = os.getenv("TRACE_FILE", "")
+    # Trace yang menunggu ditulis background thread; penuh → trace di-drop
+    TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "1000"))
+    TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(100 * 1024 * 1024)))
+    TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "5000"))
+
+    # --- SERVER ---
+    PORT = int(os.getenv("PORT", "5000"))
+    # true (diset gunicorn.conf.py): service background tidak distart saat import app,
+    # tapi per worker di hook post_fork (lihat app.start_process_services / start_host_services)
+    DEFER_BACKGROUND_SERVICES = os.getenv("DEFER_BACKGROUND_SERVICES", "false").lower() == "true"
+
+    # --- WARM-UP (token, koneksi upstream, C-ECHO router, tooling DICOM) ---
+    # Dijalankan saat start (per worker gunicorn); /health/ready 503 sampai selesai
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "30"))
+    # true → langkah warm-up yang gagal membuat /health/ready tetap 503
+    WARMUP_STRICT = os.getenv("WARMUP_STRICT", "false").lower() == "true"
+
+    # --- HEALTH PROBE (/health/live, /health/ready membaca hasil cache) ---
+    HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))
+    HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "5"))
+    # Probe yang harus ok agar ready (token, satusehat, dcm4chee, router, temp_disk);
+    # probe lain yang gagal hanya menandai degraded
+    HEALTH_REQUIRED_PROBES = [
+        p.strip() for p in os.getenv("HEALTH_REQUIRED_PROBES", "temp_disk").split(",") if p.strip()
+    ]
+
+    # --- HTTP CLIENT (SatuSehat & dcm4chee) ---
+    # Satu requests.Session bersama; keep-alive per host maksimal HTTP_POOL_SIZE koneksi
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+    # Rekam metadata + timing request upstream (gzip NDJSON, tanpa PHI); kosong = nonaktif
+    HTTP_RECORD_FILE = os.getenv("HTTP_RECORD_FILE", "")
+
+    # --- WEBHOOK (penyelesaian job async) ---
+    # URL global (pisahkan dengan koma); per job bisa ditambah lewat "callback_url"
+    WEBHOOK_URLS = [u.strip() for u in os.getenv("WEBHOOK_URLS", "").split(",") if u.strip()]
+    # Wajib: tanpa secret webhook tidak dikirim (body selalu ditandatangani)
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    # Host ("ris.local") atau prefix URL ("https://ris.local/hooks/") yang boleh jadi callback_url.
+    # Kosong → semua host publik boleh, alamat private / loopback / link-local ditolak.
+    WEBHOOK_CALLBACK_ALLOWLIST = [
+        u.strip() for u in os.getenv("WEBHOOK_CALLBACK_ALLOWLIST", "").split(",") if u.strip()
+    ]
+    # true → body berisi "result" lengkap job (ID pasien, accession, ID FHIR)
+    WEBHOOK_INCLUDE_RESULT = os.getenv("WEBHOOK_INCLUDE_RESULT", "false").lower() == "true"
+    WEBHOOK_DB = os.getenv("WEBHOOK_DB", os.path.join(DATA_DIR, "webhooks.db"))
+    WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+    WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", "5"))
+    WEBHOOK_RETRY_BASE = float(os.getenv("WEBHOOK_RETRY_BASE", "10"))
+    WEBHOOK_MAX_BACKOFF = float(os.getenv("WEBHOOK_MAX_BACKOFF", "900"))
+    WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "20"))
+
+    # --- SENT-SOP INDEX ---
+    # Re-send study hanya mengirim instance yang belum / gagal / berubah
+    SOP_INDEX_ENABLED = os.getenv("SOP_INDEX_ENABLED", "true").lower() == "true"
+    SOP_INDEX_DB = os.getenv("SOP_INDEX_DB", os.path.join(DATA_DIR, "sop_index.db"))
+
+    # --- DICOM CACHE ---
+    DICOM_CACHE_ENABLED = os.getenv("DICOM_CACHE_ENABLED", "false").lower() == "true"
+    DICOM_CACHE_DIR = os.getenv("DICOM_CACHE_DIR", os.path.join(DATA_DIR, "dicom_cache"))
+    DICOM_CACHE_MAX_BYTES = int(os.getenv("DICOM_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+
+    # --- OUTBOX CONFIG ---
+    # off        : semua request langsung ke SatuSehat
+    # on-request : antrikan hanya jika request memakai ?mode=outbox
+    # always     : batch1–3 & resource tunggal selalu diantrikan
+    OUTBOX_MODE = os.getenv("OUTBOX_MODE", "off")
+    OUTBOX_DB = os.getenv("OUTBOX_DB", os.path.join(DATA_DIR, "outbox.db"))
+    OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+    OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "10"))
+    OUTBOX_MAX_BACKOFF = float(os.getenv("OUTBOX_MAX_BACKOFF", "900"))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "50"))
+
+    # --- BULK INTAKE CONFIG ---
+    BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))
+    BULK_MAX_CONCURRENCY = int(os.getenv("BULK_MAX_CONCURRENCY", "16"))
+
+    # --- PACS WATCHER CONFIG ---
+    WATCHER_ENABLED = os.getenv("WATCHER_ENABLED", "false").lower() == "true"
+    # Atribut QIDO waktu update study di dcm4chee
+    WATCHER_UPDATE_KEY = os.getenv("WATCHER_UPDATE_KEY", "StudyUpdateDateTime")
+    WATCHER_STATE_FILE = os.getenv("WATCHER_STATE_FILE", os.path.join(DATA_DIR, "watcher_state.json"))
+    WATCHER_POLL_INTERVAL = float(os.getenv("WATCHER_POLL_INTERVAL", "30"))
+    WATCHER_STABLE_SECONDS = float(os.getenv("WATCHER_STABLE_SECONDS", "120"))
+    WATCHER_OVERLAP_SECONDS = float(os.getenv("WATCHER_OVERLAP_SECONDS", "60"))
+    WATCHER_LOOKBACK_MINUTES = int(os.getenv("WATCHER_LOOKBACK_MINUTES", "60"))
+    WATCHER_PAGE_SIZE = int(os.getenv("WATCHER_PAGE_SIZE", "500"))
+    WATCHER_DEDUP_DAYS = int(os.getenv("WATCHER_DEDUP_DAYS", "7"))
+    WATCHER_WORKERS = int(os.getenv("WATCHER_WORKERS", "1"))
+    # Forward gagal: retry dengan backoff (base × 2^n, maks RETRY_MAX), menyerah setelah MAX_ATTEMPTS
+    WATCHER_RETRY_BASE_SECONDS = float(os.getenv("WATCHER_RETRY_BASE_SECONDS", "60"))
+    WATCHER_RETRY_MAX_SECONDS = float(os.getenv("WATCHER_RETRY_MAX_SECONDS", "3600"))
+    WATCHER_MAX_ATTEMPTS = int(os.getenv("WATCHER_MAX_ATTEMPTS", "8"))
+    # Zona waktu timestamp DICOM di PACS (StudyUpdateDateTime), bukan zona waktu container
+    PACS_TIMEZONE = os.getenv("PACS_TIMEZONE", "Asia/Jakarta")
 
     @classmethod
     def init_app(cls):
-        """Memastikan folder temporary tersedia saat aplikasi start"""
-        if not os.path.exists(cls.TEMP_DIR):
-            try:
-                os.makedirs(cls.TEMP_DIR, exist_ok=True)
-                print(f"[*] Temporary directory created at: {cls.TEMP_DIR}")
-            except Exception as e:
-                print(f"[!] Failed to create temp directory: {e}")
\ No newline at end of file
+        """Memastikan folder temporary & data tersedia saat aplikasi start"""
+        for folder in (cls.TEMP_DIR, cls.DATA_DIR):
+            if not os.path.exists(folder):
+                try:
+                    os.makedirs(folder, exist_ok=True)
+                    print(f"[*] Directory created at: {folder}")
+                except Exception as e:
+                    print(f"[!] Failed to create directory {folder}: {e}")
\ No newline at end of file
@@ -0,0 +1,96 @@
+import threading
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from .faults import Faults
+from .pacs import PREFIX, SyntheticArchive, create_pacs_app
+from .replay import Recording, ReplayFaults
+from .satusehat import create_fhir_app, create_oauth_app
+from .scp import StoreSCP
+
+# ---------------------------------------------------------
+# Fake upstream untuk load test lokal
+#
+#   from fakes import start_fakes
+#   fakes = start_fakes(studies=50, faults={"fhir": {"error_rate": 0.1}})
+#   ... arahkan Config ke fakes.env() ...
+#   fakes.stop()
+# ---------------------------------------------------------
+
+SERVICES = ("oauth", "fhir", "pacs", "scp")
+HTTP_SERVICES = ("oauth", "fhir", "pacs")
+DEFAULT_PORTS = {"oauth": 9001, "fhir": 9002, "pacs": 9003, "scp": 11113}
+SCP_AET = "FAKEROUTER"
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class RunningFakes:
+    def __init__(self, host, ports, faults, archive, servers):
+        self.host = host
+        self.ports = ports
+        self.faults = faults
+        self.archive = archive
+        self.servers = servers
+        self.threads = []
+
+    def env(self):
+        base = f"http://{self.host}"
+        return {
+            "SS_AUTH_URL": f"{base}:{self.ports['oauth']}/oauth2/v1",
+            "SS_BASE_URL": f"{base}:{self.ports['fhir']}/fhir-r4/v1",
+            "DCM4CHEE_URL": f"{base}:{self.ports['pacs']}{PREFIX}",
+            "ROUTER_IP": self.host,
+            "ROUTER_PORT": str(self.ports["scp"]),
+            "ROUTER_AET": SCP_AET,
+            "ROUTER_POOL": "",
+        }
+
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+
+def start_fakes(host="127.0.0.1", ports=None, faults=None, studies=20, instances=10,
+                instance_bytes=512 * 1024, imaging_missing_rate=0.0, token_ttl=14399, store_dir=None, quiet=False,
+                replay=None, replay_scale=1.0):
+    """Start semua fake di thread daemon. Port 0 = pilih port bebas.
+
+    faults: dict service → dict parameter Faults (latency_ms, jitter_ms, error_rate, rate_429).
+    quiet : tanpa access log per request (untuk benchmark).
+    replay: file rekaman HTTP_RECORD_FILE → latency & status per route diputar ulang
+            di fake HTTP (dikali replay_scale); `faults` berlaku untuk route tanpa rekaman.
+    """
+    ports = dict(DEFAULT_PORTS, **(ports or {}))
+    params = {name: (faults or {}).get(name, {}) for name in SERVICES}
+    faults = {name: Faults(**params[name]) for name in SERVICES}
+    if replay:
+        recording = Recording.load(replay)
+        for name in HTTP_SERVICES:
+            faults[name] = ReplayFaults(recording, replay_scale, **params[name])
+    archive = SyntheticArchive(studies, instances, instance_bytes)
+
+    apps = {
+        "oauth": create_oauth_app(faults["oauth"], token_ttl),
+        "fhir": create_fhir_app(faults["fhir"], imaging_missing_rate),
+        "pacs": create_pacs_app(archive, faults["pacs"]),
+    }
+
+    servers = {}
+    for name, app in apps.items():
+        handler = _QuietRequestHandler if quiet else None
+        servers[name] = make_server(host, ports[name], app, threaded=True, request_handler=handler)
+        ports[name] = servers[name].server_port
+    servers["scp"] = StoreSCP((host, ports["scp"]), faults["scp"], store_dir)
+    ports["scp"] = servers["scp"].server_address[1]
+
+    running = RunningFakes(host, ports, faults, archive, servers)
+    for name, server in servers.items():
+        thread = threading.Thread(target=server.serve_forever, name=f"fake-{name}", daemon=True)
+        thread.start()
+        running.threads.append(thread)
+    return running
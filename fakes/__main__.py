@@ -0,0 +1,103 @@
+import argparse
+import time
+
+from . import DEFAULT_PORTS, SERVICES, start_fakes
+from .replay import Recording
+from .faults import FAULT_FIELDS
+
+# ---------------------------------------------------------
+# python -m fakes [opsi]  → jalankan semua fake sampai Ctrl+C
+# ---------------------------------------------------------
+
+
+def parse_overrides(items):
+    """--set fhir.error_rate=0.2 → {"fhir": {"error_rate": 0.2}}"""
+    overrides = {}
+    for item in items:
+        key, _, value = item.partition("=")
+        service, _, field = key.partition(".")
+        try:
+            number = float(value)
+        except ValueError:
+            number = None
+        if service not in SERVICES or field not in FAULT_FIELDS or number is None:
+            raise argparse.ArgumentTypeError(
+                f"--set {item!r}: format <{'|'.join(SERVICES)}>.<{'|'.join(FAULT_FIELDS)}>=<angka>"
+            )
+        overrides.setdefault(service, {})[field] = number
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m fakes", description="Fake SatuSehat, dcm4chee dan DICOM router untuk load test")
+    parser.add_argument("--host", default="127.0.0.1", help="Alamat bind")
+    for name in SERVICES:
+        parser.add_argument(f"--{name}-port", type=int, default=DEFAULT_PORTS[name], help=f"Port fake {name}")
+
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latency dasar semua fake (ms)")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Deviasi latency (ms, gaussian)")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraksi request yang dijawab 500 / A700")
+    parser.add_argument("--rate-429", type=float, default=0, help="Fraksi request yang dijawab 429 / asosiasi ditolak")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="SERVICE.FIELD=VALUE",
+                        help="Override per service, mis. --set fhir.error_rate=0.2 (boleh berulang)")
+
+    parser.add_argument("--studies", type=int, default=20, help="Jumlah study sintetis di PACS")
+    parser.add_argument("--instances", type=int, default=10, help="Instance per study")
+    parser.add_argument("--instance-bytes", type=int, default=512 * 1024, help="Ukuran pixel data per instance")
+    parser.add_argument("--imaging-missing-rate", type=float, default=0,
+                        help="Fraksi ACSN yang belum punya ImagingStudy di fake FHIR")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="Putar ulang latency/status dari rekaman HTTP_RECORD_FILE (gzip NDJSON)")
+    parser.add_argument("--replay-scale", type=float, default=1.0, help="Pengali latency rekaman (mis. 0.5)")
+    parser.add_argument("--store-dir", help="Simpan dataset yang diterima SCP (default: hanya dihitung)")
+    args = parser.parse_args(argv)
+
+    try:
+        overrides = parse_overrides(args.overrides)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    base = {
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "rate_429": args.rate_429,
+    }
+    faults = {name: dict(base, **overrides.get(name, {})) for name in SERVICES}
+    ports = {name: getattr(args, f"{name}_port") for name in SERVICES}
+
+    fakes = start_fakes(
+        host=args.host,
+        ports=ports,
+        faults=faults,
+        studies=args.studies,
+        instances=args.instances,
+        instance_bytes=args.instance_bytes,
+        imaging_missing_rate=args.imaging_missing_rate,
+        store_dir=args.store_dir,
+        replay=args.replay,
+        replay_scale=args.replay_scale,
+    )
+
+    if args.replay:
+        print(f"[*] Replay {args.replay} (scale {args.replay_scale}):")
+        print(f"    {'method':<6} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'error':>7}  path")
+        for method, path, count, p50, p95, error_rate in Recording.load(args.replay).summary():
+            print(f"    {method:<6} {count:>7} {p50:>9} {p95:>9} {error_rate:>7}  {path}")
+        print()
+
+    print("[*] Fake upstream berjalan. Tambahkan ke .env gateway:\n")
+    for key, value in fakes.env().items():
+        print(f"{key}={value}")
+    print("\n[*] Ubah fault saat runtime: POST http://<fake>/_fake/faults {\"error_rate\": 0.2}")
+    print("[*] Ctrl+C untuk berhenti")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fakes.stop()
+
+
+if __name__ == "__main__":
+    main()
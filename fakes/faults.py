@@ -0,0 +1,82 @@
+import random
+import threading
+import time
+
+from flask import jsonify, request
+
+# ---------------------------------------------------------
+# Injeksi latency / error / 429 untuk fake server
+# ---------------------------------------------------------
+
+FAULT_FIELDS = ("latency_ms", "jitter_ms", "error_rate", "rate_429")
+
+
+class Faults:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_429=0.0):
+        self.lock = threading.Lock()
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.error_rate = float(error_rate)
+        self.rate_429 = float(rate_429)
+        self.counts = {"requests": 0, "errors": 0, "throttled": 0}
+
+    def as_dict(self):
+        with self.lock:
+            data = {name: getattr(self, name) for name in FAULT_FIELDS}
+            data["counts"] = dict(self.counts)
+        return data
+
+    def update(self, values):
+        with self.lock:
+            for name in FAULT_FIELDS:
+                if name in values:
+                    setattr(self, name, float(values[name]))
+
+    def apply(self, method=None, path=None):
+        """Tidur sesuai latency lalu return None (normal), 429 atau 500.
+
+        method/path dipakai subclass (mis. ReplayFaults) untuk memilih distribusi per route.
+        """
+        with self.lock:
+            latency = max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) if self.jitter_ms else self.latency_ms
+            roll = random.random()
+            self.counts["requests"] += 1
+            if roll < self.rate_429:
+                outcome = 429
+                self.counts["throttled"] += 1
+            elif roll < self.rate_429 + self.error_rate:
+                outcome = 500
+                self.counts["errors"] += 1
+            else:
+                outcome = None
+
+        if latency:
+            time.sleep(latency / 1000.0)
+        return outcome
+
+
+def install(app, faults):
+    """Pasang faults di semua route app, plus GET/POST /_fake/faults untuk ubah saat runtime."""
+
+    @app.before_request
+    def _inject():
+        if request.path.startswith("/_fake/"):
+            return None
+
+        outcome = faults.apply(request.method, request.path)
+        if outcome == 429:
+            resp = jsonify({"error": "Too Many Requests (injected)"})
+            resp.status_code = 429
+            resp.headers["Retry-After"] = "1"
+            return resp
+        if outcome == 500:
+            resp = jsonify({"error": "Internal Server Error (injected)"})
+            resp.status_code = 500
+            return resp
+        return None
+
+    @app.route("/_fake/faults", methods=["GET", "POST"])
+    def _faults():
+        if request.method == "POST":
+            faults.update(request.get_json(silent=True) or {})
+        return jsonify(faults.as_dict())
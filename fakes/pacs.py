@@ -0,0 +1,159 @@
+import struct
+from datetime import date, timedelta
+
+from flask import Flask, Response, jsonify, request
+
+from .faults import Faults, install
+
+# ---------------------------------------------------------
+# Fake dcm4chee: QIDO-RS + WADO-URI dengan study sintetis
+#
+# Study ke-i : StudyInstanceUID <ROOT>.<i>, AccessionNumber ACC<i:06d>,
+#              StudyDate berurutan mundur dari `base_date`.
+# Instance   : DICOM Part-10 explicit VR LE (Secondary Capture) dengan
+#              pixel data `instance_bytes` byte, dibangkitkan saat diminta.
+# ---------------------------------------------------------
+
+PREFIX = "/dcm4chee-arc/aets/DCM4CHEE"
+UID_ROOT = "1.2.826.0.1.3680043.9.7433"
+SC_SOP_CLASS = "1.2.840.10008.5.1.4.1.1.7"
+EXPLICIT_LE = "1.2.840.10008.1.2.1"
+
+
+def _element(group, element, vr, value):
+    if len(value) % 2:
+        value += b"\0" if vr == b"UI" else b" "
+    if vr in (b"OB", b"OW", b"SQ", b"UN", b"UT"):
+        return struct.pack("<HH", group, element) + vr + b"\0\0" + struct.pack("<I", len(value)) + value
+    return struct.pack("<HH", group, element) + vr + struct.pack("<H", len(value)) + value
+
+
+def build_header(study, series_uid, sop_uid, pixel_bytes):
+    """Header Part-10 sampai tag (7FE0,0010); pixel data di-stream terpisah."""
+    meta = (
+        _element(0x0002, 0x0001, b"OB", b"\0\1")
+        + _element(0x0002, 0x0002, b"UI", SC_SOP_CLASS.encode())
+        + _element(0x0002, 0x0003, b"UI", sop_uid.encode())
+        + _element(0x0002, 0x0010, b"UI", EXPLICIT_LE.encode())
+        + _element(0x0002, 0x0012, b"UI", (UID_ROOT + ".99").encode())
+    )
+    body = (
+        _element(0x0008, 0x0016, b"UI", SC_SOP_CLASS.encode())
+        + _element(0x0008, 0x0018, b"UI", sop_uid.encode())
+        + _element(0x0008, 0x0020, b"DA", study["date"].encode())
+        + _element(0x0008, 0x0050, b"SH", study["accession"].encode())
+        + _element(0x0008, 0x0060, b"CS", b"OT")
+        + _element(0x0010, 0x0010, b"PN", study["patient_name"].encode())
+        + _element(0x0010, 0x0020, b"LO", study["patient_id"].encode())
+        + _element(0x0020, 0x000D, b"UI", study["uid"].encode())
+        + _element(0x0020, 0x000E, b"UI", series_uid.encode())
+    )
+    pixel_head = struct.pack("<HH", 0x7FE0, 0x0010) + b"OB\0\0" + struct.pack("<I", pixel_bytes)
+    group_length = _element(0x0002, 0x0000, b"UL", struct.pack("<I", len(meta)))
+    return b"\0" * 128 + b"DICM" + group_length + meta + body + pixel_head
+
+
+class SyntheticArchive:
+    def __init__(self, studies=20, instances=10, instance_bytes=512 * 1024, base_date=None):
+        self.instances = instances
+        self.instance_bytes = instance_bytes + instance_bytes % 2
+        base = base_date or date.today()
+        self.studies = [
+            {
+                "index": i,
+                "uid": f"{UID_ROOT}.1.{i}",
+                "accession": f"ACC{i:06d}",
+                "patient_id": f"P{i:08d}",
+                "patient_name": f"FAKE^PATIENT{i}",
+                "date": (base - timedelta(days=i % 30)).strftime("%Y%m%d"),
+            }
+            for i in range(1, studies + 1)
+        ]
+        self.by_uid = {s["uid"]: s for s in self.studies}
+
+    def series_uid(self, study):
+        return f"{UID_ROOT}.2.{study['index']}.1"
+
+    def sop_uid(self, study, n):
+        return f"{UID_ROOT}.3.{study['index']}.{n}"
+
+    def qido_item(self, study):
+        return {
+            "0020000D": {"vr": "UI", "Value": [study["uid"]]},
+            "00080050": {"vr": "SH", "Value": [study["accession"]]},
+            "00080020": {"vr": "DA", "Value": [study["date"]]},
+            "00100020": {"vr": "LO", "Value": [study["patient_id"]]},
+            "00201208": {"vr": "IS", "Value": [self.instances]},
+        }
+
+    def metadata(self, study):
+        series = self.series_uid(study)
+        return [
+            {
+                "0020000D": {"vr": "UI", "Value": [study["uid"]]},
+                "0020000E": {"vr": "UI", "Value": [series]},
+                "00080018": {"vr": "UI", "Value": [self.sop_uid(study, n)]},
+                "00080016": {"vr": "UI", "Value": [SC_SOP_CLASS]},
+                "00080050": {"vr": "SH", "Value": [study["accession"]]},
+            }
+            for n in range(1, self.instances + 1)
+        ]
+
+
+def create_pacs_app(archive=None, faults=None):
+    archive = archive or SyntheticArchive()
+    app = Flask("fake_pacs")
+    install(app, faults or Faults())
+
+    @app.route(f"{PREFIX}/rs/studies")
+    def qido_studies():
+        studies = archive.studies
+
+        accession = request.args.get("AccessionNumber")
+        if accession:
+            studies = [s for s in studies if s["accession"] == accession]
+
+        date_range = request.args.get("StudyDate")
+        if date_range:
+            start, _, end = date_range.partition("-")
+            end = end or start
+            studies = [s for s in studies if start <= s["date"] <= end]
+
+        offset = request.args.get("offset", 0, type=int)
+        limit = request.args.get("limit", 1000, type=int)
+        page = studies[offset:offset + limit]
+        if not page:
+            return Response(status=204)
+        return jsonify([archive.qido_item(s) for s in page])
+
+    @app.route(f"{PREFIX}/rs/studies/<study_uid>/metadata")
+    def study_metadata(study_uid):
+        study = archive.by_uid.get(study_uid)
+        if not study:
+            return jsonify({"errorMessage": "Study not found"}), 404
+        return jsonify(archive.metadata(study))
+
+    @app.route(f"{PREFIX}/wado")
+    def wado():
+        study = archive.by_uid.get(request.args.get("studyUID"))
+        sop_uid = request.args.get("objectUID")
+        if not study or not sop_uid:
+            return jsonify({"errorMessage": "Object not found"}), 404
+
+        header = build_header(study, request.args.get("seriesUID") or archive.series_uid(study),
+                              sop_uid, archive.instance_bytes)
+
+        def generate():
+            yield header
+            remaining = archive.instance_bytes
+            chunk = b"\0" * 65536
+            while remaining > 0:
+                n = min(remaining, len(chunk))
+                yield chunk[:n]
+                remaining -= n
+
+        resp = Response(generate(), mimetype="application/dicom")
+        resp.headers["Content-Length"] = str(len(header) + archive.instance_bytes)
+        return resp
+
+    return app
@@ -0,0 +1,70 @@
+import random
+import time
+from collections import defaultdict
+
+from common.http import read_recording, redact_path
+
+from .faults import Faults
+
+# ---------------------------------------------------------
+# Replay rekaman upstream (HTTP_RECORD_FILE) di fake server
+#
+# Per route (method + path teredaksi) diambil distribusi empiris
+# (latency, status) dari rekaman. Setiap request ke fake mengambil
+# satu sampel acak: tidur selama latency tersebut lalu menjawab 429 / 500
+# jika status rekaman memang 429 / 5xx / gagal koneksi, selain itu
+# response sintetis fake biasa. Route tanpa rekaman memakai Faults biasa.
+# ---------------------------------------------------------
+
+
+class Recording:
+    def __init__(self, entries):
+        self.routes = defaultdict(list)
+        for e in entries:
+            self.routes[(e["m"], e["p"])].append((e["ms"], e["s"]))
+
+    @classmethod
+    def load(cls, path):
+        return cls(read_recording(path))
+
+    def summary(self):
+        """Return list (method, path, count, p50_ms, p95_ms, error_rate) urut jumlah request."""
+        rows = []
+        for (method, path), samples in self.routes.items():
+            latencies = sorted(ms for ms, _ in samples)
+            errors = sum(1 for _, status in samples if status == 0 or status == 429 or status >= 500)
+            rows.append((
+                method, path, len(samples),
+                latencies[len(latencies) // 2],
+                latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                round(errors / len(samples), 4),
+            ))
+        return sorted(rows, key=lambda r: -r[2])
+
+
+class ReplayFaults(Faults):
+    def __init__(self, recording, scale=1.0, **fallback):
+        super().__init__(**fallback)
+        self.recording = recording
+        self.scale = float(scale)
+
+    def apply(self, method=None, path=None):
+        samples = self.recording.routes.get((method, redact_path(path or ""))) if method else None
+        if not samples:
+            return super().apply(method, path)
+
+        latency_ms, status = random.choice(samples)
+        with self.lock:
+            self.counts["requests"] += 1
+            if status == 429:
+                outcome = 429
+                self.counts["throttled"] += 1
+            elif status == 0 or status >= 500:
+                outcome = 500
+                self.counts["errors"] += 1
+            else:
+                outcome = None
+
+        if latency_ms:
+            time.sleep(latency_ms * self.scale / 1000.0)
+        return outcome
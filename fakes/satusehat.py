@@ -0,0 +1,117 @@
+import threading
+import time
+import uuid
+
+from flask import Flask, jsonify, request
+
+from .faults import Faults, install
+
+# ---------------------------------------------------------
+# Fake SatuSehat: OAuth token server + FHIR R4
+#
+# OAuth : POST /oauth2/v1/accesstoken?grant_type=client_credentials
+# FHIR  : POST /fhir-r4/v1/{Encounter,ServiceRequest,Observation,DiagnosticReport}
+#         GET  /fhir-r4/v1/ImagingStudy?identifier=system|acsn[,system|acsn...]
+# ---------------------------------------------------------
+
+FHIR_RESOURCES = ("Encounter", "ServiceRequest", "Observation", "DiagnosticReport")
+FHIR_JSON = "application/fhir+json"
+
+
+def create_oauth_app(faults=None, token_ttl=14399):
+    app = Flask("fake_oauth")
+    install(app, faults or Faults())
+    issued = {"count": 0}
+    lock = threading.Lock()
+
+    @app.route("/oauth2/v1/accesstoken", methods=["POST"])
+    def access_token():
+        if request.args.get("grant_type") != "client_credentials":
+            return jsonify({"error": "unsupported_grant_type"}), 400
+        if not request.form.get("client_id") or not request.form.get("client_secret"):
+            return jsonify({"error": "invalid_client"}), 401
+
+        with lock:
+            issued["count"] += 1
+        return jsonify({
+            "access_token": uuid.uuid4().hex,
+            "token_type": "BearerToken",
+            "expires_in": str(token_ttl),
+            "issued_at": str(int(time.time() * 1000)),
+            "client_id": request.form["client_id"],
+        })
+
+    @app.route("/_fake/stats")
+    def stats():
+        return jsonify({"tokens_issued": issued["count"]})
+
+    return app
+
+
+def _fhir_response(body, status=200):
+    resp = jsonify(body)
+    resp.status_code = status
+    resp.mimetype = FHIR_JSON
+    return resp
+
+
+def create_fhir_app(faults=None, imaging_missing_rate=0.0):
+    """imaging_missing_rate: fraksi ACSN yang (deterministik) belum punya ImagingStudy."""
+    app = Flask("fake_fhir")
+    install(app, faults or Faults())
+    created = {name: 0 for name in FHIR_RESOURCES}
+    lock = threading.Lock()
+
+    def imaging_exists(acsn):
+        # Deterministik per ACSN supaya search berulang konsisten
+        bucket = uuid.uuid5(uuid.NAMESPACE_OID, acsn).int % 10000
+        return bucket >= imaging_missing_rate * 10000
+
+    @app.route("/fhir-r4/v1/<resource_type>", methods=["POST"])
+    def create(resource_type):
+        if resource_type not in FHIR_RESOURCES:
+            return _fhir_response({"resourceType": "OperationOutcome", "issue": [
+                {"severity": "error", "code": "not-supported", "diagnostics": f"{resource_type} not supported"}
+            ]}, 404)
+
+        resource = request.get_json(silent=True)
+        if not isinstance(resource, dict) or resource.get("resourceType") != resource_type:
+            return _fhir_response({"resourceType": "OperationOutcome", "issue": [
+                {"severity": "error", "code": "invalid", "diagnostics": "resourceType mismatch"}
+            ]}, 400)
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            return _fhir_response({"resourceType": "OperationOutcome", "issue": [
+                {"severity": "error", "code": "login"}
+            ]}, 401)
+
+        with lock:
+            created[resource_type] += 1
+
+        resource = dict(resource, id=str(uuid.uuid4()), meta={
+            "versionId": "1",
+            "lastUpdated": time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime()),
+        })
+        return _fhir_response(resource, 201)
+
+    @app.route("/fhir-r4/v1/ImagingStudy", methods=["GET"])
+    def search_imaging():
+        entries = []
+        for token in filter(None, (request.args.get("identifier") or "").split(",")):
+            system, _, acsn = token.rpartition("|")
+            if not acsn or not imaging_exists(acsn):
+                continue
+            entries.append({"resource": {
+                "resourceType": "ImagingStudy",
+                "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"imaging/{acsn}")),
+                "identifier": [{"system": system, "value": acsn}],
+                "status": "available",
+            }})
+
+        return _fhir_response({"resourceType": "Bundle", "type": "searchset", "total": len(entries), "entry": entries})
+
+    @app.route("/_fake/stats")
+    def stats():
+        with lock:
+            return jsonify({"created": dict(created)})
+
+    return app
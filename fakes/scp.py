@@ -0,0 +1,240 @@
+import os
+import socketserver
+import struct
+import threading
+
+from .faults import Faults
+
+# ---------------------------------------------------------
+# Fake DICOM router: C-ECHO / C-STORE SCP (DICOM Upper Layer, tanpa library)
+#
+# - Semua abstract syntax diterima dengan transfer syntax pertama yang diusulkan.
+# - faults.latency_ms  → jeda sebelum C-STORE-RSP
+# - faults.error_rate  → C-STORE-RSP status A700 (Out of Resources)
+# - faults.rate_429    → asosiasi ditolak transient (A-ASSOCIATE-RJ, local limit exceeded)
+# - store_dir          → simpan dataset yang diterima (kosong = hanya dihitung)
+# ---------------------------------------------------------
+
+APP_CONTEXT = b"1.2.840.10008.3.1.1.1"
+IMPLEMENTATION_UID = b"1.2.826.0.1.3680043.9.7433.99"
+MAX_PDU = 65536
+
+C_STORE_RQ, C_STORE_RSP = 0x0001, 0x8001
+C_ECHO_RQ, C_ECHO_RSP = 0x0030, 0x8030
+NO_DATASET = 0x0101
+
+STATUS_SUCCESS = 0x0000
+STATUS_OUT_OF_RESOURCES = 0xA700
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def _pad_uid(uid):
+    return uid + b"\0" if len(uid) % 2 else uid
+
+
+def _item(item_type, payload):
+    return struct.pack(">BBH", item_type, 0, len(payload)) + payload
+
+
+def _pdu(pdu_type, payload):
+    return struct.pack(">BBI", pdu_type, 0, len(payload)) + payload
+
+
+# ---------------------------------------------------------
+# Command set (implicit VR LE, group 0000)
+# ---------------------------------------------------------
+def parse_command(data):
+    values = {}
+    pos = 0
+    while pos + 8 <= len(data):
+        group, element, length = struct.unpack_from("<HHI", data, pos)
+        values[(group, element)] = data[pos + 8:pos + 8 + length]
+        pos += 8 + length
+    return values
+
+
+def encode_command(elements):
+    """elements: list (element, bytes) group 0000, urut naik; group length ditambahkan."""
+    body = b"".join(struct.pack("<HHI", 0x0000, el, len(v)) + v for el, v in elements)
+    return struct.pack("<HHI", 0x0000, 0x0000, 4) + struct.pack("<I", len(body)) + body
+
+
+def _us(value):
+    return struct.pack("<H", value)
+
+
+def build_response(command, status):
+    field = struct.unpack("<H", command[(0x0000, 0x0100)])[0]
+    message_id = command.get((0x0000, 0x0110), b"\0\0")
+    elements = [(0x0002, _pad_uid(command.get((0x0000, 0x0002), b"").rstrip(b"\0")))]
+    elements.append((0x0100, _us(C_STORE_RSP if field == C_STORE_RQ else C_ECHO_RSP)))
+    elements.append((0x0120, message_id))
+    elements.append((0x0800, _us(NO_DATASET)))
+    elements.append((0x0900, _us(status)))
+    if field == C_STORE_RQ:
+        elements.append((0x1000, _pad_uid(command.get((0x0000, 0x1000), b"").rstrip(b"\0"))))
+    return encode_command(elements)
+
+
+# ---------------------------------------------------------
+# Association handler
+# ---------------------------------------------------------
+class _Handler(socketserver.BaseRequestHandler):
+    def _recv_exact(self, n):
+        chunks = []
+        while n:
+            chunk = self.request.recv(min(n, 1 << 20))
+            if not chunk:
+                raise ConnectionError("peer closed")
+            chunks.append(chunk)
+            n -= len(chunk)
+        return b"".join(chunks)
+
+    def _read_pdu(self):
+        head = self._recv_exact(6)
+        pdu_type, _, length = struct.unpack(">BBI", head)
+        return pdu_type, self._recv_exact(length)
+
+    def _send(self, data):
+        self.request.sendall(data)
+
+    def handle(self):
+        server = self.server
+        try:
+            pdu_type, body = self._read_pdu()
+            if pdu_type != 0x01:
+                raise ProtocolError(f"Expected A-ASSOCIATE-RQ, got {pdu_type:#x}")
+
+            if server.faults.apply() == 429:
+                # A-ASSOCIATE-RJ: rejected-transient, service-provider (presentation), local limit exceeded
+                self._send(_pdu(0x03, struct.pack(">BBBB", 0, 2, 3, 2)))
+                return
+
+            contexts = self._accept(body)
+            self._serve(contexts)
+        except (ConnectionError, ProtocolError, struct.error):
+            pass
+
+    def _accept(self, body):
+        called, calling = body[4:20], body[20:36]
+        pos = 68
+        contexts = {}
+        reply = _item(0x10, APP_CONTEXT)
+
+        while pos + 4 <= len(body):
+            item_type, _, length = struct.unpack_from(">BBH", body, pos)
+            payload = body[pos + 4:pos + 4 + length]
+            pos += 4 + length
+            if item_type != 0x20:
+                continue
+
+            ctx_id = payload[0]
+            syntaxes = []
+            sub = 4
+            while sub + 4 <= len(payload):
+                sub_type, _, sub_len = struct.unpack_from(">BBH", payload, sub)
+                if sub_type == 0x40:
+                    syntaxes.append(payload[sub + 4:sub + 4 + sub_len])
+                sub += 4 + sub_len
+
+            if syntaxes:
+                contexts[ctx_id] = syntaxes[0].rstrip(b"\0")
+                reply += _item(0x21, struct.pack(">BBBB", ctx_id, 0, 0, 0) + _item(0x40, syntaxes[0]))
+            else:
+                reply += _item(0x21, struct.pack(">BBBB", ctx_id, 0, 4, 0))
+
+        user_info = _item(0x51, struct.pack(">I", MAX_PDU)) + _item(0x52, IMPLEMENTATION_UID)
+        reply += _item(0x50, user_info)
+
+        header = struct.pack(">HH", 1, 0) + called + calling + b"\0" * 32
+        self._send(_pdu(0x02, header + reply))
+        return contexts
+
+    def _serve(self, contexts):
+        server = self.server
+        command = b""
+        dataset = []
+        dataset_bytes = 0
+        cmd_values = None
+
+        while True:
+            pdu_type, body = self._read_pdu()
+
+            if pdu_type == 0x05:      # A-RELEASE-RQ
+                self._send(_pdu(0x06, b"\0" * 4))
+                return
+            if pdu_type == 0x07:      # A-ABORT
+                return
+            if pdu_type != 0x04:
+                raise ProtocolError(f"Unexpected PDU {pdu_type:#x}")
+
+            pos = 0
+            while pos + 6 <= len(body):
+                length = struct.unpack_from(">I", body, pos)[0]
+                ctx_id, control = body[pos + 4], body[pos + 5]
+                fragment = body[pos + 6:pos + 4 + length]
+                pos += 4 + length
+
+                if control & 0x01:
+                    command += fragment
+                    if not control & 0x02:
+                        continue
+                    cmd_values = parse_command(command)
+                    command = b""
+                    data_set_type = struct.unpack("<H", cmd_values.get((0x0000, 0x0800), _us(NO_DATASET)))[0]
+                    if data_set_type == NO_DATASET:
+                        self._respond(ctx_id, cmd_values, None, 0)
+                        cmd_values = None
+                else:
+                    if server.store_dir:
+                        dataset.append(fragment)
+                    dataset_bytes += len(fragment)
+                    if control & 0x02 and cmd_values is not None:
+                        self._respond(ctx_id, cmd_values, dataset, dataset_bytes, contexts.get(ctx_id))
+                        cmd_values, dataset, dataset_bytes = None, [], 0
+
+    def _respond(self, ctx_id, command, dataset, size, transfer_syntax=None):
+        server = self.server
+        field = struct.unpack("<H", command[(0x0000, 0x0100)])[0]
+        status = STATUS_SUCCESS
+
+        if field == C_STORE_RQ:
+            outcome = server.faults.apply()
+            if outcome is not None:
+                status = STATUS_OUT_OF_RESOURCES
+            else:
+                server.record(command, dataset, size, transfer_syntax)
+
+        rsp = build_response(command, status)
+        pdv = struct.pack(">I", len(rsp) + 2) + bytes([ctx_id, 0x03]) + rsp
+        self._send(_pdu(0x04, pdv))
+
+
+class StoreSCP(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, faults=None, store_dir=None):
+        super().__init__(address, _Handler)
+        self.faults = faults or Faults()
+        self.store_dir = store_dir
+        self.lock = threading.Lock()
+        self.stats = {"stored": 0, "bytes": 0}
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+
+    def record(self, command, dataset, size, transfer_syntax):
+        with self.lock:
+            self.stats["stored"] += 1
+            self.stats["bytes"] += size
+
+        if self.store_dir and dataset is not None:
+            sop_uid = command.get((0x0000, 0x1000), b"unknown").rstrip(b"\0").decode("ascii", "replace")
+            # Dataset mentah (tanpa file meta) + transfer syntax di nama file
+            ts = (transfer_syntax or b"").decode("ascii", "replace")
+            with open(os.path.join(self.store_dir, f"{sop_uid}.{ts}.dcm"), "wb") as f:
+                for fragment in dataset:
+                    f.write(fragment)
@@ -0,0 +1,67 @@
+import os
+
+# ---------------------------------------------------------
+# Server produksi: gunicorn -c gunicorn.conf.py app:app
+#
+# - Worker gthread: tiap worker proses terpisah (multi-core), tiap worker
+#   melayani GUNICORN_THREADS request bersamaan (I/O ke SatuSehat / PACS).
+# - Default jumlah worker = jumlah CPU (minimal 2). Worker tidak menyimpan
+#   state job sendiri: progress job async, koordinasi job per study dan slot
+#   job DICOM ada di JOBS_DB, token bucket bandwidth di DATA_DIR/throttle.state,
+#   jadi request boleh mendarat di worker mana pun dan batas berlaku per host.
+# - preload_app: app di-import sekali di master lalu di-fork (copy-on-write).
+# - Service background distart di post_fork: per worker (logging, health check
+#   router, profiler) dan satu per host (sweeper, outbox, webhook, watcher)
+#   pada worker yang memegang lock DATA_DIR/background.lock.
+# - SIGTERM: worker berhenti menerima request, request berjalan (termasuk
+#   /dicom/process sinkron) diselesaikan, lalu job async ditunggu, semuanya
+#   dalam GUNICORN_GRACEFUL_TIMEOUT detik.
+# ---------------------------------------------------------
+
+# Harus diset sebelum app di-import (Config dibaca saat import)
+os.environ.setdefault("DEFER_BACKGROUND_SERVICES", "true")
+
+_cpus = os.cpu_count() or 1
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("GUNICORN_WORKERS", str(max(2, _cpus))))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# gthread: heartbeat dari main loop worker, request panjang tidak memicu timeout
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "300"))
+# Koneksi keep-alive idle dari client ikut ditunggu saat graceful shutdown gthread
+# (worker baru berhenti setelah graceful_timeout) → default tanpa keep-alive
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "0"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+# RotatingFileHandler tidak aman jika beberapa proses menulis file yang sama
+if workers > 1:
+    os.environ.setdefault("LOG_ROTATION", "per-process")
+
+# CPU pool (dcmodify / transcode) ada di setiap worker: bagi core ke semua worker
+os.environ.setdefault("CPU_POOL_WORKERS", str(max(1, _cpus // workers)))
+
+
+def post_fork(server, worker):
+    from app import start_host_services, start_process_services
+
+    start_process_services()
+    if start_host_services():
+        server.log.info("Worker %s menjalankan service background per host", worker.pid)
+
+
+def worker_exit(server, worker):
+    from satusehat.service_progress import active_jobs, wait_idle
+
+    if active_jobs():
+        server.log.info("Worker %s menunggu %s job async selesai", worker.pid, active_jobs())
+        remaining = wait_idle(graceful_timeout)
+        if remaining:
+            server.log.warning("Worker %s berhenti dengan %s job async belum selesai", worker.pid, remaining)
@@ -1,4 +1,4 @@
-from flask import request
+from flask import request, Response, stream_with_context, url_for
 from flask_restx import Namespace, Resource, fields
 from .service_encounter import build_encounter_resource
 from .service_servicereq import build_servicereq_resource
@@ -13,6 +13,19 @@ from .service_batch2 import process_batch2
 from .service_batch3 import process_batch3
 from .service_batch4 import process_batch4
 from .service_dicom import process_dicom
+from .service_bulk import iter_bulk_results, BULK_HANDLERS
+from .service_watcher import get_watcher_status
+from .service_jobs import list_running_jobs
+from .service_router import get_pool_status
+from .service_scheduler import get_scheduler_stats
+from .service_transcode import get_transcode_stats
+from common.cpu_pool import get_pool_stats
+from common.dicom_cache import get_cache_stats
+from common.workspace import get_workspace_stats
+from .service_outbox import enqueue_workflow, get_outbox_status, list_outbox, replay_outbox
+from .service_progress import start_job, iter_events, get_progress
+from .service_webhook import callback_url_error, list_deliveries, replay_delivery
+from common import tracing
 
 satset_ns = Namespace("satset", description="Satu Sehat endpoints")
 dicom_ns = Namespace("dicom", description="DICOM Router / PACS Processing")
@@ -197,6 +210,9 @@ dicom_model = dicom_ns.model(
         "study": fields.String( example="1.2.840.113619.2.55.3.604688433.783.159975"),
         "patientid": fields.String(example="P10443013727"),
         "accesionnum": fields.String(example="20250002"),
+        "force": fields.Boolean(description="Kirim ulang semua instance (abaikan sent-SOP index)", example=False),
+        "priority": fields.String(description="Kelas prioritas: stat | routine | bulk", example="routine"),
+        "callback_url": fields.String(description="Webhook saat job async (?async=1) selesai", example="https://ris.local/hooks/gateway"),
     },
 )
 
@@ -240,11 +256,63 @@ batch4_input = satset_ns.model(
         "study": fields.String(required=True, example="1.2.840.113619.2.55.3.604688433.783.159975"),
         "patientid": fields.String(example="P10443013727"),
         "accesionnum": fields.String(example="20250002"),
+        "priority": fields.String(description="Kelas prioritas DICOM: stat | routine | bulk", example="routine"),
+        "callback_url": fields.String(description="Webhook saat job async (?async=1) selesai", example="https://ris.local/hooks/gateway"),
     },
 )
 
 
 
+# -------------------------------
+# Outbox helper
+# -------------------------------
+def outbox_requested():
+    mode = Config.OUTBOX_MODE
+    if mode == "always":
+        return True
+    return mode == "on-request" and request.args.get("mode") == "outbox"
+
+
+# -------------------------------
+# Tracing helper
+# -------------------------------
+def trace_requested():
+    return request.args.get("trace", "").lower() in ("1", "true")
+
+
+def run_traced(name, handler, data):
+    """Jalankan handler di dalam root span; ?trace=1 → sertakan waterfall timing di response."""
+    with tracing.trace(name) as root:
+        result, status = handler(data)
+
+    if trace_requested() and isinstance(result, dict):
+        result = dict(result, trace=tracing.waterfall(root))
+    return result, status
+
+
+# -------------------------------
+# Async (SSE progress) helper
+# -------------------------------
+def async_requested():
+    return request.args.get("async", "").lower() in ("1", "true")
+
+
+def start_async(kind, handler, data):
+    # callback_url opsional: webhook saat job selesai / gagal / sebagian
+    callback_url = data.pop("callback_url", None)
+    if callback_url is not None:
+        error = callback_url_error(callback_url)
+        if error:
+            return {"status": "error", "message": error}, 400
+
+    job_id = start_job(kind, handler, data, callback_url, with_trace=trace_requested())
+    return {
+        "job_id": job_id,
+        "status_url": url_for("dicom_progress_status", job_id=job_id),
+        "events_url": url_for("dicom_progress_events", job_id=job_id),
+    }, 202
+
+
 # -------------------------------
 # Routes
 # -------------------------------
@@ -269,6 +337,8 @@ class Token(Resource):
 class EncounterCreate(Resource):
     def post(self):
         data = request.get_json(silent=True) or {}
+        if outbox_requested():
+            return enqueue_workflow("encounter", data)
 
         # Build resource
         encounter = build_encounter_resource(data)
@@ -288,6 +358,8 @@ class EncounterCreate(Resource):
 class ServiceRequestCreate(Resource):
     def post(self):
         data = request.get_json(silent=True) or {}
+        if outbox_requested():
+            return enqueue_workflow("service-req", data)
 
         # Build resource
         sreq = build_servicereq_resource(data)
@@ -306,8 +378,10 @@ class ServiceRequestCreate(Resource):
 class Batch1(Resource):
     def post(self):
         data = request.get_json(silent=True) or {}
+        if outbox_requested():
+            return enqueue_workflow("batch1", data)
 
-        result, status = process_batch1(data)
+        result, status = run_traced("batch1", process_batch1, data)
         return result, status
 
 
@@ -316,6 +390,8 @@ class Batch1(Resource):
 class ObservationCreate(Resource):
     def post(self):
         data = request.get_json(silent=True) or {}
+        if outbox_requested():
+            return enqueue_workflow("observation", data)
 
         # Build Observation resource
         try:
@@ -337,6 +413,8 @@ class ObservationCreate(Resource):
 class DiagnosticCreate(Resource):
     def post(self):
         data = request.get_json(silent=True) or {}
+        if outbox_requested():
+            return enqueue_workflow("conclusion", data)
 
         # Build DiagnosticReport resource
         try:
@@ -358,7 +436,10 @@ class DiagnosticCreate(Resource):
 class Batch2(Resource):
     def post(self):
         data = request.get_json(silent=True) or {}
-        result, status = process_batch2(data)
+        if outbox_requested():
+            return enqueue_workflow("batch2", data)
+
+        result, status = run_traced("batch2", process_batch2, data)
         return result, status
 
 @satset_ns.route("/batch3")
@@ -366,7 +447,10 @@ class Batch2(Resource):
 class Batch3(Resource):
     def post(self):
         data = request.get_json(silent=True) or {}
-        result, status = process_batch3(data)
+        if outbox_requested():
+            return enqueue_workflow("batch3", data)
+
+        result, status = run_traced("batch3", process_batch3, data)
         return result, status
 
 
@@ -377,17 +461,144 @@ class ImageId(Resource):
         return result, status
 
 @dicom_ns.route("/process")
+@dicom_ns.doc(params={"async": "1 → jalankan di background, progress via /dicom/progress/<job_id>/events"})
 class ProcessDicom(Resource):
     @dicom_ns.expect(dicom_model)
     def post(self):
         data = dicom_ns.payload
-        result, status = process_dicom(data)
+        if async_requested():
+            return start_async("dicom", process_dicom, data)
+        result, status = run_traced("dicom_process", process_dicom, data)
         return result, status
 
+
+@dicom_ns.route("/progress/<string:job_id>")
+class ProgressStatus(Resource):
+    def get(self, job_id):
+        return get_progress(job_id)
+
+
+@dicom_ns.route("/progress/<string:job_id>/events")
+class ProgressEvents(Resource):
+    def get(self, job_id):
+        """Server-Sent Events: step, instance terkirim, bytes, ETA; event terakhir "done" berisi hasil"""
+        last_event_id = request.headers.get("Last-Event-ID", 0, type=int)
+        events = iter_events(job_id, last_event_id)
+        return Response(
+            stream_with_context(events),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+@dicom_ns.route("/cpu-pool")
+class CpuPoolStats(Resource):
+    def get(self):
+        return get_pool_stats(), 200
+
+
+@dicom_ns.route("/transcode")
+class TranscodeStats(Resource):
+    def get(self):
+        return get_transcode_stats(), 200
+
+
+@dicom_ns.route("/scheduler")
+class SchedulerStats(Resource):
+    def get(self):
+        return get_scheduler_stats(), 200
+
+
+@dicom_ns.route("/routers")
+class RouterPool(Resource):
+    def get(self):
+        return get_pool_status(), 200
+
+
+@dicom_ns.route("/jobs")
+class DicomJobs(Resource):
+    def get(self):
+        return {"jobs": list_running_jobs()}, 200
+
+
+@dicom_ns.route("/cache")
+class CacheStats(Resource):
+    def get(self):
+        return get_cache_stats(), 200
+
+
+@dicom_ns.route("/workspace")
+class WorkspaceStats(Resource):
+    def get(self):
+        return get_workspace_stats(), 200
+
+
+@dicom_ns.route("/watcher")
+class WatcherStatus(Resource):
+    def get(self):
+        return get_watcher_status()
+
 @satset_ns.route("/batch4")
 @satset_ns.expect(batch4_input, validate=False)
+@satset_ns.doc(params={"async": "1 → jalankan di background, progress via /dicom/progress/<job_id>/events"})
 class Batch4(Resource):
     def post(self):
         data = request.get_json(silent=True) or {}
-        result, status = process_batch4(data)
+        if async_requested():
+            return start_async("batch4", process_batch4, data)
+        result, status = run_traced("batch4", process_batch4, data)
         return result, status
+
+
+@satset_ns.route("/outbox")
+class OutboxList(Resource):
+    def get(self):
+        status = request.args.get("status")
+        limit = request.args.get("limit", 100, type=int)
+        return list_outbox(status=status, limit=limit)
+
+
+@satset_ns.route("/outbox/<string:outbox_id>")
+class OutboxStatus(Resource):
+    def get(self, outbox_id):
+        return get_outbox_status(outbox_id)
+
+
+@satset_ns.route("/outbox/<string:outbox_id>/replay")
+class OutboxReplay(Resource):
+    def post(self, outbox_id):
+        return replay_outbox(outbox_id)
+
+
+@satset_ns.route("/webhooks")
+class WebhookList(Resource):
+    def get(self):
+        status = request.args.get("status")
+        limit = request.args.get("limit", 100, type=int)
+        return list_deliveries(status=status, limit=limit)
+
+
+@satset_ns.route("/webhooks/<string:delivery_id>/replay")
+class WebhookReplay(Resource):
+    def post(self, delivery_id):
+        return replay_delivery(delivery_id)
+
+
+@satset_ns.route("/bulk")
+@satset_ns.doc(
+    params={
+        "batch": "Default batch untuk tiap baris (batch3 / batch4)",
+        "concurrency": "Jumlah record yang diproses bersamaan",
+    },
+)
+class BulkIntake(Resource):
+    def post(self):
+        """Body NDJSON (satu payload batch3/batch4 per baris); hasil di-stream sebagai NDJSON"""
+        kind = request.args.get("batch", "batch3")
+        if kind not in BULK_HANDLERS:
+            return {"error": f"Unsupported batch: {kind}"}, 400
+
+        concurrency = request.args.get("concurrency", Config.BULK_CONCURRENCY, type=int)
+        concurrency = max(1, min(concurrency, Config.BULK_MAX_CONCURRENCY))
+
+        results = iter_bulk_results(request.stream, kind, concurrency)
+        return Response(stream_with_context(results), mimetype="application/x-ndjson")
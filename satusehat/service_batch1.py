@@ -1,6 +1,8 @@
 from config import Config
 from common.auth import get_access_token
 from common.fhir_client import post_fhir
+from common.tracing import step
+from common.logger import log_event
 from .service_encounter import build_encounter_resource
 from .service_servicereq import build_servicereq_resource
 
@@ -17,17 +19,19 @@ def process_batch1(data):
     # -----------------------------
     # 1. Ambil token
     # -----------------------------
+    step("token")
     token, err = get_access_token()
-    # print("tahap 1. Ambil token",token)
+    log_event("batch1", stage="token", ok=not err)
     if err:
         return err, 502
 
     # -----------------------------
     # 2. Build Encounter
     # -----------------------------
+    step("encounter")
     try:
         encounter_resource = build_encounter_resource(data)
-        # print("2. Build Encounter")
+        log_event("batch1", stage="encounter_built", identifier_value=data.get("identifier_value"))
     except Exception as e:
         return {"error": str(e)}, 400
 
@@ -41,7 +45,7 @@ def process_batch1(data):
 
     # Ambil Encounter ID dari response
     encounter_id = enc_resp.get("id")
-    # print("3. POST Encounter",encounter_id)
+    log_event("batch1", stage="encounter_posted", encounter_id=encounter_id)
     if not encounter_id:
         return {"error": "Encounter created but no ID returned", "detail": enc_resp}, 500
 
@@ -51,9 +55,10 @@ def process_batch1(data):
     # -----------------------------
     # 4. Build ServiceRequest
     # -----------------------------
+    step("service_request")
     try:
         sreq_resource = build_servicereq_resource(data)
-        #print("4. Build ServiceRequest",sreq_resource)
+        log_event("batch1", stage="service_request_built", noacsn=data.get("noacsn"))
     except Exception as e:
         return {"error": str(e)}, 400
 
@@ -72,7 +77,7 @@ def process_batch1(data):
 
     # Ambil ServiceRequest ID
     service_request_id = sreq_resp.get("id")
-    # print("5. POST ServiceRequest",service_request_id)
+    log_event("batch1", stage="service_request_posted", service_request_id=service_request_id)
     
     # -----------------------------
     # 6. Return final result
@@ -1,6 +1,7 @@
 from config import Config
 from common.auth import get_access_token
 from common.fhir_client import post_fhir
+from common.tracing import step
 
 from .service_observation import build_observation_resource
 from .service_diagnostic import build_diagnostic_resource
@@ -18,6 +19,7 @@ def process_batch2(data):
     # -----------------------------
     # 1. Ambil token
     # -----------------------------
+    step("token")
     token, err = get_access_token()
     if err:
         return err, 502
@@ -25,6 +27,7 @@ def process_batch2(data):
     # -----------------------------
     # 2. Build Observation
     # -----------------------------
+    step("observation")
     try:
         obs_resource = build_observation_resource(data)
     except Exception as e:
@@ -49,6 +52,7 @@ def process_batch2(data):
     # -----------------------------
     # 4. Build DiagnosticReport
     # -----------------------------
+    step("diagnostic_report")
     try:
         drep_resource = build_diagnostic_resource(data)
     except Exception as e:
@@ -1,6 +1,7 @@
 from config import Config
 from common.auth import get_access_token
 from common.fhir_client import post_fhir
+from common.tracing import step
 
 from .service_encounter import build_encounter_resource
 from .service_servicereq import build_servicereq_resource
@@ -22,6 +23,7 @@ def process_batch3(data):
     # -----------------------------
     # 1. Token
     # -----------------------------
+    step("token")
     token, err = get_access_token()
     if err:
         return err, 502
@@ -29,6 +31,7 @@ def process_batch3(data):
     # -----------------------------
     # 2. Encounter
     # -----------------------------
+    step("encounter")
     try:
         encounter_resource = build_encounter_resource(data)
     except Exception as e:
@@ -46,6 +49,7 @@ def process_batch3(data):
     # -----------------------------
     # 3. ServiceRequest
     # -----------------------------
+    step("service_request")
     try:
         sreq_resource = build_servicereq_resource(data)
     except Exception as e:
@@ -67,6 +71,7 @@ def process_batch3(data):
     # -----------------------------
     # 4. ImagingStudy (lookup by ACSN)
     # -----------------------------
+    step("imaging_lookup")
     acsn = data.get("noacsn")
     img_resp, img_status = lookup_imaging_by_acsn(acsn)
 
@@ -84,6 +89,7 @@ def process_batch3(data):
     # -----------------------------
     # 5. Observation
     # -----------------------------
+    step("observation")
     try:
         obs_resource = build_observation_resource(data)
     except Exception as e:
@@ -107,6 +113,7 @@ def process_batch3(data):
     # -----------------------------
     # 6. DiagnosticReport
     # -----------------------------
+    step("diagnostic_report")
     try:
         drep_resource = build_diagnostic_resource(data)
     except Exception as e:
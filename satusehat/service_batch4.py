@@ -1,6 +1,7 @@
 from config import Config
 from common.auth import get_access_token
 from common.fhir_client import post_fhir
+from common.tracing import step
 
 from .service_encounter import build_encounter_resource
 from .service_servicereq import build_servicereq_resource
@@ -8,6 +9,7 @@ from .service_observation import build_observation_resource
 from .service_diagnostic import build_diagnostic_resource
 from .service_imaging import lookup_imaging_by_acsn
 from .service_dicom import process_dicom
+from .service_progress import report
 
 
 def process_batch4(data):
@@ -24,6 +26,7 @@ def process_batch4(data):
     # -----------------------------
     # 1. Token
     # -----------------------------
+    step("token")
     token, err = get_access_token()
     if err:
         return err, 502
@@ -31,6 +34,8 @@ def process_batch4(data):
     # -----------------------------
     # 2. Encounter
     # -----------------------------
+    step("encounter")
+    report("encounter")
     try:
         encounter_resource = build_encounter_resource(data)
     except Exception as e:
@@ -48,6 +53,8 @@ def process_batch4(data):
     # -----------------------------
     # 3. ServiceRequest
     # -----------------------------
+    step("service_request")
+    report("service_request")
     try:
         sreq_resource = build_servicereq_resource(data)
     except Exception as e:
@@ -69,6 +76,8 @@ def process_batch4(data):
     # -----------------------------
     # 4. /process → send DICOM to router
     # -----------------------------
+    step("dicom")
+    report("dicom")
     dicom_result, dicom_status = process_dicom(data)
 
     if dicom_status != 200:
@@ -82,6 +91,8 @@ def process_batch4(data):
     # -----------------------------
     # 5. ImagingStudy lookup by ACSN
     # -----------------------------
+    step("imaging_lookup")
+    report("imaging_lookup")
     acsn = data.get("noacsn")
     img_resp, img_status = lookup_imaging_by_acsn(acsn)
 
@@ -99,6 +110,8 @@ def process_batch4(data):
     # -----------------------------
     # 6. Observation
     # -----------------------------
+    step("observation")
+    report("observation")
     try:
         obs_resource = build_observation_resource(data)
     except Exception as e:
@@ -122,6 +135,8 @@ def process_batch4(data):
     # -----------------------------
     # 7. DiagnosticReport
     # -----------------------------
+    step("diagnostic_report")
+    report("diagnostic_report")
     try:
         drep_resource = build_diagnostic_resource(data)
     except Exception as e:
@@ -0,0 +1,91 @@
+import json
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .service_batch3 import process_batch3
+from .service_batch4 import process_batch4
+from common import tracing
+
+BULK_HANDLERS = {
+    "batch3": process_batch3,
+    "batch4": process_batch4,
+}
+
+
+def _process_record(line_no, raw, default_kind):
+    """Proses satu baris NDJSON → dict hasil (tidak pernah raise)."""
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        return {"line": line_no, "status": 400, "result": {"error": f"Invalid JSON: {e}"}}
+
+    if not isinstance(data, dict):
+        return {"line": line_no, "status": 400, "result": {"error": "Each line must be a JSON object"}}
+
+    # Per-baris boleh override jenis batch lewat field "batch"
+    kind = data.pop("batch", None) or default_kind
+    handler = BULK_HANDLERS.get(kind)
+
+    ref = {
+        "identifier_value": data.get("identifier_value"),
+        "noacsn": data.get("noacsn"),
+    }
+
+    if not handler:
+        return {"line": line_no, "batch": kind, **ref, "status": 400,
+                "result": {"error": f"Unsupported batch: {kind}"}}
+
+    # Backfill massal: DICOM dikirim di kelas bulk kecuali diminta lain
+    data.setdefault("priority", "bulk")
+
+    try:
+        with tracing.trace(f"bulk_{kind}", line=line_no):
+            result, status = handler(data)
+    except Exception as e:
+        result, status = {"error": str(e)}, 500
+
+    return {"line": line_no, "batch": kind, **ref, "status": status, "result": result}
+
+
+def _encode(item):
+    return json.dumps(item) + "\n"
+
+
+def iter_bulk_results(lines, default_kind, concurrency):
+    """
+    Baca NDJSON secara streaming, proses maksimal `concurrency` record
+    sekaligus, dan yield hasil per record (NDJSON) segera setelah selesai.
+    Baris input berikutnya baru dibaca jika ada slot kosong; hasil yang sudah
+    selesai di-yield setiap kali satu baris masuk (upload lambat tetap mengalir).
+    """
+    total = ok = 0
+    pending = set()
+
+    def collect(timeout=None):
+        nonlocal pending, total, ok
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for f in done:
+            item = f.result()
+            total += 1
+            ok += item["status"] < 300
+            yield _encode(item)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk") as executor:
+        for line_no, raw in enumerate(lines, start=1):
+            if isinstance(raw, bytes):
+                raw = raw.decode("utf-8")
+            raw = raw.strip()
+            if not raw:
+                continue
+
+            while len(pending) >= concurrency:
+                yield from collect()
+
+            pending.add(executor.submit(_process_record, line_no, raw, default_kind))
+
+            # Tanpa blocking: kirim hasil yang sudah selesai sebelum membaca baris berikutnya
+            yield from collect(timeout=0)
+
+        while pending:
+            yield from collect()
+
+    yield _encode({"summary": {"total": total, "success": ok, "failed": total - ok}})
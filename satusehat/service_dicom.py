@@ -1,15 +1,33 @@
 import os
+import json
+import hashlib
 import subprocess
-import requests
 from config import Config
+from common import sop_index
+from common import dicom_cache
+from common.workspace import job_workspace, WorkspaceUnavailable
+from .service_jobs import run_study_job
+from . import service_router as router_pool
+from .service_scheduler import job_slot
+from common import throttle
+from common import http
+from .service_transcode import transcode
+from common.cpu_pool import run_stage
+from common.dicom_header import patch_elements
+from .service_progress import report
+from common import metrics
+from common.metrics import instrumented
+from common import tracing
+from common.logger import log_sampled
 
 # ---------------------------------------------------------
 # Helper: cari study dari Accession Number dari PACS
 # ---------------------------------------------------------
+@instrumented("find_dicom_by_accession", span=True, log=True)
 def find_dicom_by_accession(acc_num):
     url = f"{Config.DCM4CHEE_URL}/rs/studies?AccessionNumber={acc_num}"
 
-    resp = requests.get(url, timeout=10)
+    resp = http.get(url, timeout=10)
 
     if resp.status_code != 200:
         return None, "Study tidak ditemukan"
@@ -22,12 +40,76 @@ def find_dicom_by_accession(acc_num):
     return study_uid, None
 
 
+# ---------------------------------------------------------
+# Helper: list study per rentang tanggal (QIDO paged)
+# ---------------------------------------------------------
+def _tag_value(item, tag):
+    values = (item.get(tag) or {}).get("Value") or []
+    return values[0] if values else None
+
+
+def list_studies(date_from, date_to, offset=0, limit=100, orderby="StudyDate,StudyTime"):
+    """
+    QIDO-RS /studies untuk StudyDate date_from..date_to (YYYYMMDD).
+    Return list of {study_uid, accession, study_date}; list kosong = halaman terakhir.
+    """
+    params = {
+        "StudyDate": f"{date_from}-{date_to}",
+        "includefield": "00080050",
+        "orderby": orderby,
+        "offset": offset,
+        "limit": limit,
+    }
+    resp = http.get(f"{Config.DCM4CHEE_URL}/rs/studies", params=params, timeout=30)
+
+    # dcm4chee membalas 204 jika tidak ada hasil
+    if resp.status_code == 204:
+        return []
+    resp.raise_for_status()
+
+    return [
+        {
+            "study_uid": _tag_value(item, "0020000D"),
+            "accession": _tag_value(item, "00080050"),
+            "study_date": _tag_value(item, "00080020"),
+        }
+        for item in resp.json()
+    ]
+
+
+def list_updated_studies(since, update_key, offset=0, limit=500):
+    """
+    QIDO-RS /studies yang berubah sejak `since` (DICOM DateTime YYYYMMDDHHMMSS).
+    `update_key` = atribut waktu update di dcm4chee (mis. StudyUpdateDateTime).
+    """
+    params = {
+        update_key: f"{since}-",
+        "includefield": "00080050,00201208",
+        "offset": offset,
+        "limit": limit,
+    }
+    resp = http.get(f"{Config.DCM4CHEE_URL}/rs/studies", params=params, timeout=30)
+
+    if resp.status_code == 204:
+        return []
+    resp.raise_for_status()
+
+    return [
+        {
+            "study_uid": _tag_value(item, "0020000D"),
+            "accession": _tag_value(item, "00080050"),
+            "instances": _tag_value(item, "00201208"),
+        }
+        for item in resp.json()
+    ]
+
+
 # ---------------------------------------------------------
 # Helper: Ambil metadata dari PACS
 # ---------------------------------------------------------
 def get_dicom_metadata(study_uid):
     url = f"{Config.DCM4CHEE_URL}/rs/studies/{study_uid}/metadata"
-    resp = requests.get(url, timeout=10)
+    resp = http.get(url, timeout=10)
     resp.raise_for_status()
     data = resp.json()
 
@@ -37,9 +119,10 @@ def get_dicom_metadata(study_uid):
     }
 
 
+@instrumented("get_all_instances", span=True, log=True)
 def get_all_instances(study_uid):
     url = f"{Config.DCM4CHEE_URL}/rs/studies/{study_uid}/metadata"
-    resp = requests.get(url, timeout=10)
+    resp = http.get(url, timeout=10)
     resp.raise_for_status()
     data = resp.json()
 
@@ -48,6 +131,8 @@ def get_all_instances(study_uid):
         instances.append({
             "series": item["0020000E"]["Value"][0],
             "sop": item["00080018"]["Value"][0],
+            # Sidik jari metadata instance di PACS (untuk deteksi perubahan)
+            "meta_hash": hashlib.sha1(json.dumps(item, sort_keys=True).encode("utf-8")).hexdigest(),
         })
 
     return instances
@@ -55,7 +140,8 @@ def get_all_instances(study_uid):
 # ---------------------------------------------------------
 # Helper: Download WADO
 # ---------------------------------------------------------
-def download_wado(study_uid, meta, target_path):
+@instrumented("download_wado", span=True)
+def download_wado(study_uid, meta, target_path, priority="routine"):
     params = {
         "requestType": "WADO",
         "studyUID": study_uid,
@@ -64,16 +150,32 @@ def download_wado(study_uid, meta, target_path):
         "contentType": "application/dicom",
     }
 
-    with requests.get(f"{Config.DCM4CHEE_URL}/wado", params=params, stream=True) as r:
+    with http.get(f"{Config.DCM4CHEE_URL}/wado", params=params, stream=True) as r:
         r.raise_for_status()
         with open(target_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
+            # Chunk 64 KiB: token bucket bersama (flock) diambil per chunk
+            for chunk in r.iter_content(chunk_size=64 * 1024):
+                throttle.consume(priority, "download", len(chunk))
                 f.write(chunk)
+                metrics.DICOM_BYTES.inc(len(chunk), direction="download")
 
 # ---------------------------------------------------------
 # Helper: Modify DICOM tags
 # ---------------------------------------------------------
 def modify_dicom(file_path, patient_id=None, acc_num=None):
+    values = {}
+    if patient_id:
+        values[(0x0010, 0x0020)] = patient_id
+    if acc_num:
+        values[(0x0008, 0x0050)] = acc_num
+
+    if not values:
+        return
+
+    # Fast path: patch header langsung tanpa membaca ulang pixel data
+    if Config.DICOM_MMAP_PATCH and patch_elements(file_path, values):
+        return
+
     cmd = ["dcmodify", "--ignore-errors"]
 
     if patient_id:
@@ -98,110 +200,244 @@ def modify_dicom(file_path, patient_id=None, acc_num=None):
 # ---------------------------------------------------------
 # Helper: Send to Router (storescu)
 # ---------------------------------------------------------
-def send_to_router(file_path):
+def _storescu(target, file_path, propose="--propose-lossless"):
     cmd = [
         "storescu",
         "-v",
-        "--propose-lossless",
+        propose,
         "-aec",
-        Config.ROUTER_AET,
-        Config.ROUTER_IP,
-        Config.ROUTER_PORT,
+        target.aet,
+        target.host,
+        target.port,
         file_path,
     ]
 
     result = subprocess.run(cmd, capture_output=True, text=True)
 
     if "Received Store Response (Success)" not in (result.stdout + result.stderr):
-        raise Exception(f"StoreSCU Failed: {result.stderr}")
+        raise Exception(f"StoreSCU Failed ({target.label}): {result.stderr}")
 
-def process_dicom(data):
-    study_uid = data.get("study")
-    patient_id = data.get("patientid")
-    accession = data.get("accesionnum")
 
-    try:
-        # =====================================================
-        # 1 & 2. Tentukan Study UID
-        # =====================================================
-        if study_uid:
-            # validasi study ada / tidak
-            try:
-                instances = get_all_instances(study_uid)
-                if not instances:
-                    return {
-                        "status": "error",
-                        "message": "Study UID tidak memiliki instance"
-                    }, 404
-            except Exception:
-                return {
-                    "status": "error",
-                    "message": "Study UID tidak ditemukan"
-                }, 404
+@instrumented("send_to_router", span=True)
+def send_to_router(file_path, priority="routine", propose=None):
+    """
+    Kirim file ke salah satu router di pool (weighted, hanya yang sehat).
+    Jika gagal, failover ke router lain. Return label router yang dipakai.
+    `propose` = opsi storescu untuk transfer syntax hasil transcoding.
+    """
+    # storescu mengirim satu file dengan kecepatan penuh: pacing per file sebelum kirim
+    # (rata-rata lintas file <= rate), bukan shaping di dalam transfer
+    throttle.pace(priority, "send", os.path.getsize(file_path))
 
-        else:
-            # Study kosong → cari via Accession Number
-            if not accession:
-                return {
-                    "status": "error",
-                    "message": "Study UID dan Accession Number kosong"
-                }, 400
+    tried = []
+    last_error = None
 
-            study_uid, err = find_dicom_by_accession(accession)
-            if err:
-                return {
-                    "status": "error",
-                    "message": err
-                }, 404
+    while True:
+        target = router_pool.pick(exclude=tried)
+        if target is None:
+            raise Exception(f"StoreSCU Failed on all routers: {last_error}")
 
-            instances = get_all_instances(study_uid)
-            if not instances:
-                return {
-                    "status": "error",
-                    "message": "Study ditemukan tapi tidak ada instance"
-                }, 404
+        try:
+            _storescu(target, file_path, propose or "--propose-lossless")
+        except Exception as e:
+            router_pool.mark_failure(target, str(e))
+            tried.append(target)
+            last_error = e
+            continue
 
-        # =====================================================
-        # 3–8. Download, Modify (opsional), Send (LOOP)
-        # =====================================================
-        success_count = 0
-
-        for idx, inst in enumerate(instances):
-            local_path = os.path.join(
-                Config.TEMP_DIR, f"{study_uid}_{idx}.dcm"
-            )
+        router_pool.mark_success(target)
+        return target.label
 
-            try:
-                # 3. Download WADO (per SOP)
-                download_wado(study_uid, inst, local_path)
 
-                # 4–7. Modify DICOM (bersyarat)
-                if patient_id or accession:
-                    modify_dicom(
+# ---------------------------------------------------------
+# Transfer: Download → Modify → Send per instance
+# ---------------------------------------------------------
+def transfer_instances(workspace, study_uid, instances, patient_id=None, accession=None, force=False,
+                       priority="routine"):
+    """
+    Kirim semua instance study ke router memakai folder kerja `workspace`.
+    Return {"sent", "skipped" (sudah terkirim sebelumnya), "routers" (label → jumlah)}.
+    """
+    success_count = 0
+    skipped_count = 0
+    routers = {}
+
+    use_index = Config.SOP_INDEX_ENABLED and not force
+    sent_index = sop_index.load_study(study_uid) if use_index else {}
+    target = router_pool.pool_key()
+
+    def downloader(uid, inst, path):
+        download_wado(uid, inst, path, priority=priority)
+
+    report("transfer", instances_total=len(instances))
+
+    for idx, inst in enumerate(instances):
+        local_path = os.path.join(workspace, f"{idx}.dcm")
+
+        mod_hash = sop_index.modification_hash(inst["meta_hash"], patient_id, accession, target)
+        if sent_index.get(inst["sop"]) == (mod_hash, "success"):
+            # Sudah terkirim dengan isi & tujuan yang sama
+            skipped_count += 1
+            metrics.DICOM_INSTANCES.inc(result="skipped")
+            report(add_instances_skipped=1)
+            continue
+
+        sp, token = tracing.start_span("instance", sop=inst["sop"], index=idx)
+        try:
+            # 3. Download WADO (per SOP), lewat cache lokal jika aktif
+            report("download", current_sop=inst["sop"])
+            dicom_cache.fetch(study_uid, inst, local_path, downloader)
+
+            # 4–7. Modify DICOM (bersyarat, di CPU pool)
+            if patient_id or accession:
+                report("modify")
+                # Diukur di sini (bukan di modify_dicom) karena fungsi itu jalan di proses worker
+                with metrics.track("modify_dicom", span=True):
+                    run_stage(
+                        "modify",
+                        modify_dicom,
                         local_path,
                         patient_id=patient_id if patient_id else None,
                         acc_num=accession if accession else None,
                     )
 
-                # 8. Kirim ke Router
-                send_to_router(local_path)
-                success_count += 1
+            # 7b. Transcode lossless (opsional, di process pool)
+            if Config.DICOM_TRANSCODE:
+                report("transcode")
+            propose = transcode(local_path)
+
+            # 8. Kirim ke Router (pool)
+            size = os.path.getsize(local_path)
+            report("send")
+            router = send_to_router(local_path, priority=priority, propose=propose)
+            routers[router] = routers.get(router, 0) + 1
+            success_count += 1
+            metrics.DICOM_INSTANCES.inc(result="sent")
+            metrics.DICOM_BYTES.inc(size, direction="send")
+            report(add_instances_done=1, add_bytes_sent=size)
+            log_sampled("dicom_instance", study_uid=study_uid, sop=inst["sop"], router=router, bytes=size)
+
+            if Config.SOP_INDEX_ENABLED:
+                sop_index.record(study_uid, inst["sop"], mod_hash, "success")
+
+        except Exception as e:
+            metrics.DICOM_INSTANCES.inc(result="failed")
+            if sp:
+                sp.fail(e)
+            log_sampled("dicom_instance", e, study_uid=study_uid, sop=inst["sop"])
+            if Config.SOP_INDEX_ENABLED:
+                sop_index.record(study_uid, inst["sop"], mod_hash, "failed", error=str(e))
+            raise
+
+        finally:
+            # Cleanup per file
+            if os.path.exists(local_path):
+                os.remove(local_path)
+            tracing.end_span(sp, token)
+
+    return {"sent": success_count, "skipped": skipped_count, "routers": routers}
+
+
+def _process_study(job_id, study_uid, from_accession, patient_id, accession, force, priority):
+    try:
+        # =====================================================
+        # 1 & 2. Validasi study & ambil daftar instance
+        # =====================================================
+        report("list_instances", study_uid=study_uid)
+        try:
+            instances = get_all_instances(study_uid)
+        except Exception:
+            if from_accession:
+                raise
+            return {
+                "status": "error",
+                "message": "Study UID tidak ditemukan"
+            }, 404
+
+        if not instances:
+            return {
+                "status": "error",
+                "message": "Study ditemukan tapi tidak ada instance" if from_accession
+                else "Study UID tidak memiliki instance"
+            }, 404
 
-            finally:
-                # Cleanup per file
-                if os.path.exists(local_path):
-                    os.remove(local_path)
+        # =====================================================
+        # 3–8. Download, Modify (opsional), Send (LOOP)
+        # =====================================================
+        report("waiting_slot", priority=priority)
+        with job_slot(priority), job_workspace(job_id) as workspace:
+            sent = transfer_instances(
+                workspace, study_uid, instances, patient_id, accession, force, priority
+            )
 
         return {
             "status": "success",
             "study_uid": study_uid,
             "total_instance": len(instances),
-            "sent_instance": success_count,
+            "sent_instance": sent["sent"],
+            "skipped_instance": sent["skipped"],
             "patient_modified": bool(patient_id),
             "accession_modified": bool(accession),
-            "router": f"{Config.ROUTER_IP}:{Config.ROUTER_PORT}",
+            "router": ", ".join(sent["routers"]) or router_pool.pool_key(),
+            "router_distribution": sent["routers"],
+            "priority": priority,
         }, 200
 
+    except WorkspaceUnavailable as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }, 503
+
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }, 500
+
+
+def process_dicom(data):
+    study_uid = data.get("study")
+    patient_id = data.get("patientid")
+    accession = data.get("accesionnum")
+    # force=True → kirim ulang semua instance tanpa melihat sent-SOP index
+    force = bool(data.get("force"))
+    # Kelas prioritas: stat | routine | bulk
+    priority = data.get("priority") or "routine"
+
+    if priority not in throttle.PRIORITIES:
+        return {
+            "status": "error",
+            "message": f"priority harus salah satu dari: {', '.join(throttle.PRIORITIES)}"
+        }, 400
+
+    try:
+        # =====================================================
+        # Tentukan Study UID (langsung / via Accession Number)
+        # =====================================================
+        from_accession = not study_uid
+        if from_accession:
+            if not accession:
+                return {
+                    "status": "error",
+                    "message": "Study UID dan Accession Number kosong"
+                }, 400
+
+            report("find_study")
+            study_uid, err = find_dicom_by_accession(accession)
+            if err:
+                return {
+                    "status": "error",
+                    "message": err
+                }, 404
+
+        # Satu job per study; request identik bergabung / ditolak
+        return run_study_job(
+            study_uid,
+            (patient_id, accession, force),
+            lambda job_id: _process_study(job_id, study_uid, from_accession, patient_id, accession, force, priority),
+        )
+
     except Exception as e:
         return {
             "status": "error",
@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+
+from config import Config
+from common import http
+from common import metrics
+from common import cpu_pool
+from common.auth import get_access_token, token_status
+from common.workspace import free_bytes
+from . import service_router as router_pool
+from . import service_warmup
+
+# ---------------------------------------------------------
+# Probe dependency untuk /health/live & /health/ready
+#
+# Probe (token, SatuSehat, dcm4chee, router, temp disk) dijalankan thread
+# background setiap HEALTH_PROBE_INTERVAL detik dan hasilnya di-cache;
+# endpoint hanya membaca cache, sehingga health check load balancer
+# (mis. tiap detik) tidak memicu panggilan upstream maupun refresh token.
+# ---------------------------------------------------------
+
+HEALTH_PROBE_OK = metrics.Gauge(
+    "gateway_health_probe_ok", "Hasil probe dependency terakhir (1 = ok)", ("probe",),
+)
+
+_lock = threading.Lock()
+_results = {}
+_last_round = None
+_prober = None
+
+
+class ProbeFailed(Exception):
+    def __init__(self, message, detail=None):
+        super().__init__(message)
+        self.detail = detail or {}
+
+
+# ---------------------------------------------------------
+# Probe; return dict detail jika ok, raise ProbeFailed / Exception jika gagal
+# ---------------------------------------------------------
+def _probe_token():
+    # Memakai cache token; hanya fetch ulang jika sudah masuk TOKEN_REFRESH_MARGIN
+    token, err = get_access_token()
+    if err:
+        raise ProbeFailed(err.get("detail") or err.get("error"))
+    return token_status()
+
+
+def _probe_satusehat():
+    token, err = get_access_token()
+    if err:
+        raise ProbeFailed("token tidak tersedia")
+
+    resp = http.get(Config.SS_BASE_URL.rstrip("/") + "/metadata",
+                    headers={"Authorization": f"Bearer {token}"}, timeout=Config.HEALTH_PROBE_TIMEOUT)
+    detail = {"status_code": resp.status_code}
+    if resp.status_code >= 500 or resp.status_code == 401:
+        raise ProbeFailed(f"SatuSehat HTTP {resp.status_code}", detail)
+    return detail
+
+
+def _probe_dcm4chee():
+    resp = http.get(Config.DCM4CHEE_URL.rstrip("/") + "/rs/studies", params={"limit": 1},
+                    timeout=Config.HEALTH_PROBE_TIMEOUT)
+    detail = {"status_code": resp.status_code}
+    if resp.status_code >= 500:
+        raise ProbeFailed(f"dcm4chee HTTP {resp.status_code}", detail)
+    return detail
+
+
+def _probe_router():
+    # Health checker router sudah C-ECHO berkala; jika nonaktif, C-ECHO di sini
+    if Config.ROUTER_HEALTH_INTERVAL <= 0:
+        for target in router_pool.get_targets():
+            router_pool.check_target(target, timeout=int(Config.HEALTH_PROBE_TIMEOUT))
+
+    targets = router_pool.get_pool_status()["targets"]
+    healthy = [t["target"] for t in targets if t["healthy"]]
+    detail = {"healthy": len(healthy), "total": len(targets)}
+    if not healthy:
+        raise ProbeFailed("tidak ada router yang sehat", detail)
+    return detail
+
+
+def _probe_temp_disk():
+    free = free_bytes()
+    detail = {
+        "free_bytes": free,
+        "min_free_bytes": Config.TEMP_MIN_FREE_BYTES,
+        "writable": os.access(Config.TEMP_DIR, os.W_OK),
+    }
+    if not detail["writable"]:
+        raise ProbeFailed("TEMP_DIR tidak bisa ditulis", detail)
+    if free < Config.TEMP_MIN_FREE_BYTES:
+        raise ProbeFailed("free space TEMP_DIR di bawah TEMP_MIN_FREE_BYTES", detail)
+    return detail
+
+
+PROBES = {
+    "token": _probe_token,
+    "satusehat": _probe_satusehat,
+    "dcm4chee": _probe_dcm4chee,
+    "router": _probe_router,
+    "temp_disk": _probe_temp_disk,
+}
+
+
+# ---------------------------------------------------------
+# Runner
+# ---------------------------------------------------------
+def _run_probe(name, fn):
+    started = time.time()
+    result = {"ok": True, "error": None, "detail": {}}
+    try:
+        result["detail"] = fn() or {}
+    except ProbeFailed as e:
+        result.update(ok=False, error=str(e), detail=e.detail)
+    except Exception as e:
+        result.update(ok=False, error=str(e) or type(e).__name__)
+
+    result["checked_at"] = started
+    result["duration_ms"] = round((time.time() - started) * 1000, 1)
+    HEALTH_PROBE_OK.set(int(result["ok"]), probe=name)
+    return result
+
+
+def probe_all():
+    global _last_round
+    for name, fn in PROBES.items():
+        result = _run_probe(name, fn)
+        with _lock:
+            _results[name] = result
+    with _lock:
+        _last_round = time.time()
+
+
+def _probe_loop():
+    while True:
+        try:
+            probe_all()
+        except Exception as e:
+            print(f"[!] Health probe error: {e}")
+        time.sleep(Config.HEALTH_PROBE_INTERVAL)
+
+
+def start_prober():
+    global _prober
+    if cpu_pool.in_pool_worker():
+        return
+    if Config.HEALTH_PROBE_INTERVAL <= 0 or (_prober and _prober.is_alive()):
+        return
+
+    _prober = threading.Thread(target=_probe_loop, name="health-probe", daemon=True)
+    _prober.start()
+
+
+def _max_age():
+    # Satu putaran boleh terlambat: interval + semua probe kena timeout
+    return 2 * Config.HEALTH_PROBE_INTERVAL + len(PROBES) * Config.HEALTH_PROBE_TIMEOUT
+
+
+def _snapshot():
+    now = time.time()
+    with _lock:
+        probes = {name: dict(r) for name, r in _results.items()}
+        last_round = _last_round
+
+    for r in probes.values():
+        r["age_seconds"] = round(now - r.pop("checked_at"), 1)
+        r["stale"] = r["age_seconds"] > _max_age()
+    return probes, last_round
+
+
+# ---------------------------------------------------------
+# Status untuk endpoint (hanya membaca cache)
+# ---------------------------------------------------------
+def liveness():
+    """Return (alive, status). Mati jika thread probe berhenti (proses tidak sehat)."""
+    _, last_round = _snapshot()
+    prober_alive = Config.HEALTH_PROBE_INTERVAL <= 0 or bool(_prober and _prober.is_alive())
+    return prober_alive, {
+        "pid": os.getpid(),
+        "prober_alive": prober_alive,
+        "last_probe_age_seconds": round(time.time() - last_round, 1) if last_round else None,
+    }
+
+
+def readiness():
+    """
+    Return (ready, status). Ready jika warm-up selesai dan semua probe di
+    HEALTH_REQUIRED_PROBES ok & tidak basi; probe lain yang gagal → degraded.
+    """
+    warmup_ready, warmup = service_warmup.readiness()
+    probes, _ = _snapshot()
+
+    failed = sorted(name for name, r in probes.items() if not r["ok"] or r["stale"])
+    blocking = []
+    if Config.HEALTH_PROBE_INTERVAL > 0:
+        blocking = [name for name in Config.HEALTH_REQUIRED_PROBES if name in failed or name not in probes]
+
+    ready = warmup_ready and not blocking
+    return ready, {
+        "pid": os.getpid(),
+        "degraded": bool(failed) or bool(warmup.get("degraded")),
+        "failed": failed,
+        "blocking": blocking,
+        "probes": probes,
+        "warmup": warmup,
+    }
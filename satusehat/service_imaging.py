@@ -1,9 +1,12 @@
 import requests
 import os
 from config import Config
-from common.auth import get_access_token
+from common.auth import get_access_token, invalidate_token
+from common.metrics import instrumented
+from common import http
 
 
+@instrumented("lookup_imaging_by_acsn", is_error=lambda r: r[1] >= 500, span=True, log=True)
 def lookup_imaging_by_acsn(acsn):
     """
     Cari ImagingStudy berdasarkan ACSN (Accession Number)
@@ -35,10 +38,14 @@ def lookup_imaging_by_acsn(acsn):
     # 3. GET ImagingStudy
     # -----------------------------
     try:
-        resp = requests.get(imaging_url, headers=headers, timeout=20)
+        resp = http.get(imaging_url, headers=headers, timeout=20)
     except requests.RequestException as exc:
         return {"error": "Failed to GET ImagingStudy", "detail": str(exc)}, 502
 
+    # Token ditolak (dicabut / kedaluwarsa lebih cepat) → request berikutnya ambil token baru
+    if resp.status_code == 401:
+        invalidate_token(token)
+
     ctype = resp.headers.get("Content-Type", "")
 
     # -----------------------------
@@ -79,3 +86,54 @@ def lookup_imaging_by_acsn(acsn):
 
     except Exception:
         return {"raw": resp.text}, resp.status_code
+
+
+def search_imaging_by_acsns(acsns):
+    """
+    Cari banyak ACSN sekaligus dalam satu search ImagingStudy
+    (identifier=system|a,system|b,... → OR).
+    Return (set ACSN yang sudah ada di SatuSehat, error).
+    """
+    acsns = [a for a in acsns if a]
+    if not acsns:
+        return set(), None
+
+    token, err = get_access_token()
+    if err:
+        return None, err
+
+    org_id = os.getenv("SS_ORG_ID") or Config.SS_ORG_ID
+    identifier_system = f"http://sys-ids.kemkes.go.id/acsn/{org_id}"
+
+    url = Config.SS_BASE_URL.rstrip("/") + "/ImagingStudy"
+    params = {
+        "identifier": ",".join(f"{identifier_system}|{a}" for a in acsns),
+        "_count": len(acsns) * 2,
+    }
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/fhir+json",
+    }
+
+    found = set()
+    while url:
+        try:
+            resp = http.get(url, params=params, headers=headers, timeout=30)
+            if resp.status_code == 401:
+                invalidate_token(token)
+            resp.raise_for_status()
+            data = resp.json()
+        except Exception as exc:
+            return None, {"error": "Failed to search ImagingStudy", "detail": str(exc)}
+
+        for e in data.get("entry") or []:
+            res = e.get("resource") or {}
+            for ident in res.get("identifier") or []:
+                if ident.get("system") == identifier_system and ident.get("value") in acsns:
+                    found.add(ident["value"])
+
+        # Ikuti link "next" (sudah berisi query lengkap)
+        url = next((l.get("url") for l in data.get("link") or [] if l.get("relation") == "next"), None)
+        params = None
+
+    return found, None
@@ -0,0 +1,140 @@
+import json
+import os
+import time
+import uuid
+
+from config import Config
+from common import job_state
+
+# ---------------------------------------------------------
+# Koordinasi job DICOM per study
+#
+# Satu study hanya diproses oleh satu job pada satu waktu.
+# Request kedua dengan parameter yang sama:
+#   attach → menunggu job yang berjalan dan menerima hasil yang sama
+#   reject → langsung ditolak 409 dengan job_id yang sedang berjalan
+# Request dengan parameter berbeda (tag override lain) menunggu giliran.
+#
+# State ada di JOBS_DB (tabel study_job), jadi berlaku lintas worker gunicorn;
+# request yang menunggu melakukan polling setiap JOBS_POLL_INTERVAL detik.
+# ---------------------------------------------------------
+
+# Hasil job selesai disimpan sebentar untuk request yang attach (polling)
+RESULT_TTL = 60
+
+
+def _reap(conn):
+    conn.execute("DELETE FROM study_job WHERE finished IS NOT NULL AND finished < ?", (time.time() - RESULT_TTL,))
+    for pid in job_state.dead_pids(conn, "study_job", "finished IS NULL"):
+        conn.execute("DELETE FROM study_job WHERE pid = ? AND finished IS NULL", (pid,))
+
+
+def _claim(study_uid, key):
+    """Return (job_id, peran): "owner", "attach" atau "reject" (job_id = job yang sedang berjalan)."""
+    with job_state.write() as conn:
+        _reap(conn)
+        row = conn.execute(
+            "SELECT job_id FROM study_job WHERE job_key = ? AND finished IS NULL", (key,)
+        ).fetchone()
+
+        if row:
+            if Config.DICOM_DUPLICATE_MODE == "reject":
+                return row["job_id"], "reject"
+            conn.execute("UPDATE study_job SET attached = attached + 1 WHERE job_id = ?", (row["job_id"],))
+            return row["job_id"], "attach"
+
+        job_id = uuid.uuid4().hex
+        conn.execute(
+            "INSERT INTO study_job (job_id, job_key, study_uid, pid, state, created) VALUES (?, ?, ?, ?, 'waiting', ?)",
+            (job_id, key, study_uid, os.getpid(), time.time()),
+        )
+        return job_id, "owner"
+
+
+def _wait_turn(job_id, study_uid):
+    """Tunggu sampai tidak ada job lain yang berjalan untuk study ini, lalu tandai running."""
+    while True:
+        with job_state.write() as conn:
+            _reap(conn)
+            busy = conn.execute(
+                "SELECT 1 FROM study_job WHERE study_uid = ? AND state = 'running' AND job_id != ?",
+                (study_uid, job_id),
+            ).fetchone()
+            if not busy:
+                conn.execute("UPDATE study_job SET state = 'running' WHERE job_id = ?", (job_id,))
+                return
+        time.sleep(Config.JOBS_POLL_INTERVAL)
+
+
+def _finish(job_id, result):
+    body, status = result
+    with job_state.write() as conn:
+        conn.execute(
+            "UPDATE study_job SET state = 'done', result = ?, status = ?, finished = ? WHERE job_id = ?",
+            (json.dumps(body), status, time.time(), job_id),
+        )
+
+
+def _wait_result(job_id):
+    while True:
+        with job_state.read() as conn:
+            row = conn.execute("SELECT * FROM study_job WHERE job_id = ?", (job_id,)).fetchone()
+
+        if row is None or (row["finished"] is None and not job_state.pid_alive(row["pid"])):
+            return {"status": "error", "message": "Job pemilik berhenti sebelum selesai"}, 500
+        if row["finished"] is not None:
+            return json.loads(row["result"]), row["status"]
+        time.sleep(Config.JOBS_POLL_INTERVAL)
+
+
+def run_study_job(study_uid, params, runner):
+    """
+    Jalankan runner(job_id) untuk study, atau gabung ke job identik yang sedang berjalan.
+    `params` harus bisa di-serialisasi JSON (mis. tuple tag override); runner mengembalikan (result, status).
+    """
+    key = json.dumps([study_uid, list(params)])
+
+    job_id, role = _claim(study_uid, key)
+    if role == "reject":
+        return {
+            "status": "error",
+            "message": "Study sedang diproses oleh job lain",
+            "job_id": job_id,
+        }, 409
+
+    if role == "attach":
+        result, status = _wait_result(job_id)
+        return dict(result, job_id=job_id, coalesced=True), status
+
+    result = ({"status": "error", "message": "Job dihentikan"}, 500)
+    try:
+        _wait_turn(job_id, study_uid)
+        result = runner(job_id)
+    except Exception as e:
+        result = ({"status": "error", "message": str(e)}, 500)
+    finally:
+        _finish(job_id, result)
+
+    result, status = result
+    return dict(result, job_id=job_id), status
+
+
+def list_running_jobs():
+    with job_state.read() as conn:
+        rows = conn.execute(
+            "SELECT * FROM study_job WHERE finished IS NULL ORDER BY created"
+        ).fetchall()
+
+    now = time.time()
+    return [
+        {
+            "job_id": row["job_id"],
+            "study_uid": row["study_uid"],
+            "state": row["state"],
+            "age_seconds": round(now - row["created"], 1),
+            "attached_requests": row["attached"],
+            "pid": row["pid"],
+        }
+        for row in rows
+        if job_state.pid_alive(row["pid"])
+    ]
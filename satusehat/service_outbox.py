@@ -0,0 +1,222 @@
+import json
+import threading
+
+from config import Config
+from common import outbox
+from common.auth import get_access_token
+from common.fhir_client import post_fhir
+
+from .service_encounter import build_encounter_resource
+from .service_servicereq import build_servicereq_resource
+from .service_observation import build_observation_resource
+from .service_diagnostic import build_diagnostic_resource
+from .service_imaging import lookup_imaging_by_acsn
+
+
+# ---------------------------------------------------------
+# Step & workflow definitions
+# (builder, FHIR path, output key yang diisi setelah step sukses)
+# ---------------------------------------------------------
+STEP_TYPES = {
+    "Encounter": (build_encounter_resource, "/Encounter", "encounter_id"),
+    "ServiceRequest": (build_servicereq_resource, "/ServiceRequest", "service_request_id"),
+    "ImagingStudy": (None, None, "imaging_study_id"),
+    "Observation": (build_observation_resource, "/Observation", "observation_id"),
+    "DiagnosticReport": (build_diagnostic_resource, "/DiagnosticReport", "diagnostic_report_id"),
+}
+
+WORKFLOWS = {
+    "encounter": ["Encounter"],
+    "service-req": ["ServiceRequest"],
+    "observation": ["Observation"],
+    "conclusion": ["DiagnosticReport"],
+    "batch1": ["Encounter", "ServiceRequest"],
+    "batch2": ["Observation", "DiagnosticReport"],
+    "batch3": ["Encounter", "ServiceRequest", "ImagingStudy", "Observation", "DiagnosticReport"],
+}
+
+# Status yang layak dicoba ulang (SatuSehat down / rate limit / token gagal)
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+_wakeup = threading.Event()
+_drainer = None
+
+
+def _placeholder(key):
+    # Referensi ke id yang baru diketahui setelah step sebelumnya terkirim
+    return f"urn:outbox:{key}"
+
+
+def _resolve(resource, outputs):
+    text = json.dumps(resource)
+    for key, value in outputs.items():
+        # Hanya id string; None / nilai lain tidak boleh menjadi "Encounter/None"
+        if isinstance(value, str) and value:
+            text = text.replace(_placeholder(key), value)
+    return json.loads(text)
+
+
+# ---------------------------------------------------------
+# Enqueue: validasi via builder → simpan → ACK langsung
+# ---------------------------------------------------------
+def enqueue_workflow(kind, data):
+    data = dict(data)
+    steps = []
+
+    for resource_type in WORKFLOWS[kind]:
+        builder, _, output_key = STEP_TYPES[resource_type]
+
+        if builder:
+            try:
+                resource = builder(data)
+            except Exception as e:
+                return {"error": str(e), "step": resource_type}, 400
+        else:
+            acsn = data.get("noacsn")
+            if not acsn:
+                return {"error": "Missing required field: noacsn", "step": resource_type}, 400
+            resource = {"acsn": acsn}
+
+        steps.append((resource_type, resource))
+
+        # Step berikutnya mereferensikan id via placeholder
+        if not data.get(output_key):
+            data[output_key] = _placeholder(output_key)
+
+    group_id = outbox.create_group(kind, steps)
+    _wakeup.set()
+
+    return {
+        "status": "queued",
+        "outbox_id": group_id,
+        "steps": [s[0] for s in steps],
+    }, 202
+
+
+# ---------------------------------------------------------
+# Drainer
+# ---------------------------------------------------------
+def _backoff(attempts):
+    return min(Config.OUTBOX_MAX_BACKOFF, Config.OUTBOX_RETRY_BASE * (2 ** attempts))
+
+
+def _submit_step(step, outputs, token):
+    builder, path, _ = STEP_TYPES[step["resource_type"]]
+    resource = _resolve(step["resource"], outputs)
+
+    if builder is None:
+        return lookup_imaging_by_acsn(resource["acsn"])
+
+    url = Config.SS_BASE_URL.rstrip("/") + path
+    return post_fhir(url, token, resource)
+
+
+def _drain_group(group, token):
+    """
+    Kirim step pending milik satu group secara berurutan.
+    Return False jika harus berhenti (error retryable → tunggu siklus berikutnya).
+    """
+    outputs = dict(group["outputs"])
+
+    for step in group["steps"]:
+        if step["status"] == "sent":
+            continue
+
+        resp, status = _submit_step(step, outputs, token)
+        _, _, output_key = STEP_TYPES[step["resource_type"]]
+
+        if status < 300:
+            resource_id = (resp.get("id") or resp.get("imagingStudy_id")) if isinstance(resp, dict) else None
+            if not (isinstance(resource_id, str) and resource_id):
+                # 2xx tanpa id: step berikutnya tidak bisa mereferensikan → dead-letter
+                error = {"step": step["resource_type"], "status": status, "error": "Response tanpa id", "detail": resp}
+                outbox.mark_dead(group["group_id"], step["step_no"], error)
+                return True
+
+            outputs[output_key] = resource_id
+            outbox.mark_step_sent(group["group_id"], step["step_no"], resource_id, resp, outputs)
+            # mark_step_sent me-reset attempts di DB; samakan dict agar backoff step berikutnya mulai dari 0
+            group["attempts"] = 0
+            continue
+
+        error = {"step": step["resource_type"], "status": status, "detail": resp}
+
+        # ImagingStudy belum muncul di SatuSehat (404) juga dicoba ulang
+        retryable = status in RETRYABLE_STATUS or (step["resource_type"] == "ImagingStudy" and status == 404)
+
+        if retryable and group["attempts"] + 1 < Config.OUTBOX_MAX_ATTEMPTS:
+            outbox.mark_retry(group["group_id"], error, _backoff(group["attempts"]))
+            return False
+
+        outbox.mark_dead(group["group_id"], step["step_no"], error)
+        return True
+
+    return True
+
+
+def drain_once():
+    token = None
+
+    while True:
+        group = outbox.next_due_group()
+        if not group:
+            return
+
+        if token is None:
+            token, err = get_access_token()
+            if err:
+                # SatuSehat auth down: jangan hitung sebagai attempt
+                return
+
+        if not _drain_group(group, token):
+            return
+
+
+def _drain_loop():
+    while True:
+        try:
+            drain_once()
+        except Exception as e:
+            print(f"[!] Outbox drainer error: {e}")
+
+        _wakeup.wait(Config.OUTBOX_POLL_INTERVAL)
+        _wakeup.clear()
+
+
+def start_drainer():
+    global _drainer
+    if _drainer and _drainer.is_alive():
+        return
+
+    _drainer = threading.Thread(target=_drain_loop, name="outbox-drainer", daemon=True)
+    _drainer.start()
+    print(f"[*] Outbox drainer started (db: {Config.OUTBOX_DB})")
+
+
+# ---------------------------------------------------------
+# Status, dead-letter & replay
+# ---------------------------------------------------------
+def get_outbox_status(group_id):
+    group = outbox.get_group(group_id)
+    if not group:
+        return {"error": "Outbox entry not found"}, 404
+    return group, 200
+
+
+def list_outbox(status=None, limit=100):
+    return {
+        "counts": outbox.counts(),
+        "items": outbox.list_groups(status=status, limit=limit),
+    }, 200
+
+
+def replay_outbox(group_id):
+    group = outbox.get_group(group_id)
+    if not group:
+        return {"error": "Outbox entry not found"}, 404
+
+    if not outbox.replay(group_id):
+        return {"error": "Outbox entry is not in dead-letter", "status": group["status"]}, 409
+
+    _wakeup.set()
+    return {"status": "requeued", "outbox_id": group_id}, 200
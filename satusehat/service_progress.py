@@ -0,0 +1,305 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+from config import Config
+from .service_webhook import notify_job
+from common import job_state
+from common import tracing
+
+# ---------------------------------------------------------
+# Progress job async (/dicom/process?async=1, /satset/batch4?async=1)
+#
+# Handler dijalankan di thread terpisah; kode di dalamnya memanggil
+# report(...) untuk mengirim event (step, instance, bytes). State & event
+# disimpan di JOBS_DB sehingga status / SSE bisa dilayani worker mana pun;
+# worker pemilik job menunggu event baru lewat Condition, worker lain polling
+# setiap JOBS_POLL_INTERVAL detik.
+# Job yang selesai disimpan PROGRESS_TTL detik agar client bisa reconnect.
+# Per job hanya PROGRESS_MAX_EVENTS event terakhir yang disimpan (event
+# "done" selalu yang terakhir); client yang tertinggal menerima snapshot.
+# ---------------------------------------------------------
+
+
+def _snapshot(state, created, transfer_started):
+    state = dict(state)
+    now = time.time()
+    state["elapsed_seconds"] = round(now - created, 1)
+
+    total, done = state["instances_total"], state["instances_done"] + state["instances_skipped"]
+    state["eta_seconds"] = None
+    if total and done and transfer_started:
+        rate = done / max(now - transfer_started, 1e-6)
+        state["eta_seconds"] = round((total - done) / rate, 1)
+    return state
+
+
+class ProgressJob:
+    def __init__(self, kind):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.created = time.time()
+        self.finished = None
+        self.last_event = 0
+        self.cond = threading.Condition()
+        self.state = {
+            "step": "queued",
+            "instances_total": None,
+            "instances_done": 0,
+            "instances_skipped": 0,
+            "bytes_sent": 0,
+        }
+        self.transfer_started = None
+
+    def emit(self, event, data):
+        with self.cond:
+            self.last_event += 1
+            with job_state.write() as conn:
+                conn.execute(
+                    "INSERT INTO progress_event (job_id, event_id, event, data) VALUES (?, ?, ?, ?)",
+                    (self.job_id, self.last_event, event, json.dumps(data)),
+                )
+                conn.execute(
+                    "UPDATE progress_job SET state = ?, transfer_started = ?, finished = ?, last_event = ? "
+                    "WHERE job_id = ?",
+                    (json.dumps(self.state), self.transfer_started, self.finished, self.last_event, self.job_id),
+                )
+                if self.last_event > Config.PROGRESS_MAX_EVENTS:
+                    conn.execute(
+                        "DELETE FROM progress_event WHERE job_id = ? AND event_id <= ?",
+                        (self.job_id, self.last_event - Config.PROGRESS_MAX_EVENTS),
+                    )
+            self.cond.notify_all()
+
+    def snapshot(self):
+        return _snapshot(self.state, self.created, self.transfer_started)
+
+
+_lock = threading.Lock()
+# Job yang berjalan di proses ini (untuk graceful shutdown & notifikasi event lokal)
+_jobs = {}
+_local = threading.local()
+
+
+def _cleanup():
+    cutoff = time.time() - Config.PROGRESS_TTL
+    with job_state.write() as conn:
+        conn.execute(
+            "DELETE FROM progress_event WHERE job_id IN "
+            "(SELECT job_id FROM progress_job WHERE finished IS NOT NULL AND finished < ?)",
+            (cutoff,),
+        )
+        conn.execute("DELETE FROM progress_job WHERE finished IS NOT NULL AND finished < ?", (cutoff,))
+
+        # Worker pemilik mati sebelum job selesai → tutup job dengan event "done" gagal
+        for pid in job_state.dead_pids(conn, "progress_job", "finished IS NULL"):
+            for row in conn.execute(
+                "SELECT * FROM progress_job WHERE pid = ? AND finished IS NULL", (pid,)
+            ).fetchall():
+                _close_lost(conn, row)
+
+
+def _close_lost(conn, row):
+    now = time.time()
+    state = dict(json.loads(row["state"]), step="failed")
+    result = {"status": "error", "message": "Worker yang menjalankan job berhenti"}
+    data = dict(_snapshot(state, row["created"], row["transfer_started"]), status=500, result=result)
+    conn.execute(
+        "INSERT INTO progress_event (job_id, event_id, event, data) VALUES (?, ?, 'done', ?)",
+        (row["job_id"], row["last_event"] + 1, json.dumps(data)),
+    )
+    conn.execute(
+        "UPDATE progress_job SET state = ?, finished = ?, last_event = ? WHERE job_id = ?",
+        (json.dumps(state), now, row["last_event"] + 1, row["job_id"]),
+    )
+
+
+def report(step=None, **fields):
+    """
+    Update progress job yang sedang berjalan di thread ini (no-op jika tidak ada).
+    fields: instances_total, instances_done, instances_skipped, bytes_sent, dll.
+    Nilai increment dikirim dengan prefix "add_", mis. add_bytes_sent=1024.
+    """
+    job = getattr(_local, "job", None)
+    if job is None:
+        return
+
+    with job.cond:
+        if step:
+            job.state["step"] = step
+        for key, value in fields.items():
+            if key.startswith("add_"):
+                key = key[4:]
+                job.state[key] = (job.state.get(key) or 0) + value
+            else:
+                job.state[key] = value
+        if fields.get("instances_total") is not None:
+            job.transfer_started = time.time()
+        data = job.snapshot()
+
+    job.emit("progress", data)
+
+
+def start_job(kind, handler, data, callback_url=None, with_trace=False):
+    """
+    Jalankan handler(data) → (result, status) di background; return job_id.
+    Setelah selesai webhook dikirim ke callback_url (jika ada) dan WEBHOOK_URLS.
+    with_trace=True → hasil menyertakan waterfall timing (seperti ?trace=1 sinkron).
+    """
+    _cleanup()
+    job = ProgressJob(kind)
+    with job_state.write() as conn:
+        conn.execute(
+            "INSERT INTO progress_job (job_id, kind, pid, created, state) VALUES (?, ?, ?, ?, ?)",
+            (job.job_id, kind, os.getpid(), job.created, json.dumps(job.state)),
+        )
+    with _lock:
+        _jobs[job.job_id] = job
+
+    def run():
+        _local.job = job
+        try:
+            with tracing.trace(kind, job_id=job.job_id) as root:
+                result, status = handler(data)
+        except Exception as e:
+            result, status = {"status": "error", "message": str(e)}, 500
+        finally:
+            _local.job = None
+
+        if with_trace and isinstance(result, dict):
+            result = dict(result, trace=tracing.waterfall(root))
+
+        try:
+            with job.cond:
+                job.state["step"] = "done" if status < 300 else "failed"
+                job.finished = time.time()
+                job.emit("done", dict(job.snapshot(), status=status, result=result))
+                instances_done = job.state["instances_done"]
+        finally:
+            with _lock:
+                _jobs.pop(job.job_id, None)
+
+        notify_job(job.job_id, kind, status, result, callback_url, instances_done)
+
+    threading.Thread(target=run, name=f"progress-{kind}", daemon=True).start()
+    return job.job_id
+
+
+def _format(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+def _load(job_id):
+    with job_state.read() as conn:
+        return conn.execute("SELECT * FROM progress_job WHERE job_id = ?", (job_id,)).fetchone()
+
+
+def _events_after(job_id, after):
+    with job_state.read() as conn:
+        return conn.execute(
+            "SELECT event_id, event, data FROM progress_event WHERE job_id = ? AND event_id > ? ORDER BY event_id",
+            (job_id, after),
+        ).fetchall()
+
+
+def _wait_for_event(job_id, sent, timeout):
+    """Tunggu event setelah `sent`: Condition jika job berjalan di proses ini, selain itu polling."""
+    with _lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        time.sleep(min(timeout, Config.JOBS_POLL_INTERVAL))
+        return
+
+    with job.cond:
+        if job.last_event <= sent and not job.finished:
+            job.cond.wait(timeout=timeout)
+
+
+def _catch_up(job_id):
+    """
+    Client tertinggal (event setelah Last-Event-ID sudah dibuang).
+    Return (event snapshot atau None, event_id terakhir yang dianggap terkirim).
+    """
+    row = _load(job_id)
+    if row is None:
+        return None, 0
+    if row["finished"]:
+        # Lompat ke event "done" (selalu event terakhir dan tidak pernah dibuang)
+        return None, row["last_event"] - 1
+
+    # state di progress_job ditulis bersama event terakhir → konsisten dengan last_event
+    state = _snapshot(json.loads(row["state"]), row["created"], row["transfer_started"])
+    return _format(row["last_event"], "progress", json.dumps(state)), row["last_event"]
+
+
+def iter_events(job_id, last_event_id=0):
+    """Generator SSE: replay event setelah last_event_id, lalu tunggu event baru."""
+    if _load(job_id) is None:
+        yield _format(0, "error", json.dumps({"message": "Job not found"}))
+        return
+
+    sent = last_event_id
+    idle_since = time.monotonic()
+    while True:
+        pending = _events_after(job_id, sent)
+        if pending and pending[0]["event_id"] > sent + 1:
+            snapshot, sent = _catch_up(job_id)
+            if snapshot:
+                yield snapshot
+            continue
+
+        for row in pending:
+            sent = row["event_id"]
+            yield _format(row["event_id"], row["event"], row["data"])
+            if row["event"] == "done":
+                return
+        if pending:
+            idle_since = time.monotonic()
+            continue
+
+        row = _load(job_id)
+        if row is None or row["finished"]:
+            if row is None or not _events_after(job_id, sent):
+                return
+            continue
+
+        idle = time.monotonic() - idle_since
+        if idle >= Config.PROGRESS_KEEPALIVE:
+            # Komentar keepalive supaya proxy tidak memutus koneksi idle
+            yield ": keepalive\n\n"
+            idle_since = time.monotonic()
+            continue
+
+        _wait_for_event(job_id, sent, Config.PROGRESS_KEEPALIVE - idle)
+        if not job_state.pid_alive(row["pid"]):
+            _cleanup()
+
+
+def get_progress(job_id):
+    row = _load(job_id)
+    if row is not None and row["finished"] is None and not job_state.pid_alive(row["pid"]):
+        _cleanup()
+        row = _load(job_id)
+    if row is None:
+        return {"error": "Job not found"}, 404
+
+    state = _snapshot(json.loads(row["state"]), row["created"], row["transfer_started"])
+    return dict(state, job_id=row["job_id"], kind=row["kind"], finished=row["finished"] is not None), 200
+
+
+def active_jobs():
+    """Jumlah job async yang berjalan di proses ini."""
+    with _lock:
+        return len(_jobs)
+
+
+def wait_idle(timeout):
+    """Tunggu semua job async proses ini selesai (graceful shutdown). Return jumlah job yang masih berjalan."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not active_jobs():
+            return 0
+        time.sleep(0.5)
+    return active_jobs()
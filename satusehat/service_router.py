@@ -0,0 +1,176 @@
+import subprocess
+import threading
+import time
+
+from config import Config
+
+# ---------------------------------------------------------
+# Pool DICOM router
+#
+# ROUTER_POOL="AET@host:port*weight,AET2@host2:port" (weight default 1).
+# Jika kosong, pool berisi satu target dari ROUTER_AET / ROUTER_IP / ROUTER_PORT.
+# Pemilihan: smooth weighted round-robin di antara target yang sehat.
+# Target ditandai tidak sehat setelah ROUTER_FAIL_THRESHOLD kegagalan berturut-turut
+# dan dipulihkan oleh health check C-ECHO berkala.
+# ---------------------------------------------------------
+
+
+class RouterTarget:
+    def __init__(self, aet, host, port, weight=1):
+        self.aet = aet
+        self.host = host
+        self.port = str(port)
+        self.weight = max(1, int(weight))
+        self.current_weight = 0
+        self.healthy = True
+        self.failures = 0
+        self.last_error = None
+        self.last_check = None
+
+    @property
+    def label(self):
+        return f"{self.aet}@{self.host}:{self.port}"
+
+    def to_dict(self):
+        return {
+            "target": self.label,
+            "weight": self.weight,
+            "healthy": self.healthy,
+            "consecutive_failures": self.failures,
+            "last_error": self.last_error,
+            "last_check": self.last_check,
+        }
+
+
+_lock = threading.Lock()
+_targets = None
+_checker = None
+
+
+def parse_pool(spec):
+    targets = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+
+        weight = 1
+        if "*" in item:
+            item, weight = item.rsplit("*", 1)
+
+        aet, _, address = item.partition("@")
+        host, _, port = address.rpartition(":")
+        if not (aet and host and port):
+            raise ValueError(f"Invalid ROUTER_POOL entry: {item!r} (expected AET@host:port*weight)")
+
+        targets.append(RouterTarget(aet, host, port, weight))
+    return targets
+
+
+def get_targets():
+    global _targets
+    if _targets is None:
+        with _lock:
+            if _targets is None:
+                _targets = parse_pool(Config.ROUTER_POOL) or [
+                    RouterTarget(Config.ROUTER_AET, Config.ROUTER_IP, Config.ROUTER_PORT)
+                ]
+    return _targets
+
+
+def pool_key():
+    """Identitas tujuan kirim (untuk sent-SOP index)."""
+    targets = get_targets()
+    if len(targets) == 1:
+        return targets[0].label
+    return "pool:" + ",".join(sorted(t.label for t in targets))
+
+
+def pick(exclude=()):
+    """Pilih target berikutnya (smooth WRR). None jika semua target sudah dicoba."""
+    candidates = [t for t in get_targets() if t not in exclude]
+    if not candidates:
+        return None
+
+    with _lock:
+        # Jika semua tidak sehat, tetap coba (status health bisa saja basi)
+        healthy = [t for t in candidates if t.healthy] or candidates
+
+        total = sum(t.weight for t in healthy)
+        for t in healthy:
+            t.current_weight += t.weight
+        best = max(healthy, key=lambda t: t.current_weight)
+        best.current_weight -= total
+        return best
+
+
+def mark_success(target):
+    with _lock:
+        target.failures = 0
+        target.healthy = True
+
+
+def mark_failure(target, error):
+    with _lock:
+        target.failures += 1
+        target.last_error = error
+        if target.failures >= Config.ROUTER_FAIL_THRESHOLD:
+            target.healthy = False
+
+
+# ---------------------------------------------------------
+# Health check (C-ECHO via echoscu)
+# ---------------------------------------------------------
+def c_echo(target, timeout=10):
+    cmd = ["echoscu", "-to", str(timeout), "-aec", target.aet, target.host, target.port]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout + 5)
+    except Exception as e:
+        return False, str(e)
+
+    if result.returncode != 0:
+        return False, (result.stderr or result.stdout).strip()
+    return True, None
+
+
+def check_target(target, timeout=10):
+    """C-ECHO satu target dan perbarui status health-nya. Return (ok, error)."""
+    ok, err = c_echo(target, timeout)
+    with _lock:
+        target.last_check = time.time()
+        if ok:
+            target.healthy = True
+            target.failures = 0
+        else:
+            target.healthy = False
+            target.last_error = err
+    return ok, err
+
+
+def check_all():
+    for target in get_targets():
+        check_target(target)
+
+
+def _check_loop():
+    while True:
+        try:
+            check_all()
+        except Exception as e:
+            print(f"[!] Router health check error: {e}")
+        time.sleep(Config.ROUTER_HEALTH_INTERVAL)
+
+
+def start_health_checker():
+    global _checker
+    if Config.ROUTER_HEALTH_INTERVAL <= 0 or (_checker and _checker.is_alive()):
+        return
+
+    _checker = threading.Thread(target=_check_loop, name="router-health", daemon=True)
+    _checker.start()
+
+
+def get_pool_status():
+    targets = get_targets()
+    with _lock:
+        return {"targets": [t.to_dict() for t in targets]}
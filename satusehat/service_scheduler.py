@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+from common import job_state
+from common.throttle import PRIORITIES
+
+# ---------------------------------------------------------
+# Scheduler job DICOM berbasis prioritas
+#
+# Maksimal DICOM_MAX_CONCURRENT_JOBS job berjalan bersamaan di seluruh host.
+# Job yang menunggu dilayani berdasarkan prioritas (stat → routine → bulk),
+# lalu FIFO di dalam prioritas yang sama.
+# Antrian ada di JOBS_DB (tabel job_slot) supaya berlaku lintas worker
+# gunicorn; slot yang dilepas di proses yang sama langsung membangunkan
+# penunggu, antar proses lewat polling JOBS_POLL_INTERVAL detik.
+# ---------------------------------------------------------
+
+_RANK = {p: i for i, p in enumerate(PRIORITIES)}
+
+_released = threading.Condition()
+
+
+def _reap(conn):
+    for pid in job_state.dead_pids(conn, "job_slot"):
+        conn.execute("DELETE FROM job_slot WHERE pid = ?", (pid,))
+
+
+def _try_start(seq):
+    with job_state.write() as conn:
+        _reap(conn)
+        running = conn.execute("SELECT COUNT(*) FROM job_slot WHERE state = 'running'").fetchone()[0]
+        if running >= Config.DICOM_MAX_CONCURRENT_JOBS:
+            return False
+
+        first = conn.execute(
+            "SELECT seq FROM job_slot WHERE state = 'waiting' ORDER BY rank, seq LIMIT 1"
+        ).fetchone()
+        if first is None or first["seq"] != seq:
+            return False
+
+        conn.execute("UPDATE job_slot SET state = 'running' WHERE seq = ?", (seq,))
+        return True
+
+
+@contextmanager
+def job_slot(priority):
+    with job_state.write() as conn:
+        seq = conn.execute(
+            "INSERT INTO job_slot (priority, rank, pid, state, created) VALUES (?, ?, ?, 'waiting', ?)",
+            (priority, _RANK[priority], os.getpid(), time.time()),
+        ).lastrowid
+
+    try:
+        while not _try_start(seq):
+            with _released:
+                _released.wait(timeout=Config.JOBS_POLL_INTERVAL)
+        yield
+    finally:
+        with job_state.write() as conn:
+            conn.execute("DELETE FROM job_slot WHERE seq = ?", (seq,))
+        with _released:
+            _released.notify_all()
+
+
+def get_scheduler_stats():
+    with job_state.write() as conn:
+        _reap(conn)
+        rows = conn.execute("SELECT priority, state, COUNT(*) AS n FROM job_slot GROUP BY priority, state").fetchall()
+
+    running = {p: 0 for p in PRIORITIES}
+    waiting = {p: 0 for p in PRIORITIES}
+    for row in rows:
+        (running if row["state"] == "running" else waiting)[row["priority"]] = row["n"]
+    return {
+        "max_concurrent_jobs": Config.DICOM_MAX_CONCURRENT_JOBS,
+        "running": running,
+        "waiting": waiting,
+    }
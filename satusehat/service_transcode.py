@@ -0,0 +1,100 @@
+import os
+import subprocess
+import threading
+
+from config import Config
+from common.cpu_pool import run_stage
+from common.dicom_header import read_transfer_syntax, UNCOMPRESSED_SYNTAXES
+
+# ---------------------------------------------------------
+# Transcoding lossless sebelum kirim ke router (dcmtk)
+#
+# DICOM_TRANSCODE = jpegls | rle | deflate  (kosong = nonaktif)
+# Hanya instance uncompressed yang dikonversi; hasil gagal → kirim file asli.
+# ---------------------------------------------------------
+
+# target → (perintah dcmtk, opsi storescu untuk propose TS tsb)
+TRANSCODE_TARGETS = {
+    "jpegls": (["dcmcjpls", "--encode-lossless"], "--propose-jpls-lossless"),
+    "rle": (["dcmcrle"], "--propose-rle"),
+    "deflate": (["dcmconv", "--write-xfer-deflated"], "--propose-deflated"),
+}
+
+_lock = threading.Lock()
+
+_stats = {
+    "transcoded": 0,
+    "skipped": 0,
+    "failed": 0,
+    "bytes_before": 0,
+    "bytes_after": 0,
+}
+
+
+def transcode_file(path, target):
+    """
+    Dijalankan di CPU pool. Return dict {transcoded, before, after, error}.
+    File diganti in-place hanya jika hasil konversi lebih kecil.
+    """
+    before = os.path.getsize(path)
+
+    try:
+        syntax = read_transfer_syntax(path)
+    except Exception as e:
+        return {"transcoded": False, "before": before, "after": before, "error": str(e)}
+
+    if syntax not in UNCOMPRESSED_SYNTAXES:
+        return {"transcoded": False, "before": before, "after": before, "error": None}
+
+    command, _ = TRANSCODE_TARGETS[target]
+    out_path = path + ".tc"
+    try:
+        result = subprocess.run(command + [path, out_path], capture_output=True, text=True)
+        if result.returncode != 0 or not os.path.exists(out_path):
+            return {"transcoded": False, "before": before, "after": before, "error": result.stderr.strip()}
+
+        after = os.path.getsize(out_path)
+        if after >= before:
+            return {"transcoded": False, "before": before, "after": before, "error": None}
+
+        os.replace(out_path, path)
+        return {"transcoded": True, "before": before, "after": after, "error": None}
+    except Exception as e:
+        return {"transcoded": False, "before": before, "after": before, "error": str(e)}
+    finally:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+
+
+def transcode(path):
+    """
+    Transcode file (jika aktif) di CPU pool.
+    Return opsi storescu untuk propose TS hasil, atau None jika file tidak diubah.
+    """
+    target = Config.DICOM_TRANSCODE
+    if not target:
+        return None
+    if target not in TRANSCODE_TARGETS:
+        raise ValueError(f"Unsupported DICOM_TRANSCODE: {target}")
+
+    result = run_stage("transcode", transcode_file, path, target)
+
+    with _lock:
+        _stats["bytes_before"] += result["before"]
+        _stats["bytes_after"] += result["after"]
+        if result["transcoded"]:
+            _stats["transcoded"] += 1
+        elif result["error"]:
+            _stats["failed"] += 1
+        else:
+            _stats["skipped"] += 1
+
+    return TRANSCODE_TARGETS[target][1] if result["transcoded"] else None
+
+
+def get_transcode_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats["target"] = Config.DICOM_TRANSCODE or None
+    stats["bytes_saved"] = stats["bytes_before"] - stats["bytes_after"]
+    return stats
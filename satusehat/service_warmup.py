@@ -0,0 +1,174 @@
+import importlib
+import shutil
+import threading
+import time
+
+from config import Config
+from common import http
+from common import cpu_pool
+from common.auth import get_access_token
+from . import service_router as router_pool
+
+# ---------------------------------------------------------
+# Warm-up saat start (per proses / worker gunicorn)
+#
+# Request pertama setelah restart tidak lagi membayar: fetch token SatuSehat,
+# koneksi TLS / keep-alive ke SatuSehat & dcm4chee, C-ECHO router, import
+# tooling DICOM dan spawn worker CPU pool.
+# Langkah berjalan paralel di background, total dibatasi WARMUP_TIMEOUT detik;
+# /health/ready 503 sampai warm-up selesai.
+# ---------------------------------------------------------
+
+# Modul yang di-import worker CPU pool (stage tag rewrite & transcoding)
+POOL_MODULES = ("satusehat.service_dicom", "satusehat.service_transcode")
+DICOM_TOOLS = ("dcmodify", "storescu", "echoscu")
+
+_lock = threading.Lock()
+_state = {
+    "state": "pending",
+    "started": None,
+    "finished": None,
+    "steps": {},
+}
+_thread = None
+
+
+# ---------------------------------------------------------
+# Langkah warm-up; raise Exception jika gagal
+# ---------------------------------------------------------
+def _warm_satusehat():
+    token, err = get_access_token()
+    if err:
+        raise Exception(err.get("detail") or err.get("error"))
+
+    # Buka koneksi keep-alive ke host FHIR; status apa pun berarti koneksi jadi
+    http.get(Config.SS_BASE_URL.rstrip("/") + "/metadata",
+             headers={"Authorization": f"Bearer {token}"}, timeout=15)
+
+
+def _warm_dcm4chee():
+    resp = http.get(Config.DCM4CHEE_URL.rstrip("/") + "/rs/studies", params={"limit": 1}, timeout=15)
+    if resp.status_code >= 500:
+        raise Exception(f"dcm4chee HTTP {resp.status_code}")
+
+
+def _warm_router():
+    errors = []
+    for target in router_pool.get_targets():
+        ok, err = router_pool.check_target(target)
+        if ok:
+            return
+        errors.append(f"{target.label}: {err}")
+    raise Exception("; ".join(errors))
+
+
+def _warm_tooling():
+    missing = [tool for tool in DICOM_TOOLS if not shutil.which(tool)]
+
+    # Import di proses ini + spawn worker pool (import yang sama di tiap worker)
+    for name in POOL_MODULES:
+        importlib.import_module(name)
+    cpu_pool.warm_up(POOL_MODULES, timeout=Config.WARMUP_TIMEOUT)
+
+    if missing:
+        raise Exception("dcmtk tidak ditemukan: " + ", ".join(missing))
+
+
+STEPS = {
+    "satusehat": _warm_satusehat,
+    "dcm4chee": _warm_dcm4chee,
+    "router": _warm_router,
+    "tooling": _warm_tooling,
+}
+
+
+# ---------------------------------------------------------
+# Runner
+# ---------------------------------------------------------
+def _run_step(name, fn):
+    started = time.time()
+    error = None
+    try:
+        fn()
+    except Exception as e:
+        error = str(e) or type(e).__name__
+
+    with _lock:
+        _state["steps"][name] = {
+            "ok": error is None,
+            "duration_ms": round((time.time() - started) * 1000, 1),
+            "error": error,
+        }
+
+
+def run_warmup():
+    """Jalankan semua langkah paralel dan tunggu maksimal WARMUP_TIMEOUT detik."""
+    with _lock:
+        _state.update(state="running", started=time.time(), finished=None, steps={})
+
+    threads = [
+        threading.Thread(target=_run_step, args=(name, fn), name=f"warmup-{name}", daemon=True)
+        for name, fn in STEPS.items()
+    ]
+    for t in threads:
+        t.start()
+
+    deadline = time.monotonic() + Config.WARMUP_TIMEOUT
+    for t in threads:
+        t.join(max(deadline - time.monotonic(), 0))
+
+    with _lock:
+        for name in STEPS:
+            _state["steps"].setdefault(name, {
+                "ok": False,
+                "duration_ms": None,
+                "error": f"timeout setelah {Config.WARMUP_TIMEOUT}s",
+            })
+        _state["state"] = "done"
+        _state["finished"] = time.time()
+        failed = [name for name, s in _state["steps"].items() if not s["ok"]]
+
+    if failed:
+        print(f"[!] Warm-up selesai dengan kegagalan: {', '.join(failed)}")
+    return not failed
+
+
+def start_warmup():
+    global _thread
+    # Warm-up men-spawn CPU pool; di worker pool itu berarti pool bersarang
+    if cpu_pool.in_pool_worker():
+        return
+    if not Config.WARMUP_ENABLED:
+        with _lock:
+            _state["state"] = "skipped"
+        return
+    if _thread and _thread.is_alive():
+        return
+
+    _thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+    _thread.start()
+
+
+def get_warmup_status():
+    with _lock:
+        status = {
+            "state": _state["state"],
+            "steps": {name: dict(s) for name, s in _state["steps"].items()},
+        }
+        if _state["started"]:
+            end = _state["finished"] or time.time()
+            status["duration_ms"] = round((end - _state["started"]) * 1000, 1)
+    return status
+
+
+def readiness():
+    """Return (ready, status). Gagal warm-up hanya menahan readiness jika WARMUP_STRICT."""
+    status = get_warmup_status()
+    if status["state"] == "skipped":
+        return True, status
+    if status["state"] != "done":
+        return False, status
+
+    failed = [name for name, s in status["steps"].items() if not s["ok"]]
+    status["degraded"] = bool(failed)
+    return not (failed and Config.WARMUP_STRICT), status
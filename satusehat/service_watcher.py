@@ -0,0 +1,265 @@
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from config import Config
+from .service_dicom import list_updated_studies, process_dicom
+
+# ---------------------------------------------------------
+# PACS watcher
+#
+# Poll QIDO hanya untuk study yang berubah sejak high-water mark,
+# tunggu study "stabil" (jumlah instance tidak berubah selama
+# WATCHER_STABLE_SECONDS), lalu antrikan ke process_dicom.
+# Kandidat disimpan bersama HWM di WATCHER_STATE_FILE dan baru dihapus
+# setelah forward selesai, sehingga restart tidak melewatkan study yang
+# sudah berada di belakang HWM. Forward yang gagal dicoba ulang dengan
+# backoff sampai WATCHER_MAX_ATTEMPTS, lalu dicatat di "failed".
+# ---------------------------------------------------------
+
+_state_lock = threading.Lock()
+_forward_queue = queue.Queue()
+_threads = []
+
+_status = {
+    "last_poll": None,
+    "last_error": None,
+    "polled_studies": 0,
+    "forwarded": 0,
+    "forward_failed": 0,
+    "gave_up": 0,
+}
+
+# study_uid yang sedang antri / diproses
+_queued = set()
+
+# {"hwm", "forwarded", "candidates", "failed"} — dimuat dari WATCHER_STATE_FILE
+# candidates: study_uid → {"instances", "last_change", "accession", "attempts", "next_attempt"}
+_state = None
+
+
+def _pacs_tz():
+    return ZoneInfo(Config.PACS_TIMEZONE)
+
+
+def _dicom_datetime(ts):
+    # Timestamp DICOM tanpa offset: harus dalam zona waktu PACS
+    return datetime.fromtimestamp(ts, _pacs_tz()).strftime("%Y%m%d%H%M%S")
+
+
+def _load_state():
+    path = Config.WATCHER_STATE_FILE
+    if os.path.exists(path):
+        with open(path) as f:
+            state = json.load(f)
+        state.setdefault("candidates", {})
+        state.setdefault("failed", {})
+        return state
+
+    # Run pertama: mulai dari WATCHER_LOOKBACK_MINUTES ke belakang, bukan seluruh arsip
+    start = datetime.now(_pacs_tz()) - timedelta(minutes=Config.WATCHER_LOOKBACK_MINUTES)
+    return {"hwm": start.strftime("%Y%m%d%H%M%S"), "forwarded": {}, "candidates": {}, "failed": {}}
+
+
+def _save_state(state):
+    path = Config.WATCHER_STATE_FILE
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _get_state():
+    global _state
+    if _state is None:
+        _state = _load_state()
+    return _state
+
+
+# ---------------------------------------------------------
+# Poll
+# ---------------------------------------------------------
+def poll_once():
+    """Ambil study yang berubah sejak HWM dan update kandidat."""
+    state = _get_state()
+    poll_started = time.time()
+
+    offset = 0
+    changed = []
+    while True:
+        page = list_updated_studies(
+            state["hwm"], Config.WATCHER_UPDATE_KEY, offset=offset, limit=Config.WATCHER_PAGE_SIZE
+        )
+        changed.extend(page)
+        if len(page) < Config.WATCHER_PAGE_SIZE:
+            break
+        offset += len(page)
+
+    now = time.time()
+    with _state_lock:
+        candidates = state["candidates"]
+        for study in changed:
+            uid = study["study_uid"]
+            if not uid:
+                continue
+
+            cand = candidates.get(uid)
+            if cand is None or cand["instances"] != study["instances"]:
+                candidates[uid] = {
+                    "instances": study["instances"],
+                    "accession": study["accession"],
+                    "last_change": now,
+                }
+
+        # HWM mundur sedikit (overlap) agar update di batas waktu tidak terlewat;
+        # duplikat di-filter oleh dedup.
+        state["hwm"] = _dicom_datetime(poll_started - Config.WATCHER_OVERLAP_SECONDS)
+        _save_state(state)
+
+    _status["last_poll"] = _dicom_datetime(poll_started)
+    _status["polled_studies"] += len(changed)
+
+
+def _promote_stable():
+    """Pindahkan kandidat yang sudah stabil ke antrian forward (dengan dedup)."""
+    state = _get_state()
+    now = time.time()
+
+    with _state_lock:
+        candidates = state["candidates"]
+        skipped = False
+        for uid, cand in list(candidates.items()):
+            # Sedang diproses: kandidat tetap disimpan sampai forward selesai
+            if uid in _queued or now - cand["last_change"] < Config.WATCHER_STABLE_SECONDS:
+                continue
+            if now < cand.get("next_attempt", 0):
+                continue
+
+            forwarded = state["forwarded"].get(uid)
+            if forwarded and forwarded["instances"] == cand["instances"]:
+                del candidates[uid]
+                skipped = True
+                continue
+
+            _queued.add(uid)
+            _forward_queue.put((uid, dict(cand)))
+
+        if skipped:
+            _save_state(state)
+
+
+def _prune_forwarded(state):
+    cutoff = time.time() - Config.WATCHER_DEDUP_DAYS * 86400
+    for key in ("forwarded", "failed"):
+        state[key] = {uid: info for uid, info in state[key].items() if info["ts"] >= cutoff}
+
+
+# ---------------------------------------------------------
+# Threads
+# ---------------------------------------------------------
+def _poll_loop():
+    while True:
+        try:
+            poll_once()
+            _status["last_error"] = None
+        except Exception as e:
+            _status["last_error"] = str(e)
+            print(f"[!] PACS watcher poll error: {e}")
+
+        _promote_stable()
+        time.sleep(Config.WATCHER_POLL_INTERVAL)
+
+
+def _finish_candidate(state, uid, cand):
+    """Hapus kandidat setelah forward, kecuali study berubah lagi selama diproses."""
+    current = state["candidates"].get(uid)
+    if current and current["instances"] == cand["instances"]:
+        del state["candidates"][uid]
+
+
+def _retry_candidate(state, uid, cand, error):
+    """Jadwalkan ulang kandidat yang gagal (backoff); menyerah setelah WATCHER_MAX_ATTEMPTS."""
+    _status["forward_failed"] += 1
+    _status["last_error"] = f"{uid}: {error}"
+
+    current = state["candidates"].get(uid)
+    if not current or current["instances"] != cand["instances"]:
+        # Study berubah selama diproses: kandidat baru, attempt mulai dari nol
+        return
+
+    attempts = current.get("attempts", 0) + 1
+    if attempts >= Config.WATCHER_MAX_ATTEMPTS:
+        del state["candidates"][uid]
+        state["failed"][uid] = {
+            "instances": cand["instances"],
+            "accession": cand.get("accession"),
+            "attempts": attempts,
+            "error": str(error),
+            "ts": time.time(),
+        }
+        _status["gave_up"] += 1
+        print(f"[!] PACS watcher menyerah untuk study {uid} setelah {attempts} percobaan: {error}")
+        return
+
+    delay = min(Config.WATCHER_RETRY_BASE_SECONDS * 2 ** (attempts - 1), Config.WATCHER_RETRY_MAX_SECONDS)
+    current["attempts"] = attempts
+    current["next_attempt"] = time.time() + delay
+
+
+def _forward_loop():
+    state = _get_state()
+    while True:
+        uid, cand = _forward_queue.get()
+        try:
+            result, status = process_dicom({"study": uid})
+            error = None if status == 200 else result.get("message") or f"HTTP {status}"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+
+        try:
+            with _state_lock:
+                if error is None:
+                    state["forwarded"][uid] = {"instances": cand["instances"], "ts": time.time()}
+                    state["failed"].pop(uid, None)
+                    _finish_candidate(state, uid, cand)
+                    _prune_forwarded(state)
+                    _status["forwarded"] += 1
+                else:
+                    _retry_candidate(state, uid, cand, error)
+                _save_state(state)
+        finally:
+            with _state_lock:
+                _queued.discard(uid)
+            _forward_queue.task_done()
+
+
+def start_watcher():
+    if _threads:
+        return
+
+    _threads.append(threading.Thread(target=_poll_loop, name="pacs-watcher", daemon=True))
+    for i in range(Config.WATCHER_WORKERS):
+        _threads.append(threading.Thread(target=_forward_loop, name=f"pacs-forward-{i}", daemon=True))
+
+    for t in _threads:
+        t.start()
+    print(f"[*] PACS watcher started (interval {Config.WATCHER_POLL_INTERVAL}s)")
+
+
+def get_watcher_status():
+    state = _get_state()
+    with _state_lock:
+        return {
+            "enabled": bool(_threads),
+            "high_water_mark": state["hwm"],
+            "candidates": len(state["candidates"]),
+            "retrying": sum(1 for c in state["candidates"].values() if c.get("attempts")),
+            "failed_studies": len(state["failed"]),
+            "queued": len(_queued),
+            **_status,
+        }, 200
@@ -0,0 +1,328 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import socket
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import requests
+
+from config import Config
+from common.db import connect
+
+# ---------------------------------------------------------
+# Webhook penyelesaian job async
+#
+# Event: job.completed | job.partial | job.failed
+# Tujuan: callback_url per job + WEBHOOK_URLS global.
+# Delivery disimpan di SQLite lalu dikirim background sender dengan
+# retry + exponential backoff. Body ditandatangani HMAC-SHA256:
+#   X-Webhook-Signature: sha256=<hex(HMAC(secret, "<timestamp>.<body>"))>
+# Tanpa WEBHOOK_SECRET tidak ada yang dikirim. callback_url dibatasi
+# WEBHOOK_CALLBACK_ALLOWLIST (atau: bukan alamat internal) agar tidak bisa
+# dipakai untuk SSRF; body default hanya job_id / outcome / status.
+# ---------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_delivery (
+    seq          INTEGER PRIMARY KEY AUTOINCREMENT,
+    delivery_id  TEXT UNIQUE NOT NULL,
+    url          TEXT NOT NULL,
+    event        TEXT NOT NULL,
+    body         TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error   TEXT,
+    created_at   REAL NOT NULL,
+    updated_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_webhook_due ON webhook_delivery (status, next_attempt, seq);
+"""
+
+# Status HTTP yang layak di-retry; status 4xx lain dianggap permanen
+RETRY_STATUSES = {408, 425, 429}
+
+_lock = threading.Lock()
+_initialized = False
+_sender = None
+_wakeup = threading.Event()
+
+
+def _conn():
+    global _initialized
+    conn = connect(Config.WEBHOOK_DB)
+    if not _initialized:
+        with _lock:
+            if not _initialized:
+                conn.executescript(_SCHEMA)
+                _initialized = True
+    return conn
+
+
+def _internal_address(host):
+    """True jika host resolve ke alamat private / loopback / link-local / reserved."""
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except socket.gaierror:
+        return True
+    for info in infos:
+        addr = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if not addr.is_global or addr.is_multicast:
+            return True
+    return False
+
+
+def callback_url_error(url):
+    """Return pesan error jika callback_url tidak boleh dipakai, None jika boleh."""
+    if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+        return "callback_url harus URL http(s)"
+    host = (urlsplit(url).hostname or "").lower()
+    if not host:
+        return "callback_url tidak punya host"
+    if not Config.WEBHOOK_SECRET:
+        return "Webhook nonaktif: WEBHOOK_SECRET belum diset"
+
+    allowlist = Config.WEBHOOK_CALLBACK_ALLOWLIST
+    if allowlist:
+        for entry in allowlist:
+            # Prefix harus berhenti di batas path ("https://ris.local" tidak cocok dengan "https://ris.local.evil")
+            if "://" in entry and url.startswith(entry) and (
+                entry.endswith("/") or url[len(entry):len(entry) + 1] in ("", "/", "?", "#")
+            ):
+                return None
+            if "://" not in entry and host == entry.lower():
+                return None
+        return "callback_url tidak ada di WEBHOOK_CALLBACK_ALLOWLIST"
+
+    if _internal_address(host):
+        return "callback_url ke alamat internal tidak diizinkan (set WEBHOOK_CALLBACK_ALLOWLIST)"
+    return None
+
+
+def job_outcome(status, result, instances_done=0):
+    """completed (sukses), partial (gagal setelah sebagian terkirim / dibuat), failed."""
+    if status < 300:
+        return "completed"
+
+    created = [k for k, v in (result or {}).items() if k.endswith("_id") and k != "job_id" and v]
+    if instances_done or created:
+        return "partial"
+    return "failed"
+
+
+def sign(body, timestamp):
+    message = f"{timestamp}.{body}".encode("utf-8")
+    return hmac.new(Config.WEBHOOK_SECRET.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+# ---------------------------------------------------------
+# Enqueue
+# ---------------------------------------------------------
+def enqueue(event, payload, callback_url=None):
+    """Simpan satu delivery per URL tujuan. Return jumlah delivery."""
+    if not Config.WEBHOOK_SECRET:
+        # Tidak pernah kirim body tanpa tanda tangan
+        return 0
+
+    urls = list(Config.WEBHOOK_URLS)
+    if callback_url and callback_url not in urls:
+        urls.append(callback_url)
+    if not urls:
+        return 0
+
+    now = time.time()
+    body = json.dumps({"event": event, "sent_at": now, **payload})
+
+    conn = _conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for url in urls:
+            conn.execute(
+                "INSERT INTO webhook_delivery (delivery_id, url, event, body, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'pending', ?, ?)",
+                (str(uuid.uuid4()), url, event, body, now, now),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    _wakeup.set()
+    return len(urls)
+
+
+def notify_job(job_id, kind, status, result, callback_url=None, instances_done=0):
+    outcome = job_outcome(status, result, instances_done)
+    payload = {
+        "job_id": job_id,
+        "kind": kind,
+        "outcome": outcome,
+        "status": status,
+    }
+    if Config.WEBHOOK_INCLUDE_RESULT:
+        payload["result"] = result
+    try:
+        enqueue(f"job.{outcome}", payload, callback_url)
+    except Exception as e:
+        # Webhook best-effort; jangan gagalkan job
+        print(f"[!] Webhook enqueue failed: {e}")
+
+
+# ---------------------------------------------------------
+# Sender
+# ---------------------------------------------------------
+def _backoff(attempts):
+    return min(Config.WEBHOOK_MAX_BACKOFF, Config.WEBHOOK_RETRY_BASE * (2 ** attempts))
+
+
+def _next_due():
+    conn = _conn()
+    try:
+        row = conn.execute(
+            "SELECT * FROM webhook_delivery WHERE status = 'pending' AND next_attempt <= ? "
+            "ORDER BY seq LIMIT 1",
+            (time.time(),),
+        ).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def _update(delivery_id, status, error=None, delay=0):
+    now = time.time()
+    conn = _conn()
+    try:
+        conn.execute(
+            "UPDATE webhook_delivery SET status = ?, attempts = attempts + 1, next_attempt = ?, "
+            "last_error = ?, updated_at = ? WHERE delivery_id = ?",
+            (status, now + delay, error, now, delivery_id),
+        )
+    finally:
+        conn.close()
+
+
+def _deliver(delivery):
+    """Return (ok, retryable, error)."""
+    if not Config.WEBHOOK_SECRET:
+        # Secret dihapus setelah delivery diantrikan: tunda sampai dikonfigurasi lagi
+        return False, True, "WEBHOOK_SECRET belum diset"
+    if delivery["url"] not in Config.WEBHOOK_URLS:
+        # Cek ulang saat kirim: DNS callback bisa berubah sejak diantrikan
+        error = callback_url_error(delivery["url"])
+        if error:
+            return False, False, error
+
+    timestamp = str(int(time.time()))
+    headers = {
+        "Content-Type": "application/json",
+        "X-Webhook-Id": delivery["delivery_id"],
+        "X-Webhook-Event": delivery["event"],
+        "X-Webhook-Timestamp": timestamp,
+        "X-Webhook-Signature": "sha256=" + sign(delivery["body"], timestamp),
+    }
+
+    try:
+        resp = requests.post(delivery["url"], data=delivery["body"], headers=headers,
+                             timeout=Config.WEBHOOK_TIMEOUT, allow_redirects=False)
+    except requests.RequestException as e:
+        return False, True, str(e)
+
+    if resp.status_code < 300:
+        return True, False, None
+
+    retryable = resp.status_code >= 500 or resp.status_code in RETRY_STATUSES
+    return False, retryable, f"HTTP {resp.status_code}: {resp.text[:200]}"
+
+
+def send_once():
+    while True:
+        delivery = _next_due()
+        if not delivery:
+            return
+
+        ok, retryable, error = _deliver(delivery)
+        if ok:
+            _update(delivery["delivery_id"], "delivered")
+        elif retryable and delivery["attempts"] + 1 < Config.WEBHOOK_MAX_ATTEMPTS:
+            _update(delivery["delivery_id"], "pending", error, _backoff(delivery["attempts"]))
+        else:
+            _update(delivery["delivery_id"], "dead", error)
+
+
+def _send_loop():
+    while True:
+        try:
+            send_once()
+        except Exception as e:
+            print(f"[!] Webhook sender error: {e}")
+
+        _wakeup.wait(Config.WEBHOOK_POLL_INTERVAL)
+        _wakeup.clear()
+
+
+def start_webhook_sender():
+    global _sender
+    if _sender and _sender.is_alive():
+        return
+
+    _sender = threading.Thread(target=_send_loop, name="webhook-sender", daemon=True)
+    _sender.start()
+    print(f"[*] Webhook sender started (db: {Config.WEBHOOK_DB})")
+    if not Config.WEBHOOK_SECRET:
+        print("[!] WEBHOOK_SECRET kosong: webhook tidak akan dikirim")
+
+
+# ---------------------------------------------------------
+# Status & replay
+# ---------------------------------------------------------
+def list_deliveries(status=None, limit=100):
+    conn = _conn()
+    try:
+        if status:
+            rows = conn.execute(
+                "SELECT * FROM webhook_delivery WHERE status = ? ORDER BY seq DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM webhook_delivery ORDER BY seq DESC LIMIT ?", (limit,)).fetchall()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM webhook_delivery GROUP BY status").fetchall())
+    finally:
+        conn.close()
+
+    items = []
+    for row in rows:
+        item = dict(row)
+        item.pop("body")
+        items.append(item)
+    return {"counts": counts, "items": items}, 200
+
+
+def replay_delivery(delivery_id):
+    """Kirim ulang delivery dead / pending. Delivery yang sudah delivered tidak dikirim lagi (409)."""
+    conn = _conn()
+    try:
+        cur = conn.execute(
+            "UPDATE webhook_delivery SET status = 'pending', attempts = 0, next_attempt = 0, updated_at = ? "
+            "WHERE delivery_id = ? AND status IN ('dead', 'pending')",
+            (time.time(), delivery_id),
+        )
+        row = None
+        if not cur.rowcount:
+            row = conn.execute(
+                "SELECT status FROM webhook_delivery WHERE delivery_id = ?", (delivery_id,)
+            ).fetchone()
+    finally:
+        conn.close()
+
+    if not cur.rowcount:
+        if row is None:
+            return {"error": "Delivery not found"}, 404
+        return {"error": "Delivery is not dead or pending", "status": row["status"]}, 409
+
+    _wakeup.set()
+    return {"delivery_id": delivery_id, "status": "pending"}, 200
@@ -70,6 +70,94 @@ async function postJson(url, body, resultId) {
 
 
 
+// =========================
+// POST JSON ASYNC + PROGRESS (SSE)
+// =========================
+function formatBytes(n) {
+    if (!n) return '0 B';
+    const units = ['B', 'KB', 'MB', 'GB'];
+    const i = Math.min(Math.floor(Math.log(n) / Math.log(1024)), units.length - 1);
+    return `${(n / Math.pow(1024, i)).toFixed(1)} ${units[i]}`;
+}
+
+function showProgress(id, p) {
+    const box = document.getElementById(id);
+    if (!box) return;
+    box.style.display = 'block';
+
+    const lines = [`Step     : ${p.step}`];
+    if (p.instances_total != null) {
+        const done = p.instances_done + p.instances_skipped;
+        lines.push(`Instance : ${done}/${p.instances_total} (dikirim ${p.instances_done}, skip ${p.instances_skipped})`);
+        lines.push(`Bytes    : ${formatBytes(p.bytes_sent)}`);
+    }
+    lines.push(`Elapsed  : ${p.elapsed_seconds}s` + (p.eta_seconds != null ? `, ETA ${p.eta_seconds}s` : ''));
+    box.textContent = lines.join('\n');
+}
+
+async function postJsonWithProgress(url, body, resultId, form) {
+    const button = form ? form.querySelector('button[type="submit"]') : null;
+    if (button) button.disabled = true;   // cegah double submit
+    showLoading();
+    showAlert("Job dijalankan di background...", "warning");
+
+    const finish = () => {
+        if (button) button.disabled = false;
+        hideLoading();
+    };
+
+    let job;
+    try {
+        const resp = await fetch(`${url}?async=1`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        job = await resp.json();
+
+        if (resp.status !== 202) {
+            showResult(resultId, job, resp.status);
+            showAlert(`Error: ${job.message || "Terjadi kesalahan"}`, "danger");
+            finish();
+            return;
+        }
+    } catch (err) {
+        showAlert(`Network Error: ${err.message}`, "danger");
+        showResult(resultId, { error: err.message }, 'ERR');
+        finish();
+        return;
+    }
+
+    // EventSource otomatis reconnect (Last-Event-ID) jika koneksi terputus
+    const source = new EventSource(job.events_url);
+
+    source.addEventListener('progress', ev => {
+        showProgress(resultId, JSON.parse(ev.data));
+    });
+
+    source.addEventListener('done', ev => {
+        source.close();
+        const data = JSON.parse(ev.data);
+        showResult(resultId, data.result, data.status);
+
+        if (data.status >= 300) {
+            showAlert(`Error: ${data.result.message || data.result.error || "Terjadi kesalahan"}`, "danger");
+        } else {
+            showAlert("Permintaan berhasil diproses", "success");
+        }
+        finish();
+    });
+
+    source.addEventListener('error', ev => {
+        // Event "error" dari server (job tidak ditemukan) membawa data
+        if (ev.data) {
+            source.close();
+            showResult(resultId, JSON.parse(ev.data), 'ERR');
+            finish();
+        }
+    });
+}
+
 
 // Helper: show JSON result in a box
 function showResult(id, data, status) {
@@ -368,7 +456,7 @@ function setupForms() {
     document.getElementById('form-dicom-process').addEventListener('submit', e => {
         e.preventDefault();
         const body = formToJson(e.target);
-        postJson('/api/dicom/process', body, 'result-dicom-process');
+        postJsonWithProgress('/api/dicom/process', body, 'result-dicom-process', e.target);
     });
 
     // Encounter
@@ -424,7 +512,7 @@ function setupForms() {
     document.getElementById('form-batch4').addEventListener('submit', e => {
         e.preventDefault();
         const body = formToJson(e.target);
-        postJson('/api/satset/batch4', body, 'result-batch4');
+        postJsonWithProgress('/api/satset/batch4', body, 'result-batch4', e.target);
     });
 
     // Imaging lookup